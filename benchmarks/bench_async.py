@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""Compare throughput of the sync (WSGI) and async (ASGI) paths against a stub Elasticsearch answering
+every request after a fixed latency.
+
+The sync path is driven by --workers threads, the way a pool of sync workers serves requests; the
+async path by a single event loop keeping --concurrency requests in flight.
+
+    python benchmarks/bench_async.py --requests 400 --latency 0.05 --workers 4 --concurrency 64
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pele import limiter  # noqa: E402
+from pele.asgi import create_asgi_app  # noqa: E402
+from tests.stub_es import stub_client, async_stub_client  # noqa: E402
+
+PATH = '/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids'
+QUERY = 'page_size=10&offset=10'
+
+
+def bench_sync(app, n, workers):
+    def get(_):
+        with app.test_client() as c:
+            assert c.get(f"{PATH}?{QUERY}").status_code == 200
+
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(get, range(n)))
+    return time.time() - t0
+
+
+async def bench_async(asgi_app, n, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def get():
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': PATH, 'root_path': '', 'query_string': QUERY.encode(),
+                 'headers': [], 'client': ('127.0.0.1', 0)}
+        async with sem:
+            await asgi_app(scope, receive, send)
+        assert sent[0]['status'] == 200
+
+    t0 = time.time()
+    await asyncio.gather(*[get() for _ in range(n)])
+    return time.time() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400, help="requests per path")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds every ES request takes")
+    parser.add_argument('--workers', type=int, default=4, help="threads driving the sync path")
+    parser.add_argument('--concurrency', type=int, default=64, help="requests in flight on the async path")
+    args = parser.parse_args()
+
+    asgi_app = create_asgi_app('pele.settings.TestConfig')
+    app = asgi_app.app
+    app.config['AUTH'] = False
+    app.logger.setLevel(logging.INFO)
+    limiter.enabled = False
+    app.es_util.client = stub_client(latency=args.latency)
+    asgi_app.es_util.client = async_stub_client(latency=args.latency)
+
+    secs = bench_sync(app, args.requests, args.workers)
+    print(f"sync:  {args.requests / secs:8.1f} req/s ({args.workers} workers)")
+
+    async def run():
+        try:
+            return await bench_async(asgi_app, args.requests, args.concurrency)
+        finally:
+            await asgi_app.es_util.close()
+
+    secs = asyncio.run(run())
+    print(f"async: {args.requests / secs:8.1f} req/s ({args.concurrency} in flight)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+"""Benchmark every endpoint of the pele namespace through create_app against a stub Elasticsearch
+serving synthetic GRQ documents, reporting throughput, p50/p99 latency and peak memory traced per
+request. Results can be saved as a JSON baseline and later runs compared against it:
+
+    python benchmarks/bench_endpoints.py --requests 200 --save baseline.json
+    python benchmarks/bench_endpoints.py --requests 200 --compare baseline.json --tolerance 0.2
+
+The comparison exits with status 1 if the p50 latency or peak memory of an endpoint grew, or its
+throughput dropped, by more than the tolerance.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pele import create_app, limiter  # noqa: E402
+from tests.stub_es import stub_client, make_doc  # noqa: E402
+
+DATASET = 'acquisition-S1-IW_SLC'
+TYPE = 'acquisition'
+FIELDS = 'id,starttime,endtime,location,metadata'
+
+
+def endpoints(n_docs, page_size):
+    """Return {name: (method, path, JSON body)} of the requests driving each endpoint."""
+    _id = f"{DATASET}-{n_docs // 2:08d}"
+    ids = [f"{DATASET}-{i:08d}" for i in range(0, n_docs, max(1, n_docs // page_size))][:page_size]
+    page = f"page_size={page_size}"
+    return {
+        'types': ('GET', '/types', None),
+        'datasets': ('GET', '/datasets', None),
+        'datasets_by_type': ('GET', f"/type/{TYPE}/datasets", None),
+        'types_by_dataset': ('GET', f"/dataset/{DATASET}/types", None),
+        'ids_by_dataset': ('GET', f"/dataset/{DATASET}/dataset_ids?{page}", None),
+        'ids_by_dataset_cursor': ('GET', f"/dataset/{DATASET}/dataset_ids?{page}&cursor=", None),
+        'ids_by_type': ('GET', f"/type/{TYPE}/dataset_ids?{page}", None),
+        'dataset_by_id': ('GET', f"/dataset/{_id}", None),
+        'datasets_by_ids': ('POST', '/datasets/lookup', {'ids': ids}),
+        'fields_by_type_and_dataset': ('GET', f"/type/{TYPE}/dataset/{DATASET}/{FIELDS}?{page}", None),
+        'overlaps_by_id': ('GET', f"/overlaps/{_id}/{FIELDS}?{page}", None),
+        'overlaps_by_id_type_dataset': ('GET', f"/overlaps/{_id}/type/{TYPE}/dataset/{DATASET}/{FIELDS}?{page}",
+                                        None),
+        'batch': ('POST', '/batch', {'queries': [
+            {'query': 'ids_by_dataset', 'dataset': DATASET, 'page_size': page_size},
+            {'query': 'fields', 'type': TYPE, 'dataset': DATASET, 'fields': FIELDS.split(','),
+             'page_size': page_size},
+            {'query': 'overlaps', 'id': _id, 'fields': ['id'], 'page_size': page_size},
+        ]}),
+        'export_ids_by_dataset': ('GET', f"/export/dataset/{DATASET}/dataset_ids", None),
+        'export_fields_by_type_and_dataset': ('GET', f"/export/type/{TYPE}/dataset/{DATASET}/{FIELDS}", None),
+        'join_overlaps': ('POST', '/join/overlaps', {
+            'source': {'type': TYPE, 'dataset': DATASET},
+            'target': {'type': TYPE, 'dataset': DATASET},
+            'fields': ['id'],
+        }),
+    }
+
+
+def make_docs(n, doc_size):
+    """Return n synthetic documents padded to about doc_size bytes of JSON."""
+    docs = [make_doc(i) for i in range(n)]
+    for doc in docs:
+        pad = doc_size - len(json.dumps(doc))
+        if pad > 0:
+            doc['metadata']['padding'] = 'x' * pad
+    return docs
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100. * (len(values) - 1))))]
+
+
+def bench(client, method, path, body, n, warmup, alloc_requests):
+    """Return results of n timed requests and alloc_requests traced ones."""
+    def call():
+        resp = client.open(path, method=method, json=body)
+        resp.get_data()  # consume streamed responses
+        return resp
+
+    for _ in range(warmup):
+        resp = call()
+    if resp.status_code != 200:
+        raise RuntimeError(f"{method} {path}: {resp.status_code} {resp.get_data(as_text=True)[:200]}")
+
+    latencies = []
+    t0 = time.perf_counter()
+    for _ in range(n):
+        t = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - t)
+    wall = time.perf_counter() - t0
+
+    peaks = 0
+    tracemalloc.start()
+    for _ in range(alloc_requests):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        call()
+        peaks += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    return {
+        'rps': n / wall,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'peak_kib': peaks / max(1, alloc_requests) / 1024,
+        'bytes': len(resp.get_data()),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print changes against baseline and return names of the endpoints that regressed."""
+    regressed = []
+    for name, r in results.items():
+        b = baseline.get(name, None)
+        if b is None:
+            continue
+        changes = {
+            'rps': b['rps'] / r['rps'] - 1,  # drop in throughput
+            'p50_ms': r['p50_ms'] / b['p50_ms'] - 1,
+            'peak_kib': r['peak_kib'] / b['peak_kib'] - 1 if b['peak_kib'] else 0.,
+        }
+        bad = [k for k, v in changes.items() if v > tolerance]
+        print(f"{name:34s} " + '  '.join(f"{k}: {v * 100:+6.1f}%" for k, v in changes.items()) +
+              (f"  REGRESSED ({', '.join(bad)})" if bad else ''))
+        if bad:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='pele.settings.TestConfig', help="config object of create_app")
+    parser.add_argument('--docs', type=int, default=1000, help="documents (total hits) served by the stub")
+    parser.add_argument('--doc-size', type=int, default=1024, help="approximate JSON size of each document")
+    parser.add_argument('--latency', type=float, default=0., help="seconds the stub waits before answering")
+    parser.add_argument('--page-size', type=int, default=100, help="page size of the paged endpoints")
+    parser.add_argument('--join-matches', type=int, default=10,
+                        help="target documents per source document of the join (the stub ignores the query)")
+    parser.add_argument('--requests', type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument('--warmup', type=int, default=10, help="untimed requests per endpoint")
+    parser.add_argument('--alloc-requests', type=int, default=20, help="requests traced with tracemalloc")
+    parser.add_argument('--endpoints', help="comma-separated endpoints to run (default all)")
+    parser.add_argument('--save', help="write results to this JSON baseline")
+    parser.add_argument('--compare', help="compare results to this JSON baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="relative regression allowed by --compare")
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    app.config['AUTH'] = False
+    app.config['EXPORT_PAGE_SIZE'] = args.page_size
+    app.config['JOIN_BATCH_SIZE'] = args.page_size
+    app.config['JOIN_MAX_MATCHES'] = args.join_matches
+    app.logger.setLevel(logging.INFO)
+    limiter.enabled = False
+    app.es_util.client = stub_client(docs=make_docs(args.docs, args.doc_size), latency=args.latency)
+    client = app.test_client()
+
+    selected = args.endpoints.split(',') if args.endpoints else None
+    results = {}
+    print(f"{'endpoint':34s} {'req/s':>9s} {'p50 ms':>8s} {'p99 ms':>8s} {'peak KiB':>9s} {'bytes':>9s}")
+    for name, (method, path, body) in endpoints(args.docs, args.page_size).items():
+        if selected is not None and name not in selected:
+            continue
+        r = results[name] = bench(client, method, f"/api/v0.1/pele{path}", body, args.requests, args.warmup,
+                                  args.alloc_requests)
+        print(f"{name:34s} {r['rps']:9.1f} {r['p50_ms']:8.3f} {r['p99_ms']:8.3f} {r['peak_kib']:9.1f} "
+              f"{r['bytes']:9d}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'meta': {
+                    'python': platform.python_version(),
+                    'config': args.config,
+                    'docs': args.docs,
+                    'doc_size': args.doc_size,
+                    'latency': args.latency,
+                    'page_size': args.page_size,
+                    'requests': args.requests,
+                    'settings': {k: app.config.get(k) for k in ('RAW_SEARCH', 'FAST_JSON', 'TRACK_TOTAL_HITS',
+                                                                'FACET_CATALOG_TTL', 'SERVER_TIMING', 'METRICS')},
+                },
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        print(f"\ncompared to {args.compare} (tolerance {args.tolerance * 100:.0f}%):")
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Compare peak memory traced per request and response bytes read from Elasticsearch with and without
+RAW_SEARCH, against a stub Elasticsearch serving synthetic GRQ documents over a JSON round trip.
+
+    python benchmarks/bench_raw.py --requests 100
+"""
+import os
+import sys
+import logging
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pele import create_app, limiter  # noqa: E402
+from tests.stub_es import stub_client  # noqa: E402
+
+PATHS = {
+    'fields': '/api/v0.1/pele/type/acquisition/dataset/acquisition-S1-IW_SLC/id,starttime,endtime,'
+              'location?page_size=100',
+    'overlaps': '/api/v0.1/pele/overlaps/acquisition-S1-IW_SLC-00000005/id,location?page_size=100',
+    'ids': '/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids?page_size=100',
+    'types': '/api/v0.1/pele/types',
+}
+
+
+def measure(client, transport, path, n):
+    """Return (mean peak traced bytes, ES response bytes) per request."""
+    assert client.get(path).status_code == 200
+    transport.response_bytes = 0
+    peaks = 0
+    tracemalloc.start()
+    for _ in range(n):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        client.get(path)
+        peaks += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return peaks / n, transport.response_bytes / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100, help="requests per path and mode")
+    args = parser.parse_args()
+
+    app = create_app('pele.settings.TestConfig')
+    app.config['AUTH'] = False
+    app.logger.setLevel(logging.INFO)
+    limiter.enabled = False
+    app.es_util.client = stub_client(roundtrip=True)
+    app.es_util.catalog = None  # run the terms aggregations
+    transport = app.es_util.client.transport
+    client = app.test_client()
+
+    for name, path in PATHS.items():
+        results = {}
+        for mode in (False, True):
+            app.config['RAW_SEARCH'] = mode
+            results[mode] = measure(client, transport, path, args.requests)
+        (dsl_peak, dsl_bytes), (raw_peak, raw_bytes) = results[False], results[True]
+        print(f"{name:10s} peak: {dsl_peak / 1024:8.1f} -> {raw_peak / 1024:8.1f} KiB  "
+              f"ES bytes: {dsl_bytes / 1024:8.1f} -> {raw_bytes / 1024:8.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
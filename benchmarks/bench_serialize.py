@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""Compare per-request CPU of marshal_with and of the FAST_JSON response path for pages of 100 hits,
+against a stub Elasticsearch serving synthetic GRQ documents.
+
+    python benchmarks/bench_serialize.py --requests 200
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pele import create_app, limiter  # noqa: E402
+from pele.lib import fast_json  # noqa: E402
+from tests.stub_es import stub_client  # noqa: E402
+
+PATHS = {
+    'fields': '/api/v0.1/pele/type/acquisition/dataset/acquisition-S1-IW_SLC/id,dataset,starttime,endtime,'
+              'location,metadata?page_size=100',
+    'overlaps': '/api/v0.1/pele/overlaps/acquisition-S1-IW_SLC-00000005/id,location,metadata?page_size=100',
+    'ids': '/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids?page_size=100',
+}
+
+
+def cpu_per_request(client, path, n):
+    assert client.get(path).status_code == 200
+    t0 = time.process_time()
+    for _ in range(n):
+        client.get(path)
+    return (time.process_time() - t0) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help="requests per path and mode")
+    args = parser.parse_args()
+
+    app = create_app('pele.settings.TestConfig')
+    app.config['AUTH'] = False
+    app.logger.setLevel(logging.INFO)
+    limiter.enabled = False
+    app.es_util.client = stub_client()
+    client = app.test_client()
+
+    print(f"encoder: {'orjson' if fast_json.orjson is not None else 'json'}")
+    for name, path in PATHS.items():
+        app.config['FAST_JSON'] = False
+        slow = cpu_per_request(client, path, args.requests)
+        app.config['FAST_JSON'] = True
+        fast = cpu_per_request(client, path, args.requests)
+        print(f"{name:10s} marshal_with: {slow * 1000:7.3f} ms  FAST_JSON: {fast * 1000:7.3f} ms  "
+              f"({slow / fast:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
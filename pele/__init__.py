@@ -11,6 +11,13 @@ from pele.extensions import (cache, assets_env, debug_toolbar, login_manager, co
 
 from pele.lib.es_connection import get_es_client
 from pele.lib.query import QueryES
+from pele.lib.catalog import FacetCatalog
+from pele.lib.resolver import IndexResolver
+from pele.lib.summary import SummaryCatalog
+from pele.lib.histogram import HistogramCache
+from pele.lib.fingerprint import IndexFingerprints
+from pele.lib.token_cache import TokenCache
+from pele.lib import timing, metrics, admission, result_cache, conditional
 
 
 class ListConverter(BaseConverter):
@@ -88,7 +95,8 @@ def create_app(object_name):
 
     app = Flask(__name__)
     app.config.from_object(object_name)
-    app.config.from_pyfile('../settings.cfg')  # override
+    if not app.config.get('TESTING', False):
+        app.config.from_pyfile('../settings.cfg')  # override
 
     # register converters
     app.url_map.converters['list'] = ListConverter
@@ -107,6 +115,46 @@ def create_app(object_name):
 
     app.es_util = QueryES(get_es_client(app.config), Search, Q, A)
 
+    # fingerprints of the state of the indices, validating cached results and conditional GETs
+    app.es_util.fingerprints = IndexFingerprints(app.es_util, ttl=app.config.get('INDEX_FINGERPRINT_TTL', 5))
+
+    # serve type/dataset listings from an in-process catalog refreshed in the background
+    facet_catalog_ttl = app.config.get('FACET_CATALOG_TTL', 300)
+    if facet_catalog_ttl > 0:
+        app.es_util.catalog = FacetCatalog(app, app.es_util.query_facets, ttl=facet_catalog_ttl)
+
+    # narrow searches of ES_INDEX by dataset or type to the concrete indices named after the datasets
+    index_resolver_ttl = app.config.get('INDEX_RESOLVER_TTL', 0)
+    if index_resolver_ttl > 0:
+        app.es_util.resolver = IndexResolver(app, app.es_util, app.config['ES_INDEX'], ttl=index_resolver_ttl,
+                                             max_indices=app.config.get('INDEX_RESOLVER_MAX_INDICES', 64))
+
+    # closed buckets of the date histograms, so repeated histograms only query the open tail
+    histogram_cache_ttl = app.config.get('HISTOGRAM_CACHE_TTL', 0)
+    if histogram_cache_ttl > 0:
+        app.es_util.histograms = HistogramCache(maxsize=app.config.get('HISTOGRAM_CACHE_SIZE', 10000),
+                                                ttl=histogram_cache_ttl,
+                                                lag=app.config.get('HISTOGRAM_CLOSED_LAG', 86400))
+
+    # type/dataset summary served at /summary, refreshed in the background
+    app.summary = None
+    summary_ttl = app.config.get('SUMMARY_TTL', 0)
+    if summary_ttl > 0:
+        app.summary = SummaryCatalog(app, app.es_util.query_summary, app.config['ES_INDEX'], ttl=summary_ttl,
+                                     full_ttl=app.config.get('SUMMARY_FULL_TTL', 3600),
+                                     lag=app.config.get('SUMMARY_INGEST_LAG', 300))
+
+    # cache of verified API tokens and existing users
+    app.token_cache = TokenCache(maxsize=app.config.get('TOKEN_CACHE_SIZE', 10000),
+                                 ttl=app.config.get('TOKEN_CACHE_TTL', 300),
+                                 user_ttl=app.config.get('USER_CACHE_TTL', 300))
+
+    # per-request phase timings (Server-Timing header and structured logs)
+    timing.init_app(app)
+
+    # Prometheus metrics exported at METRICS_PATH
+    metrics.init_app(app)
+
     # init extensions
     cache.init_app(app)
     debug_toolbar.init_app(app)
@@ -116,6 +164,15 @@ def create_app(object_name):
     limiter.init_app(app)
     mail.init_app(app)
 
+    # cost-based admission control of the ES-backed endpoints, budgets kept in the limiter storage
+    admission.init_app(app, limiter)
+
+    # cache of search results over the Flask-Caching cache, invalidated when the searched indices change
+    result_cache.init_app(app, shared=cache)
+
+    # ETag/Last-Modified validators and 304s of the GET resources from the index fingerprint
+    conditional.init_app(app)
+
     # Import and register the different asset bundles
     assets_env.init_app(app)
     assets_loader = PythonAssetsLoader(assets)
@@ -0,0 +1,315 @@
+"""ASGI entry point.
+
+The GET endpoints of the pele namespace that page with offset/page_size are served by coroutines
+running their searches on an asyncio Elasticsearch/OpenSearch client, so one worker keeps many
+requests waiting on Elasticsearch without a thread per request. Everything else (cursor paging,
+POST bodies, exports, auth and the web UI) is handed to the Flask app through asgiref's WsgiToAsgi.
+
+Requires the "async" extras (aiohttp, asgiref). Run with any ASGI server, e.g.:
+
+    gunicorn -w4 -b 0.0.0.0:8877 -k uvicorn.workers.UvicornWorker \
+      'pele.asgi:create_asgi_app("pele.settings.ProductionConfig")'
+"""
+import json
+import time
+import asyncio
+import traceback
+from urllib.parse import parse_qsl
+from types import SimpleNamespace
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import g
+from flask_restx import marshal
+from limits import parse
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+
+from pele import create_app, limiter
+from pele.controllers import verify_token
+from pele.lib.async_query import AsyncQueryES
+from pele.lib.es_connection import get_async_es_client
+from pele.lib.fast_json import dumps, field_plan, apply_plan
+from pele.lib.query import get_page_size_and_offset, parse_polygon
+from pele.lib.timing import phase, get_timer, start_timer, finish_timer
+
+# same limit as the resources served
+RATE_LIMIT = parse("10/second")
+
+
+def page(total, page_size, offset, key, items):
+    return {
+        'success': True,
+        'total': total,
+        'count': len(items),
+        'page_size': page_size,
+        'offset': offset,
+        key: items
+    }
+
+
+def polygon_arg(r):
+    """Return parsed polygon argument; ValueError is answered with a 400."""
+    polygon = r.args.get('polygon', None)
+    if polygon is None:
+        return None
+    try:
+        return parse_polygon(polygon)
+    except Exception as e:
+        raise ValueError(str(e))
+
+
+async def types(es, index, r):
+    page_size, offset = get_page_size_and_offset(r)
+    total, items = await es.query_types(index, offset, page_size)
+    return page(total, page_size, offset, 'types', items)
+
+
+async def datasets(es, index, r):
+    page_size, offset = get_page_size_and_offset(r)
+    total, items = await es.query_datasets(index, offset, page_size)
+    return page(total, page_size, offset, 'datasets', items)
+
+
+async def datasets_by_type(es, index, r, type_name):
+    page_size, offset = get_page_size_and_offset(r)
+    total, items = await es.query_datasets_by_type(index, type_name, offset, page_size)
+    return page(total, page_size, offset, 'datasets', items)
+
+
+async def types_by_dataset(es, index, r, dataset_name):
+    page_size, offset = get_page_size_and_offset(r)
+    total, items = await es.query_types_by_dataset(index, dataset_name, offset, page_size)
+    return page(total, page_size, offset, 'types', items)
+
+
+async def ids_by_dataset(es, index, r, dataset_name, polygon=None):
+    page_size, offset = get_page_size_and_offset(r)
+    total, items = await es.query_ids_by_dataset(index, dataset_name, offset, page_size,
+                                                 start_time=r.args.get('start_time', None),
+                                                 end_time=r.args.get('end_time', None), polygon=polygon)
+    return page(total, page_size, offset, 'dataset_ids', items)
+
+
+async def ids_by_type(es, index, r, type_name, polygon=None):
+    page_size, offset = get_page_size_and_offset(r)
+    total, items = await es.query_ids_by_type(index, type_name, offset, page_size,
+                                              start_time=r.args.get('start_time', None),
+                                              end_time=r.args.get('end_time', None), polygon=polygon)
+    return page(total, page_size, offset, 'dataset_ids', items)
+
+
+async def dataset_by_id(es, index, r, dataset_id):
+    ret_fields = r.args.get('fields', None)
+    ret_fields = [i.strip() for i in ret_fields.split(',') if i.strip()] if ret_fields else None
+    return {
+        'success': True,
+        'result': await es.query_id(index, dataset_id, fields=ret_fields)
+    }
+
+
+async def fields_by_type_and_dataset(es, index, r, type_name, dataset_name, ret_fields, polygon=None):
+    terms = {
+        'dataset_type.keyword': type_name,
+        'dataset.keyword': dataset_name,
+    }
+    page_size, offset = get_page_size_and_offset(r)
+    total, items = await es.query_fields(f"{index}_*_{dataset_name.lower()}", terms, ret_fields, offset,
+                                         page_size, start_time=r.args.get('start_time', None),
+                                         end_time=r.args.get('end_time', None), polygon=polygon)
+    return page(total, page_size, offset, 'results', items)
+
+
+async def overlaps_by_id(es, index, r, dataset_id, ret_fields):
+    page_size, offset = get_page_size_and_offset(r)
+    total, items = await es.overlaps(index, dataset_id, {}, ret_fields, offset, page_size)
+    return page(total, page_size, offset, 'results', items)
+
+
+async def overlaps_by_id_type_dataset(es, index, r, dataset_id, type_name, dataset_name, ret_fields):
+    terms = {
+        'dataset_type.keyword': type_name,
+        'dataset.keyword': dataset_name,
+    }
+    page_size, offset = get_page_size_and_offset(r)
+    total, items = await es.overlaps(index, dataset_id, terms, ret_fields, offset, page_size)
+    return page(total, page_size, offset, 'results', items)
+
+
+# endpoint -> (handler, takes a polygon argument)
+HANDLERS = {
+    'types': (types, False),
+    'datasets': (datasets, False),
+    'datasets_by_type': (datasets_by_type, False),
+    'types_by_dataset': (types_by_dataset, False),
+    'ids_by_dataset': (ids_by_dataset, True),
+    'ids_by_type': (ids_by_type, True),
+    'dataset_by_id': (dataset_by_id, False),
+    'fields_by_type_and_dataset': (fields_by_type_and_dataset, True),
+    'overlaps_by_id': (overlaps_by_id, False),
+    'overlaps_by_id_type_dataset': (overlaps_by_id_type_dataset, False),
+}
+
+
+class AsyncApp:
+    """ASGI application serving HANDLERS with AsyncQueryES and delegating the rest to the Flask app."""
+
+    def __init__(self, app, es_util):
+        """
+        :param app: Flask app returned by create_app()
+        :param es_util: AsyncQueryES
+        """
+        self.app = app
+        self.es_util = es_util
+        self.wsgi = WsgiToAsgi(app)
+        self.urls = app.url_map.bind('localhost')
+        self.models = {i: app.view_functions[f"api_v0-1.{i}"].view_class.model for i in HANDLERS}
+        self.plans = {endpoint: field_plan(model) for endpoint, model in self.models.items()}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        route = self.route(scope) if scope['type'] == 'http' else None
+        if route is None:
+            return await self.wsgi(scope, receive, send)
+
+        with self.app.app_context():
+            t0 = time.perf_counter()
+            timer = start_timer(self.app)
+            status, body, headers = await self.handle(scope, *route)
+            metrics = getattr(self.app, 'metrics', None)
+            if metrics is not None:
+                metrics.observe_request(f"api_v0-1.{route[0]}", scope['method'], status, time.perf_counter() - t0,
+                                        len(body))
+            if timer is not None:
+                header = finish_timer(self.app, timer, method=scope['method'], path=scope['path'],
+                                      endpoint=route[0], status=status)
+                if header is not None:
+                    headers.append((b'server-timing', header.encode()))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json')] + headers,
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.es_util.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def route(self, scope):
+        """Return (endpoint, view args, query args) if served here, otherwise None."""
+        if scope['method'] != 'GET':
+            return None
+
+        headers = dict(scope.get('headers', []))
+        path = scope['path']
+        script_name = headers.get(b'x-script-name', b'').decode() or \
+            scope.get('root_path', '') or self.app.config.get('HTTP_X_SCRIPT_NAME', '')
+        if script_name and path.startswith(script_name):
+            path = path[len(script_name):]
+
+        try:
+            endpoint, view_args = self.urls.match(path, 'GET')
+        except (HTTPException, RequestRedirect):
+            return None
+        endpoint = endpoint.rsplit('.', 1)[-1]
+        if endpoint not in HANDLERS:
+            return None
+
+        args = MultiDict(parse_qsl(scope.get('query_string', b'').decode(), keep_blank_values=True))
+        if 'cursor' in args:
+            return None  # point-in-time paging stays on the sync path
+        return endpoint, view_args, args
+
+    def serialize(self, endpoint, data):
+        """Return JSON body of data marshalled with the model of endpoint."""
+        fast = self.app.config.get('FAST_JSON', False)
+        with phase('marshal'):
+            data = apply_plan(self.plans[endpoint], data) if fast else marshal(data, self.models[endpoint])
+        with phase('serialize'):
+            return dumps(data) if fast else json.dumps(data).encode()
+
+    def verify(self, token):
+        """Return (error, JWT subject) of verify_token."""
+        with self.app.app_context():
+            error = verify_token(token)
+            return error, g.get('token_sub', None)
+
+    async def handle(self, scope, endpoint, view_args, args):
+        """Return (status, JSON body, extra headers) of a request to endpoint."""
+        config = self.app.config
+        headers = dict(scope.get('headers', []))
+
+        # the rate limiter storage may be remote (e.g. redis://), so it is called off the event loop
+        # like token verification
+        loop = asyncio.get_running_loop()
+        client = (scope.get('client') or ('127.0.0.1', 0))[0]
+        if limiter.enabled and config.get('RATELIMIT_ENABLED', True):
+            if not await loop.run_in_executor(None, limiter.limiter.hit, RATE_LIMIT, 'asgi', endpoint, client):
+                return 429, json.dumps({'success': False, 'message': "Too Many Requests"}).encode(), []
+
+        t0 = time.time()
+        auth_secs = sub = None
+        if config.get('AUTH', False) is not False:
+            token = headers.get(b'x-api-key', None)
+            error, sub = await loop.run_in_executor(None, self.verify, token.decode() if token is not None else None)
+            auth_secs = time.time() - t0
+            timer = get_timer()
+            if timer is not None:
+                timer.add('auth', auth_secs)
+            if error is not None:
+                self.app.token_cache.record(auth_secs, auth_secs)
+                return error[1], json.dumps(error[0]).encode(), []
+
+        admission = getattr(self.app, 'admission', None)
+        if admission is not None:
+            rejection = await loop.run_in_executor(None, admission.admit, endpoint, args,
+                                                   sub if sub is not None else client)
+            if rejection is not None:
+                data, status, extra = rejection
+                return status, json.dumps(data).encode(), [(k.lower().encode(), v.encode()) for k, v in extra.items()]
+
+        handler, takes_polygon = HANDLERS[endpoint]
+        r = SimpleNamespace(args=args, form=MultiDict())
+        try:
+            if takes_polygon:
+                try:
+                    view_args['polygon'] = polygon_arg(r)
+                except ValueError as e:
+                    return 400, self.serialize(endpoint, {'success': False, 'message': str(e)}), []
+            with phase('handler'):
+                status, data = 200, await handler(self.es_util, config["ES_INDEX"], r, **view_args)
+        except Exception as e:
+            self.app.logger.error(traceback.format_exc())
+            status, data = 500, {'success': False, 'message': str(e)}
+        finally:
+            if admission is not None:
+                admission.release()
+            if auth_secs is not None:
+                self.app.token_cache.record(auth_secs, time.time() - t0)
+        return status, self.serialize(endpoint, data), []
+
+
+def create_asgi_app(object_name):
+    """Return ASGI application of create_app(object_name).
+
+    Arguments:
+        object_name: the python path of the config object,
+                     e.g. pele.settings.ProductionConfig
+    """
+
+    app = create_app(object_name)
+
+    # the queries are built by the QueryES of the app, sharing its in-process caches
+    es_util = AsyncQueryES(get_async_es_client(app.config), app.es_util)
+    app.async_es_util = es_util
+
+    return AsyncApp(app, es_util)
@@ -1,11 +1,16 @@
 from functools import wraps
+import time
 import traceback
 import jwt
 
-from flask import request, current_app
+from flask import g, request, current_app, has_app_context
+from sqlalchemy import event, inspect
+from werkzeug.wrappers import Response as ResponseBase
 
 from pele import login_manager
 from pele.models.user import User
+from pele.lib.timing import get_timer
+from pele.lib import conditional
 
 
 authorizations = {
@@ -17,52 +22,145 @@ authorizations = {
 }
 
 
-def token_required(f):
-    @wraps(f)
-    def _verify(*args, **kwargs):
-        if current_app.config.get('AUTH', False) is False:
-            return f(*args, **kwargs)
+def verify_token(token):
+    """Verify API token. Verified tokens and existing users are cached in current_app.token_cache; the
+    JWT subject of a valid token is kept in g.token_sub for the rest of the request.
 
-        invalid_msg = {
-            'message': 'Invalid token. Registeration and/or authentication required',
-            'success': False
-        }
-        expired_msg = {
-            'message': 'Expired token. Reauthentication required.',
-            'success': False
-        }
+    :param token: API token (X-API-KEY header)
+    :return: None if valid, otherwise (error message, status code)
+    """
 
-        token = request.headers.get('X-API-KEY', None)
-        current_app.logger.debug(f"token: {token}")
-        if token is None:
-            return invalid_msg, 401
+    invalid_msg = {
+        'message': 'Invalid token. Registeration and/or authentication required',
+        'success': False
+    }
+    expired_msg = {
+        'message': 'Expired token. Reauthentication required.',
+        'success': False
+    }
 
-        try:
+    current_app.logger.debug("token: %s", token)
+    if token is None:
+        return invalid_msg, 401
+
+    try:
+        token_cache = current_app.token_cache
+        sub = token_cache.get_token(token)
+        if sub is None:
             data = jwt.decode(token, current_app.config['SECRET_KEY'])
-            current_app.logger.debug(f"data: {data}")
-            user = User.query.filter_by(email=data['sub']).first()
+            current_app.logger.debug("data: %s", data)
+            sub = data['sub']
+            token_cache.set_token(token, sub, data.get('exp', None))
+        if not token_cache.user_exists(sub):
+            user = User.query.filter_by(email=sub).first()
             if not user:
                 return {
                     'message': 'User not found',
                     'success': False
                 }, 401
+            token_cache.set_user(sub)
+        g.token_sub = sub
+        return None
+    except jwt.ExpiredSignatureError:
+        current_app.logger.debug("jwt.ExpiredSignatureError", exc_info=True)
+        return expired_msg, 401
+    except jwt.InvalidTokenError:
+        current_app.logger.debug("jwt.InvalidTokenError", exc_info=True)
+        return invalid_msg, 401
+    except Exception as e:
+        current_app.logger.error(traceback.format_exc())
+        return {
+            'message': f"Unknown error: {str(e)}",
+            'success': False
+        }, 401
+
+
+def token_required(f):
+    @wraps(f)
+    def _verify(*args, **kwargs):
+        if current_app.config.get('AUTH', False) is False:
             return f(*args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            current_app.logger.debug(f"jwt.ExpiredSignatureError: {traceback.format_exc()}")
-            return expired_msg, 401
-        except jwt.InvalidTokenError:
-            current_app.logger.debug(f"jwt.InvalidTokenError: {traceback.format_exc()}")
-            return invalid_msg, 401
-        except Exception as e:
-            current_app.logger.error(traceback.format_exc())
-            return {
-                'message': f"Unknown error: {str(e)}",
-                'success': False
-            }, 401
+
+        t0 = time.time()
+        error = verify_token(request.headers.get('X-API-KEY', None))
+        auth_secs = time.time() - t0
+        timer = get_timer()
+        if timer is not None:
+            timer.add('auth', auth_secs)
+        if error is not None:
+            current_app.token_cache.record(auth_secs, auth_secs)
+            return error
+        try:
+            return f(*args, **kwargs)
+        finally:
+            current_app.token_cache.record(auth_secs, time.time() - t0)
 
     return _verify
 
 
+def request_user():
+    """Return JWT subject of the API token verified by token_required, or the remote address without one."""
+    sub = g.get('token_sub', None)
+    return sub if sub is not None else request.remote_addr
+
+
+def conditional_get(f):
+    """Answer GET requests whose validators match the current index state with a 304 before running f
+    (CONDITIONAL_GET); place it after token_required and before admission_required."""
+    @wraps(f)
+    def _conditional(*args, **kwargs):
+        if request.method != 'GET' or not current_app.config.get('CONDITIONAL_GET', False):
+            return f(*args, **kwargs)
+        not_modified = conditional.check(request.endpoint.rsplit('.', 1)[-1])
+        if not_modified is not None:
+            return not_modified
+        return f(*args, **kwargs)
+
+    return _conditional
+
+
+def admission_required(f):
+    """Admit the request through current_app.admission (ADMISSION_CONTROL) before running f; place it
+    after token_required. The slot of a streamed response is released when the stream is closed."""
+    @wraps(f)
+    def _admit(*args, **kwargs):
+        admission = getattr(current_app, 'admission', None)
+        if admission is None:
+            return f(*args, **kwargs)
+
+        params = request.get_json(silent=True) if request.is_json else request.values
+        rejection = admission.admit(request.endpoint.rsplit('.', 1)[-1], params if params is not None else {},
+                                    request_user())
+        if rejection is not None:
+            return rejection
+        try:
+            resp = f(*args, **kwargs)
+        except Exception:
+            admission.release()
+            raise
+        if isinstance(resp, ResponseBase) and resp.is_streamed:
+            resp.call_on_close(admission.release)
+        else:
+            admission.release()
+        return resp
+
+    return _admit
+
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_user(mapper, connection, target):
+    """Drop cached existence of a user when it is added, changed or removed through the ORM. Only the cache
+    of this process is invalidated, and bulk query deletes fire no event; other removals are seen within
+    USER_CACHE_TTL seconds."""
+    if has_app_context() and hasattr(current_app, 'token_cache'):
+        current_app.token_cache.invalidate_user(target.email)
+        history = inspect(target).attrs.email.history
+        for email in history.deleted or ():
+            current_app.token_cache.invalidate_user(email)
+
+
 @login_manager.user_loader
 def load_user(username):
     return User.query.get(username)
@@ -1,2 +1,2 @@
 from .config import services
-from . import default, test, datasets, model
+from . import default, test, datasets, export, summary, histogram, model, stats
@@ -1,7 +1,8 @@
 from flask import Blueprint
-from flask_restx import Api
+from flask_restx import Api, representations
 
 from pele.controllers import authorizations
+from pele.lib.timing import phase
 
 
 services = Blueprint('api_v0-1', __name__, url_prefix='/api/v0.1')
@@ -10,6 +11,13 @@ api = Api(services, ui=False, version="0.1", title="Pele REST API",
           authorizations=authorizations)
 
 
+@api.representation('application/json')
+def output_json(data, code, headers=None):
+    with phase('serialize'):
+        return representations.output_json(data, code, headers)
+
+
 # namespaces
 test_ns = api.namespace('test', description="test operations")
 pele_ns = api.namespace('pele', description="pele operations")
+stats_ns = api.namespace('stats', description="stats operations")
@@ -1,10 +1,12 @@
+import json
 import traceback
-from flask import current_app, request
+from flask import current_app, request, Response, stream_with_context
 from flask_restx import Resource, fields
 
 from pele import limiter
-from pele.controllers import token_required
-from pele.lib.query import get_page_size_and_offset, parse_polygon
+from pele.controllers import token_required, conditional_get, admission_required
+from pele.lib.query import get_page_size, get_page_size_and_offset, get_cursor, parse_polygon
+from pele.lib.fast_json import marshal_with as fast_marshal_with
 from pele.controllers.api_v01.config import api, pele_ns
 from pele.controllers.api_v01.model import METADATA_MODEL
 
@@ -12,6 +14,7 @@ from pele.controllers.api_v01.model import METADATA_MODEL
 @pele_ns.route('/types', endpoint='types')
 @pele_ns.param('offset', 'offset', type=int)
 @pele_ns.param('page_size', 'page size', type=int)
+@pele_ns.param('cursor', 'cursor of the page to return; pass an empty cursor to start cursor paging')
 @api.doc(responses={200: "Success",
                     400: "Invalid parameters",
                     401: "Unathorized",
@@ -28,16 +31,38 @@ class Types(Resource):
         'count': fields.Integer(description="count"),
         'page_size': fields.Integer(description="page size"),
         'offset': fields.Integer(description="starting offset (0 index)"),
+        'next': fields.String(description="cursor of the next page (cursor paging only)"),
     })
 
     decorators = [limiter.limit("10/second")]
 
     @token_required
+    @conditional_get
+    @admission_required
     @api.marshal_with(model)
     @api.doc(security='apikey')
     def get(self):
+        try:
+            cursor = get_cursor(request)
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
         try:
             index = current_app.config["ES_INDEX"]
+            if cursor is not None:
+                page_size = get_page_size(request)
+                types, next_cursor = current_app.es_util.query_types_after(index, cursor, page_size)
+                return {
+                    'success': True,
+                    'count': len(types),
+                    'page_size': page_size,
+                    'next': next_cursor,
+                    'types': types
+                }
+
             page_size, offset = get_page_size_and_offset(request)
             total, types = current_app.es_util.query_types(index, offset, page_size)
             return {
@@ -59,6 +84,7 @@ class Types(Resource):
 @pele_ns.route('/datasets', endpoint='datasets')
 @pele_ns.param('offset', 'offset', type=int)
 @pele_ns.param('page_size', 'page size', type=int)
+@pele_ns.param('cursor', 'cursor of the page to return; pass an empty cursor to start cursor paging')
 @api.doc(responses={200: "Success",
                     400: "Invalid parameters",
                     401: "Unathorized",
@@ -74,16 +100,38 @@ class Datasets(Resource):
         'count': fields.Integer(description="count"),
         'page_size': fields.Integer(description="page size"),
         'offset': fields.Integer(description="starting offset (0 index)"),
+        'next': fields.String(description="cursor of the next page (cursor paging only)"),
     })
 
     decorators = [limiter.limit("10/second")]
 
     @token_required
+    @conditional_get
+    @admission_required
     @api.marshal_with(model)
     @api.doc(security='apikey')
     def get(self):
+        try:
+            cursor = get_cursor(request)
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
         try:
             index = current_app.config["ES_INDEX"]
+            if cursor is not None:
+                page_size = get_page_size(request)
+                datasets, next_cursor = current_app.es_util.query_datasets_after(index, cursor, page_size)
+                return {
+                    'success': True,
+                    'count': len(datasets),
+                    'page_size': page_size,
+                    'next': next_cursor,
+                    'datasets': datasets
+                }
+
             page_size, offset = get_page_size_and_offset(request)
             total, datasets = current_app.es_util.query_datasets(index, offset, page_size)
             return {
@@ -106,6 +154,7 @@ class Datasets(Resource):
 @pele_ns.param('type_name', 'type name')
 @pele_ns.param('offset', 'offset', type=int)
 @pele_ns.param('page_size', 'page size', type=int)
+@pele_ns.param('cursor', 'cursor of the page to return; pass an empty cursor to start cursor paging')
 @api.doc(responses={200: "Success",
                     400: "Invalid parameters",
                     401: "Unathorized",
@@ -121,16 +170,38 @@ class DatasetsByType(Resource):
         'count': fields.Integer(description="count"),
         'page_size': fields.Integer(description="page size"),
         'offset': fields.Integer(description="starting offset (0 index)"),
+        'next': fields.String(description="cursor of the next page (cursor paging only)"),
     })
 
     decorators = [limiter.limit("10/second")]
 
     @token_required
+    @conditional_get
+    @admission_required
     @api.marshal_with(model)
     @api.doc(security='apikey')
     def get(self, type_name):
+        try:
+            cursor = get_cursor(request)
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
         try:
             index = current_app.config["ES_INDEX"]
+            if cursor is not None:
+                page_size = get_page_size(request)
+                datasets, next_cursor = current_app.es_util.query_datasets_by_type_after(index, type_name, cursor, page_size)
+                return {
+                    'success': True,
+                    'count': len(datasets),
+                    'page_size': page_size,
+                    'next': next_cursor,
+                    'datasets': datasets
+                }
+
             page_size, offset = get_page_size_and_offset(request)
             total, datasets = current_app.es_util.query_datasets_by_type(index, type_name, offset, page_size)
             return {
@@ -153,6 +224,7 @@ class DatasetsByType(Resource):
 @pele_ns.param('dataset_name', 'dataset name')
 @pele_ns.param('offset', 'offset', type=int)
 @pele_ns.param('page_size', 'page size', type=int)
+@pele_ns.param('cursor', 'cursor of the page to return; pass an empty cursor to start cursor paging')
 @api.doc(responses={200: "Success",
                     400: "Invalid parameters",
                     401: "Unathorized",
@@ -168,16 +240,38 @@ class TypesByDataset(Resource):
         'count': fields.Integer(description="count"),
         'page_size': fields.Integer(description="page size"),
         'offset': fields.Integer(description="starting offset (0 index)"),
+        'next': fields.String(description="cursor of the next page (cursor paging only)"),
     })
 
     decorators = [limiter.limit("10/second")]
 
     @token_required
+    @conditional_get
+    @admission_required
     @api.marshal_with(model)
     @api.doc(security='apikey')
     def get(self, dataset_name):
+        try:
+            cursor = get_cursor(request)
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
         try:
             index = current_app.config["ES_INDEX"]
+            if cursor is not None:
+                page_size = get_page_size(request)
+                types, next_cursor = current_app.es_util.query_types_by_dataset_after(index, dataset_name, cursor, page_size)
+                return {
+                    'success': True,
+                    'count': len(types),
+                    'page_size': page_size,
+                    'next': next_cursor,
+                    'types': types
+                }
+
             page_size, offset = get_page_size_and_offset(request)
             total, types = current_app.es_util.query_types_by_dataset(index, dataset_name, offset, page_size)
             return {
@@ -200,6 +294,7 @@ class TypesByDataset(Resource):
 @pele_ns.param('dataset_name', 'dataset name')
 @pele_ns.param('offset', 'offset', type=int)
 @pele_ns.param('page_size', 'page size', type=int)
+@pele_ns.param('cursor', 'cursor of the page to return; pass an empty cursor to start cursor paging')
 @api.doc(responses={200: "Success",
                     400: "Invalid parameters",
                     401: "Unathorized",
@@ -217,6 +312,8 @@ class IdsByDataset(Resource):
     json_parser.add_argument('start_time', location='json', help="GTE to start_time field", required=False)
     json_parser.add_argument('end_time', location='json', help="Less than to end_time field", required=False)
     json_parser.add_argument('polygon', location='json', type=list, help="Bounding geo-polygon", required=False)
+    json_parser.add_argument('cursor', location='json', required=False,
+                             help="cursor of the page to return; pass an empty cursor to start cursor paging")
 
     model = api.model('IdsByDataset', {
         'success': fields.Boolean(description="success flag"),
@@ -226,13 +323,16 @@ class IdsByDataset(Resource):
         'count': fields.Integer(description="count"),
         'page_size': fields.Integer(description="page size"),
         'offset': fields.Integer(description="starting offset (0 index)"),
+        'next': fields.String(description="cursor of the next page (cursor paging only)"),
     })
 
     decorators = [limiter.limit("10/second")]
 
     @token_required
+    @conditional_get
+    @admission_required
     @pele_ns.expect(arg_parser)
-    @api.marshal_with(model)
+    @fast_marshal_with(api, model)
     @api.doc(security='apikey')
     def get(self, dataset_name):
         start_time = request.args.get('start_time', None)
@@ -248,8 +348,30 @@ class IdsByDataset(Resource):
                     'message': str(e)
                 }, 400
 
+        try:
+            cursor = get_cursor(request)
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
         try:
             index = current_app.config["ES_INDEX"]
+            if cursor is not None:
+                page_size = get_page_size(request)
+                total, ids, next_cursor = current_app.es_util.query_ids_by_dataset_after(
+                    index, dataset_name, cursor, page_size, start_time=start_time, end_time=end_time,
+                    polygon=polygon)
+                return {
+                    'success': True,
+                    'total': total,
+                    'count': len(ids),
+                    'page_size': page_size,
+                    'next': next_cursor,
+                    'dataset_ids': ids
+                }
+
             page_size, offset = get_page_size_and_offset(request)
             total, ids = current_app.es_util.query_ids_by_dataset(index, dataset_name, offset, page_size,
                                                                   start_time=start_time, end_time=end_time,
@@ -270,8 +392,9 @@ class IdsByDataset(Resource):
             }, 500
 
     @token_required
+    @admission_required
     @pele_ns.expect(json_parser)
-    @api.marshal_with(model)
+    @fast_marshal_with(api, model)
     @api.doc(security='apikey')
     def post(self, dataset_name):
         request_json = request.get_json()
@@ -279,8 +402,39 @@ class IdsByDataset(Resource):
         end_time = request_json.get('end_time', None)
         polygon = request_json.get('polygon', None)
 
+        if polygon is not None:
+            try:
+                polygon = parse_polygon(polygon)
+            except Exception as e:
+                return {
+                    'success': False,
+                    'message': str(e)
+                }, 400
+
+        try:
+            cursor = get_cursor(request, request_json)
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
         try:
             index = current_app.config["ES_INDEX"]
+            if cursor is not None:
+                page_size = get_page_size(request)
+                total, ids, next_cursor = current_app.es_util.query_ids_by_dataset_after(
+                    index, dataset_name, cursor, page_size, start_time=start_time, end_time=end_time,
+                    polygon=polygon)
+                return {
+                    'success': True,
+                    'total': total,
+                    'count': len(ids),
+                    'page_size': page_size,
+                    'next': next_cursor,
+                    'dataset_ids': ids
+                }
+
             page_size, offset = get_page_size_and_offset(request)
             total, ids = current_app.es_util.query_ids_by_dataset(index, dataset_name, offset, page_size,
                                                                   start_time=start_time, end_time=end_time,
@@ -305,6 +459,7 @@ class IdsByDataset(Resource):
 @pele_ns.param('type_name', 'type name')
 @pele_ns.param('offset', 'offset', type=int)
 @pele_ns.param('page_size', 'page size', type=int)
+@pele_ns.param('cursor', 'cursor of the page to return; pass an empty cursor to start cursor paging')
 @api.doc(responses={200: "Success",
                     400: "Invalid parameters",
                     401: "Unathorized",
@@ -322,6 +477,8 @@ class IdsByType(Resource):
     json_parser.add_argument('start_time', location='json', help="GTE to start_time field", required=False)
     json_parser.add_argument('end_time', location='json', help="Less than to end_time field", required=False)
     json_parser.add_argument('polygon', location='json', type=list, help="Bounding geo-polygon", required=False)
+    json_parser.add_argument('cursor', location='json', required=False,
+                             help="cursor of the page to return; pass an empty cursor to start cursor paging")
 
     model = api.model('IdsByType', {
         'success': fields.Boolean(description="success flag"),
@@ -331,13 +488,16 @@ class IdsByType(Resource):
         'count': fields.Integer(description="count"),
         'page_size': fields.Integer(description="page size"),
         'offset': fields.Integer(description="starting offset (0 index)"),
+        'next': fields.String(description="cursor of the next page (cursor paging only)"),
     })
 
     decorators = [limiter.limit("10/second")]
 
     @token_required
+    @conditional_get
+    @admission_required
     @pele_ns.expect(arg_parser)
-    @api.marshal_with(model)
+    @fast_marshal_with(api, model)
     @api.doc(security='apikey')
     def get(self, type_name):
         start_time = request.args.get('start_time', None)
@@ -353,8 +513,30 @@ class IdsByType(Resource):
                     'message': str(e)
                 }, 400
 
+        try:
+            cursor = get_cursor(request)
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
         try:
             index = current_app.config["ES_INDEX"]
+            if cursor is not None:
+                page_size = get_page_size(request)
+                total, ids, next_cursor = current_app.es_util.query_ids_by_type_after(
+                    index, type_name, cursor, page_size, start_time=start_time, end_time=end_time,
+                    polygon=polygon)
+                return {
+                    'success': True,
+                    'total': total,
+                    'count': len(ids),
+                    'page_size': page_size,
+                    'next': next_cursor,
+                    'dataset_ids': ids
+                }
+
             page_size, offset = get_page_size_and_offset(request)
             total, ids = current_app.es_util.query_ids_by_type(index, type_name, offset, page_size,
                                                                start_time=start_time, end_time=end_time,
@@ -375,8 +557,9 @@ class IdsByType(Resource):
             }, 500
 
     @token_required
+    @admission_required
     @pele_ns.expect(json_parser)
-    @api.marshal_with(model)
+    @fast_marshal_with(api, model)
     @api.doc(security='apikey')
     def post(self, type_name):
         request_json = request.get_json()
@@ -384,8 +567,39 @@ class IdsByType(Resource):
         end_time = request_json.get('end_time', None)
         polygon = request_json.get('polygon', None)
 
+        if polygon is not None:
+            try:
+                polygon = parse_polygon(polygon)
+            except Exception as e:
+                return {
+                    'success': False,
+                    'message': str(e)
+                }, 400
+
+        try:
+            cursor = get_cursor(request, request_json)
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
         try:
             index = current_app.config["ES_INDEX"]
+            if cursor is not None:
+                page_size = get_page_size(request)
+                total, ids, next_cursor = current_app.es_util.query_ids_by_type_after(
+                    index, type_name, cursor, page_size, start_time=start_time, end_time=end_time,
+                    polygon=polygon)
+                return {
+                    'success': True,
+                    'total': total,
+                    'count': len(ids),
+                    'page_size': page_size,
+                    'next': next_cursor,
+                    'dataset_ids': ids
+                }
+
             page_size, offset = get_page_size_and_offset(request)
             total, ids = current_app.es_util.query_ids_by_type(index, type_name, offset, page_size,
                                                                start_time=start_time, end_time=end_time,
@@ -408,6 +622,7 @@ class IdsByType(Resource):
 
 @pele_ns.route('/dataset/<string:dataset_id>', endpoint='dataset_by_id')
 @pele_ns.param('dataset_id', 'dataset ID')
+@pele_ns.param('fields', 'comma-separated fields to return (default all)')
 @api.doc(responses={200: "Success",
                     400: "Invalid parameters",
                     401: "Unathorized",
@@ -424,17 +639,110 @@ class MetadataById(Resource):
     decorators = [limiter.limit("10/second")]
 
     @token_required
-    @api.marshal_with(model)
+    @conditional_get
+    @admission_required
+    @fast_marshal_with(api, model)
     @api.doc(security='apikey')
     def get(self, dataset_id):
         index = current_app.config["ES_INDEX"]
-        result = current_app.es_util.query_id(index, dataset_id)
+        ret_fields = request.args.get('fields', None)
+        ret_fields = [i.strip() for i in ret_fields.split(',') if i.strip()] if ret_fields else None
+        result = current_app.es_util.query_id(index, dataset_id, fields=ret_fields)
         return {
             'success': True,
             'result': result
         }
 
 
+@pele_ns.route('/datasets/lookup', endpoint='datasets_by_ids')
+@api.doc(responses={200: "Success",
+                    400: "Invalid parameters",
+                    401: "Unathorized",
+                    500: "Execution failed"},
+         description="Get metadata of a batch of dataset IDs in input order; IDs not found are null in results and "
+                     "listed in missing. Large batches are streamed.")
+class MetadataByIds(Resource):
+    """Get metadata of a batch of dataset IDs."""
+
+    json_parser = pele_ns.parser()
+    json_parser.add_argument('ids', location='json', type=list, help="dataset IDs", required=True)
+    json_parser.add_argument('fields', location='json', type=list, help="fields to return (default all)",
+                             required=False)
+
+    model = api.model('MetadataByIds', {
+        'success': fields.Boolean(description="success flag"),
+        'message': fields.String(description="message"),
+        'results': fields.List(fields.Raw, description="documents in input order (null if not found)"),
+        'missing': fields.List(fields.String, description="dataset IDs not found"),
+        'count': fields.Integer(description="count"),
+    })
+
+    decorators = [limiter.limit("10/second")]
+
+    @token_required
+    @admission_required
+    @pele_ns.expect(json_parser)
+    @api.response(200, "Success", model)
+    @api.doc(security='apikey')
+    def post(self):
+        request_json = request.get_json() or {}
+        ids = request_json.get('ids', None)
+        ret_fields = request_json.get('fields', None)
+
+        max_batch_size = current_app.config.get('MAX_BATCH_SIZE', 10000)
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            return {
+                'success': False,
+                'message': "ids must be a list of dataset IDs"
+            }, 400
+        if len(ids) > max_batch_size:
+            return {
+                'success': False,
+                'message': "Maximum batch size is {}.".format(max_batch_size)
+            }, 400
+
+        index = current_app.config["ES_INDEX"]
+        chunk_size = current_app.config.get('BATCH_STREAM_THRESHOLD', 1000)
+        if len(ids) > chunk_size:
+            return Response(stream_with_context(self.stream(index, ids, ret_fields, chunk_size)),
+                            mimetype='application/json')
+
+        try:
+            docs = current_app.es_util.query_ids(index, ids, fields=ret_fields) if ids else {}
+            return {
+                'success': True,
+                'count': len(ids),
+                'results': [docs.get(i, None) for i in ids],
+                'missing': [i for i in ids if i not in docs]
+            }
+        except Exception as e:
+            current_app.logger.error(traceback.format_exc())
+            return {
+                'success': False,
+                'message': str(e),
+            }, 500
+
+    @staticmethod
+    def stream(index, ids, ret_fields, chunk_size):
+        """Yield the response document chunk by chunk, querying chunk_size IDs at a time; the status is
+        only known at the end, so success, missing and message follow the results."""
+        missing = []
+        yield '{"count": %d, "results": [' % len(ids)
+        try:
+            for i in range(0, len(ids), chunk_size):
+                chunk = ids[i:i + chunk_size]
+                docs = current_app.es_util.query_ids(index, chunk, fields=ret_fields)
+                missing.extend(j for j in chunk if j not in docs)
+                results = ','.join(json.dumps(docs.get(j, None)) for j in chunk)
+                yield results if i == 0 else ',' + results
+        except Exception as e:
+            # the status line is already sent; report the failure in the document
+            current_app.logger.error(traceback.format_exc())
+            yield '], "success": false, "message": %s}' % json.dumps(str(e))
+            return
+        yield '], "success": true, "missing": %s}' % json.dumps(missing)
+
+
 @pele_ns.route('/type/<string:type_name>/dataset/<string:dataset_name>/<list:ret_fields>',
                endpoint='fields_by_type_and_dataset')
 @pele_ns.param('type_name', 'type name')
@@ -442,6 +750,7 @@ class MetadataById(Resource):
 @pele_ns.param('ret_fields', 'comma-separated fields to return')
 @pele_ns.param('offset', 'offset', type=int)
 @pele_ns.param('page_size', 'page size', type=int)
+@pele_ns.param('cursor', 'cursor of the page to return; pass an empty cursor to start cursor paging')
 @api.doc(responses={200: "Success",
                     400: "Invalid parameters",
                     401: "Unathorized",
@@ -459,6 +768,8 @@ class FieldsByTypeDataset(Resource):
     json_parser.add_argument('start_time', location='json', help="GTE to start_time field", required=False)
     json_parser.add_argument('end_time', location='json', help="Less than to end_time field", required=False)
     json_parser.add_argument('polygon', location='json', type=list, help="Bounding geo-polygon", required=False)
+    json_parser.add_argument('cursor', location='json', required=False,
+                             help="cursor of the page to return; pass an empty cursor to start cursor paging")
 
     model = api.model('FieldsByTypeDataset', {
         'success': fields.Boolean(description="success flag"),
@@ -468,13 +779,16 @@ class FieldsByTypeDataset(Resource):
         'count': fields.Integer(description="count"),
         'page_size': fields.Integer(description="page size"),
         'offset': fields.Integer(description="starting offset (0 index)"),
+        'next': fields.String(description="cursor of the next page (cursor paging only)"),
     })
 
     decorators = [limiter.limit("10/second")]
 
     @token_required
+    @conditional_get
+    @admission_required
     @pele_ns.expect(arg_parser)
-    @api.marshal_with(model)
+    @fast_marshal_with(api, model)
     @api.doc(security='apikey')
     def get(self, type_name, dataset_name, ret_fields):
         start_time = request.args.get('start_time', None)
@@ -494,9 +808,31 @@ class FieldsByTypeDataset(Resource):
             'dataset_type.keyword': type_name,
             'dataset.keyword': dataset_name,
         }
+        try:
+            cursor = get_cursor(request)
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
         try:
             index = current_app.config["ES_INDEX"]
             index = f"{index}_*_{dataset_name.lower()}"
+            if cursor is not None:
+                page_size = get_page_size(request)
+                total, docs, next_cursor = current_app.es_util.query_fields_after(
+                    index, terms, ret_fields, cursor, page_size, start_time=start_time, end_time=end_time,
+                    polygon=polygon)
+                return {
+                    'success': True,
+                    'total': total,
+                    'count': len(docs),
+                    'page_size': page_size,
+                    'next': next_cursor,
+                    'results': docs
+                }
+
             page_size, offset = get_page_size_and_offset(request)
             total, docs = current_app.es_util.query_fields(index, terms, ret_fields, offset, page_size,
                                                            start_time=start_time, end_time=end_time,
@@ -517,21 +853,53 @@ class FieldsByTypeDataset(Resource):
             }, 500
 
     @token_required
+    @admission_required
     @pele_ns.expect(json_parser)
-    @api.marshal_with(model)
+    @fast_marshal_with(api, model)
     @api.doc(security='apikey')
     def post(self, type_name, dataset_name, ret_fields):
         start_time = request.args.get('start_time', None)
         end_time = request.args.get('end_time', None)
         polygon = request.args.get('polygon', None)
 
+        if polygon is not None:
+            try:
+                polygon = parse_polygon(polygon)
+            except Exception as e:
+                return {
+                    'success': False,
+                    'message': str(e)
+                }, 400
+
         terms = {
             'dataset_type.keyword': type_name,
             'dataset.keyword': dataset_name,
         }
+        try:
+            cursor = get_cursor(request, request.get_json(silent=True))
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
         try:
             index = current_app.config["ES_INDEX"]
             index = f"{index}_*_{dataset_name.lower()}"
+            if cursor is not None:
+                page_size = get_page_size(request)
+                total, docs, next_cursor = current_app.es_util.query_fields_after(
+                    index, terms, ret_fields, cursor, page_size, start_time=start_time, end_time=end_time,
+                    polygon=polygon)
+                return {
+                    'success': True,
+                    'total': total,
+                    'count': len(docs),
+                    'page_size': page_size,
+                    'next': next_cursor,
+                    'results': docs
+                }
+
             page_size, offset = get_page_size_and_offset(request)
             total, docs = current_app.es_util.query_fields(index, terms, ret_fields, offset, page_size,
                                                            start_time=start_time, end_time=end_time,
@@ -577,7 +945,9 @@ class OverlapsById(Resource):
     decorators = [limiter.limit("10/second")]
 
     @token_required
-    @api.marshal_with(model)
+    @conditional_get
+    @admission_required
+    @fast_marshal_with(api, model)
     @api.doc(security='apikey')
     def get(self, dataset_id, ret_fields):
         try:
@@ -629,7 +999,9 @@ class OverlapsByIdTypeDataset(Resource):
     decorators = [limiter.limit("10/second")]
 
     @token_required
-    @api.marshal_with(model)
+    @conditional_get
+    @admission_required
+    @fast_marshal_with(api, model)
     @api.doc(security='apikey')
     def get(self, dataset_id, type_name, dataset_name, ret_fields):
         terms = {
@@ -654,3 +1026,64 @@ class OverlapsByIdTypeDataset(Resource):
                 'success': False,
                 'message': str(e),
             }, 500
+
+
+@pele_ns.route('/batch', endpoint='batch')
+@api.doc(responses={200: "Success",
+                    400: "Invalid parameters",
+                    401: "Unathorized",
+                    500: "Execution failed"},
+         description="Run a batch of queries in a single Elasticsearch round trip. Each query descriptor names one "
+                     "of ids_by_dataset (dataset), ids_by_type (type), fields (type, dataset, fields) or overlaps "
+                     "(id, fields, optional type and dataset) and takes offset, page_size and, except overlaps, "
+                     "start_time, end_time and polygon.")
+class Batch(Resource):
+    """Batch of queries."""
+
+    json_parser = pele_ns.parser()
+    json_parser.add_argument('queries', location='json', type=list, help="query descriptors", required=True)
+
+    model = api.model('Batch', {
+        'success': fields.Boolean(description="success flag"),
+        'message': fields.String(description="message"),
+        'results': fields.List(fields.Raw, description="result (success, message, total, results) per query"),
+        'count': fields.Integer(description="count"),
+    })
+
+    decorators = [limiter.limit("10/second")]
+
+    @token_required
+    @admission_required
+    @pele_ns.expect(json_parser)
+    @api.marshal_with(model)
+    @api.doc(security='apikey')
+    def post(self):
+        request_json = request.get_json() or {}
+        queries = request_json.get('queries', None)
+
+        max_batch_queries = current_app.config.get('MAX_BATCH_QUERIES', 100)
+        if not isinstance(queries, list):
+            return {
+                'success': False,
+                'message': "queries must be a list of query descriptors"
+            }, 400
+        if len(queries) > max_batch_queries:
+            return {
+                'success': False,
+                'message': "Maximum number of queries is {}.".format(max_batch_queries)
+            }, 400
+
+        try:
+            index = current_app.config["ES_INDEX"]
+            results = current_app.es_util.query_batch(index, queries)
+            return {
+                'success': True,
+                'count': len(results),
+                'results': results
+            }
+        except Exception as e:
+            current_app.logger.error(traceback.format_exc())
+            return {
+                'success': False,
+                'message': str(e),
+            }, 500
@@ -0,0 +1,221 @@
+import json
+import traceback
+from flask import current_app, request, Response, stream_with_context
+from flask_restx import Resource
+
+from pele import limiter
+from pele.controllers import token_required, conditional_get, admission_required
+from pele.lib.query import decode_cursor, parse_polygon
+from pele.lib.stream import accepts_gzip, ndjson_pages, gzip_chunks
+from pele.controllers.api_v01.config import api, pele_ns
+
+
+def export_response(pages):
+    """Return streaming NDJSON response of pages of (records, next cursor), gzipped if the client accepts it."""
+
+    def generate():
+        try:
+            yield from ndjson_pages(pages)
+        except Exception as e:
+            # the status line is already sent; leave an error record instead of the final {"next": null}
+            current_app.logger.error(traceback.format_exc())
+            yield (json.dumps({'error': str(e)}) + '\n').encode()
+
+    chunks = stream_with_context(generate())
+    headers = {'Vary': 'Accept-Encoding'}
+    if accepts_gzip(request):
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(chunks, mimetype='application/x-ndjson', headers=headers)
+
+
+def export_params(args):
+    """Return validated cursor, start_time, end_time and polygon of an export request."""
+    cursor = args.get('cursor', None)
+    decode_cursor(cursor)
+    polygon = args.get('polygon', None)
+    if polygon is not None:
+        polygon = parse_polygon(polygon)
+    return cursor, args.get('start_time', None), args.get('end_time', None), polygon
+
+
+@pele_ns.route('/export/dataset/<string:dataset_name>/dataset_ids', endpoint='export_ids_by_dataset')
+@pele_ns.param('dataset_name', 'dataset name')
+@pele_ns.param('cursor', 'cursor to resume from (a "next" value of the stream)')
+@api.doc(responses={200: "Success",
+                    400: "Invalid parameters",
+                    401: "Unathorized",
+                    500: "Execution failed"},
+         description="Stream all dataset IDs by dataset name as NDJSON. Every page of records is followed by "
+                     "a {\"next\": <cursor>} line; the stream is complete when next is null.")
+class ExportIdsByDataset(Resource):
+    """Export IDs by dataset name."""
+
+    arg_parser = pele_ns.parser()
+    arg_parser.add_argument('start_time', type=str, help="GTE to start_time field", required=False)
+    arg_parser.add_argument('end_time', type=str, help="Less than to end_time field", required=False)
+    arg_parser.add_argument('polygon', type=str, help="Bounding geo-polygon", required=False)
+
+    json_parser = pele_ns.parser()
+    json_parser.add_argument('start_time', location='json', help="GTE to start_time field", required=False)
+    json_parser.add_argument('end_time', location='json', help="Less than to end_time field", required=False)
+    json_parser.add_argument('polygon', location='json', type=list, help="Bounding geo-polygon", required=False)
+    json_parser.add_argument('cursor', location='json', help="cursor to resume from", required=False)
+
+    decorators = [limiter.limit("1/second")]
+
+    @token_required
+    @conditional_get
+    @admission_required
+    @pele_ns.expect(arg_parser)
+    @api.doc(security='apikey')
+    def get(self, dataset_name):
+        return self.export(dataset_name, request.args)
+
+    @token_required
+    @admission_required
+    @pele_ns.expect(json_parser)
+    @api.doc(security='apikey')
+    def post(self, dataset_name):
+        return self.export(dataset_name, request.get_json() or {})
+
+    @staticmethod
+    def export(dataset_name, args):
+        try:
+            cursor, start_time, end_time, polygon = export_params(args)
+        except Exception as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
+        index = current_app.config["ES_INDEX"]
+        page_size = current_app.config.get('EXPORT_PAGE_SIZE', 1000)
+        pages = current_app.es_util.export_ids_by_dataset(index, dataset_name, cursor=cursor, page_size=page_size,
+                                                          start_time=start_time, end_time=end_time,
+                                                          polygon=polygon)
+        return export_response(pages)
+
+
+@pele_ns.route('/export/type/<string:type_name>/dataset/<string:dataset_name>/<list:ret_fields>',
+               endpoint='export_fields_by_type_and_dataset')
+@pele_ns.param('type_name', 'type name')
+@pele_ns.param('dataset_name', 'dataset name')
+@pele_ns.param('ret_fields', 'comma-separated fields to return')
+@pele_ns.param('cursor', 'cursor to resume from (a "next" value of the stream)')
+@api.doc(responses={200: "Success",
+                    400: "Invalid parameters",
+                    401: "Unathorized",
+                    500: "Execution failed"},
+         description="Stream all dataset results by type name and dataset name as NDJSON. Every page of records "
+                     "is followed by a {\"next\": <cursor>} line; the stream is complete when next is null.")
+class ExportFieldsByTypeDataset(Resource):
+    """Export results by type name and dataset name."""
+
+    arg_parser = ExportIdsByDataset.arg_parser
+    json_parser = ExportIdsByDataset.json_parser
+
+    decorators = [limiter.limit("1/second")]
+
+    @token_required
+    @conditional_get
+    @admission_required
+    @pele_ns.expect(arg_parser)
+    @api.doc(security='apikey')
+    def get(self, type_name, dataset_name, ret_fields):
+        return self.export(type_name, dataset_name, ret_fields, request.args)
+
+    @token_required
+    @admission_required
+    @pele_ns.expect(json_parser)
+    @api.doc(security='apikey')
+    def post(self, type_name, dataset_name, ret_fields):
+        return self.export(type_name, dataset_name, ret_fields, request.get_json() or {})
+
+    @staticmethod
+    def export(type_name, dataset_name, ret_fields, args):
+        try:
+            cursor, start_time, end_time, polygon = export_params(args)
+        except Exception as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
+        terms = {
+            'dataset_type.keyword': type_name,
+            'dataset.keyword': dataset_name,
+        }
+        index = current_app.config["ES_INDEX"]
+        index = f"{index}_*_{dataset_name.lower()}"
+        page_size = current_app.config.get('EXPORT_PAGE_SIZE', 1000)
+        pages = current_app.es_util.export_fields(index, terms, ret_fields, cursor=cursor, page_size=page_size,
+                                                  start_time=start_time, end_time=end_time, polygon=polygon)
+        return export_response(pages)
+
+
+@pele_ns.route('/join/overlaps', endpoint='join_overlaps')
+@api.doc(responses={200: "Success",
+                    400: "Invalid parameters",
+                    401: "Unathorized",
+                    500: "Execution failed"},
+         description="Stream all pairs of source documents (by type name, dataset name and optional start_time, "
+                     "end_time and polygon) and the target documents (by type name and dataset name) that "
+                     "overlap them temporally and spatially as NDJSON {\"source\": <ID>, \"target\": <document>} "
+                     "records; a source with more than JOIN_MAX_MATCHES targets is followed by a "
+                     "{\"source\": <ID>, \"truncated\": true} record. Every page of records is followed by a "
+                     "{\"next\": <cursor>} line; the stream is complete when next is null.")
+class JoinOverlaps(Resource):
+    """Join overlapping documents of two datasets."""
+
+    json_parser = pele_ns.parser()
+    json_parser.add_argument('source', location='json', type=dict, required=True,
+                             help="source documents: type, dataset and optional start_time, end_time and polygon")
+    json_parser.add_argument('target', location='json', type=dict, required=True,
+                             help="target documents: type and dataset")
+    json_parser.add_argument('fields', location='json', type=list, required=True,
+                             help="fields of the target documents to return")
+    json_parser.add_argument('cursor', location='json', help="cursor to resume from", required=False)
+
+    decorators = [limiter.limit("1/second")]
+
+    @token_required
+    @admission_required
+    @pele_ns.expect(json_parser)
+    @api.doc(security='apikey')
+    def post(self):
+        request_json = request.get_json() or {}
+        source = request_json.get('source', None) or {}
+        target = request_json.get('target', None) or {}
+        ret_fields = request_json.get('fields', None)
+        try:
+            cursor, start_time, end_time, polygon = export_params(dict(source, cursor=request_json.get('cursor')))
+            if not isinstance(ret_fields, list) or len(ret_fields) == 0:
+                raise ValueError("fields must be a list of fields to return")
+            terms = {
+                'dataset_type.keyword': source['type'],
+                'dataset.keyword': source['dataset'],
+            }
+            target_terms = {
+                'dataset_type.keyword': target['type'],
+                'dataset.keyword': target['dataset'],
+            }
+        except KeyError as e:
+            return {
+                'success': False,
+                'message': f"Missing parameter: {e.args[0]}"
+            }, 400
+        except Exception as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
+        index = current_app.config["ES_INDEX"]
+        pages = current_app.es_util.join_overlaps(f"{index}_*_{source['dataset'].lower()}", terms,
+                                                  f"{index}_*_{target['dataset'].lower()}", target_terms,
+                                                  ret_fields, cursor=cursor,
+                                                  page_size=current_app.config.get('JOIN_BATCH_SIZE', 100),
+                                                  max_matches=current_app.config.get('JOIN_MAX_MATCHES', 1000),
+                                                  start_time=start_time, end_time=end_time, polygon=polygon)
+        return export_response(pages)
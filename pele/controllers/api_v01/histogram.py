@@ -0,0 +1,118 @@
+import traceback
+from flask import current_app, request
+from flask_restx import Resource, fields
+
+from pele import limiter
+from pele.controllers import token_required, conditional_get, admission_required
+from pele.lib.query import parse_polygon
+from pele.lib.histogram import INTERVALS
+from pele.lib.fast_json import marshal_with as fast_marshal_with
+from pele.controllers.api_v01.config import api, pele_ns
+
+bucket_model = api.model('HistogramBucket', {
+    'start': fields.String(description="start of the bucket (ISO time)"),
+    'count': fields.Integer(description="number of documents starting in the bucket"),
+})
+
+histogram_model = api.model('Histogram', {
+    'success': fields.Boolean(description="success flag"),
+    'message': fields.String(description="message"),
+    'interval': fields.String(description="calendar interval of the buckets"),
+    'histogram': fields.List(fields.Nested(bucket_model), description="non-empty buckets in time order"),
+    'total': fields.Integer(description="total number of documents"),
+    'count': fields.Integer(description="number of buckets"),
+    'cached': fields.Integer(description="number of closed buckets served from the cache"),
+})
+
+histogram_parser = pele_ns.parser()
+histogram_parser.add_argument('interval', type=str, help=f"calendar interval, one of {', '.join(INTERVALS)}",
+                              required=False, default='day')
+histogram_parser.add_argument('start_time', type=str, help="GTE to start_time field", required=False)
+histogram_parser.add_argument('end_time', type=str, help="Less than to end_time field", required=False)
+histogram_parser.add_argument('polygon', type=str, help="Bounding geo-polygon", required=False)
+
+
+def get_histogram(dataset=None, dataset_type=None):
+    """Return the histogram response of a dataset or type from the request arguments."""
+    interval = request.args.get('interval', 'day')
+    start_time = request.args.get('start_time', None)
+    end_time = request.args.get('end_time', None)
+    polygon = request.args.get('polygon', None)
+
+    if interval not in INTERVALS:
+        return {
+            'success': False,
+            'message': f"Invalid interval: {interval}; one of {', '.join(INTERVALS)}"
+        }, 400
+    if polygon is not None:
+        try:
+            polygon = parse_polygon(polygon)
+        except Exception as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
+    try:
+        index = current_app.config["ES_INDEX"]
+        buckets, cached = current_app.es_util.query_histogram(index, interval, dataset=dataset,
+                                                              dataset_type=dataset_type, start_time=start_time,
+                                                              end_time=end_time, polygon=polygon)
+        return {
+            'success': True,
+            'interval': interval,
+            'total': sum(i['count'] for i in buckets),
+            'count': len(buckets),
+            'cached': cached,
+            'histogram': buckets
+        }
+    except Exception as e:
+        current_app.logger.error(traceback.format_exc())
+        return {
+            'success': False,
+            'message': str(e),
+        }, 500
+
+
+@pele_ns.route('/dataset/<string:dataset_name>/histogram', endpoint='histogram_by_dataset')
+@pele_ns.param('dataset_name', 'dataset name')
+@api.doc(responses={200: "Success",
+                    400: "Invalid parameters",
+                    401: "Unathorized",
+                    500: "Execution failed"},
+         description="Get the number of documents of a dataset per calendar interval of their starttime.")
+class HistogramByDataset(Resource):
+    """Date histogram by dataset name."""
+
+    decorators = [limiter.limit("10/second")]
+
+    @token_required
+    @conditional_get
+    @admission_required
+    @pele_ns.expect(histogram_parser)
+    @fast_marshal_with(api, histogram_model)
+    @api.doc(security='apikey')
+    def get(self, dataset_name):
+        return get_histogram(dataset=dataset_name)
+
+
+@pele_ns.route('/type/<string:type_name>/histogram', endpoint='histogram_by_type')
+@pele_ns.param('type_name', 'type name')
+@api.doc(responses={200: "Success",
+                    400: "Invalid parameters",
+                    401: "Unathorized",
+                    500: "Execution failed"},
+         description="Get the number of documents of a type per calendar interval of their starttime.")
+class HistogramByType(Resource):
+    """Date histogram by type name."""
+
+    decorators = [limiter.limit("10/second")]
+
+    @token_required
+    @conditional_get
+    @admission_required
+    @pele_ns.expect(histogram_parser)
+    @fast_marshal_with(api, histogram_model)
+    @api.doc(security='apikey')
+    def get(self, type_name):
+        return get_histogram(dataset_type=type_name)
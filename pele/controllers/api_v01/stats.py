@@ -0,0 +1,73 @@
+from flask import current_app
+from flask_restx import Resource, fields
+
+from pele import limiter
+from pele.controllers import token_required
+from pele.controllers.api_v01.config import api, stats_ns
+
+
+def stats_route(path, endpoint, name, label, getter, description):
+    """Register GET /stats/<path> returning the stats() of the object returned by getter, which returns None
+    when the feature is disabled.
+
+    :param path: route under the stats namespace
+    :param endpoint: endpoint name
+    :param name: prefix of the names of the model and the resource (e.g. "Catalog")
+    :param label: what the stats are of (e.g. "facet catalog")
+    :param getter: function() returning an object with a stats() method, or None
+    :param description: description of the route
+    """
+
+    model = api.model(f'{name}Stats', {
+        'success': fields.Boolean(description="success flag"),
+        'message': fields.String(description="message"),
+        'enabled': fields.Boolean(description=f"{label} enabled"),
+        'stats': fields.Raw(description=f"{label} stats"),
+    })
+
+    class Stats(Resource):
+        decorators = [limiter.limit("10/second")]
+
+        @token_required
+        @api.marshal_with(model)
+        @api.doc(security='apikey')
+        def get(self):
+            source = getter()
+            return {
+                'success': True,
+                'enabled': source is not None,
+                'stats': source.stats() if source is not None else None
+            }
+
+    Stats.__name__ = Stats.__qualname__ = f'{name}Stats'
+    Stats.__doc__ = f"{label[0].upper()}{label[1:]} stats."
+    api.doc(responses={200: "Success",
+                       401: "Unauthorized"},
+            description=description)(Stats)
+    return stats_ns.route(f'/{path}', endpoint=endpoint)(Stats)
+
+
+stats_route('catalog', 'catalog_stats', 'Catalog', "facet catalog",
+            lambda: current_app.es_util.catalog,
+            "Get facet catalog hit/miss counters and snapshot ages.")
+stats_route('auth', 'auth_stats', 'Auth', "authentication",
+            lambda: current_app.token_cache,
+            "Get token/user cache hit rates and the share of request latency spent on authentication.")
+stats_route('hosts', 'host_stats', 'Host', "host tracking",
+            lambda: getattr(current_app.es_util.client.transport, 'host_stats', None),
+            "Get EWMA latency, error rate, requests in flight and ejection state of every ES host.")
+stats_route('admission', 'admission_stats', 'Admission', "admission control",
+            lambda: getattr(current_app, 'admission', None),
+            "Get admission control counters, requests in flight and tracked ES latency of this worker.")
+stats_route('result_cache', 'result_cache_stats', 'ResultCache', "result cache",
+            lambda: getattr(current_app, 'result_cache', None),
+            "Get search result cache hit/miss counters and the size of the local tier of this worker.")
+stats_route('resolver', 'resolver_stats', 'Resolver', "index resolver",
+            lambda: current_app.es_util.resolver,
+            "Get the age of the index map of the index resolver and how many searches it narrowed.")
+stats_route('summary', 'summary_stats', 'Summary', "summary",
+            lambda: getattr(current_app, 'summary', None),
+            "Get the age, size and refresh counters of the type/dataset summary.")
+stats_route('histogram_cache', 'histogram_cache_stats', 'HistogramCache', "histogram cache",
+            lambda: current_app.es_util.histograms,
+            "Get the size and hit/miss counters of the cache of closed date histogram buckets.")
@@ -0,0 +1,96 @@
+import traceback
+from flask import current_app, request
+from flask_restx import Resource, fields
+
+from pele import limiter
+from pele.controllers import token_required, conditional_get, admission_required
+from pele.lib.query import get_page_size_and_offset
+from pele.lib.summary import SORT_FIELDS
+from pele.controllers.api_v01.config import api, pele_ns
+
+
+@pele_ns.route('/summary', endpoint='summary')
+@pele_ns.param('type', 'type name')
+@pele_ns.param('dataset', 'dataset name or glob pattern (e.g. "acquisition-*")')
+@pele_ns.param('start_time', 'only datasets with documents ending after this ISO time')
+@pele_ns.param('end_time', 'only datasets with documents starting before this ISO time')
+@pele_ns.param('sort', f"sort field, one of {', '.join(SORT_FIELDS)}; prefix with \"-\" for descending")
+@pele_ns.param('offset', 'offset', type=int)
+@pele_ns.param('page_size', 'page size', type=int)
+@api.doc(responses={200: "Success",
+                    400: "Invalid parameters",
+                    401: "Unathorized",
+                    404: "Summary disabled",
+                    500: "Execution failed",
+                    503: "Summary not built yet"},
+         description="Get the doc count, temporal extent, bounding box and latest ingest time of every "
+                     "type/dataset pair from a summary refreshed in the background.")
+class DatasetSummary(Resource):
+    """Summary of the GRQ types and datasets."""
+
+    row_model = api.model('SummaryRow', {
+        'type': fields.String(description="type name"),
+        'dataset': fields.String(description="dataset name"),
+        'count': fields.Integer(description="number of documents"),
+        'starttime': fields.String(description="earliest starttime"),
+        'endtime': fields.String(description="latest endtime"),
+        'bbox': fields.List(fields.Float, description="bounding box: [min_lon, min_lat, max_lon, max_lat]"),
+        'latest_ingest': fields.String(description="latest ingest time"),
+    })
+
+    model = api.model('Summary', {
+        'success': fields.Boolean(description="success flag"),
+        'message': fields.String(description="message"),
+        'summary': fields.List(fields.Nested(row_model), description="summary rows"),
+        'built_at': fields.Float(description="epoch seconds the summary was last refreshed"),
+        'total': fields.Integer(description="total"),
+        'count': fields.Integer(description="count"),
+        'page_size': fields.Integer(description="page size"),
+        'offset': fields.Integer(description="starting offset (0 index)"),
+    })
+
+    decorators = [limiter.limit("10/second")]
+
+    @token_required
+    @conditional_get
+    @admission_required
+    @api.marshal_with(model)
+    @api.doc(security='apikey')
+    def get(self):
+        catalog = getattr(current_app, 'summary', None)
+        if catalog is None:
+            return {
+                'success': False,
+                'message': "Summary is disabled."
+            }, 404
+        summary = catalog.get()
+        if summary is None:
+            return {
+                'success': False,
+                'message': "Summary is being built; retry later."
+            }, 503, {'Retry-After': '30'}
+
+        try:
+            page_size, offset = get_page_size_and_offset(request)
+            rows = summary.select(dataset_type=request.args.get('type', None),
+                                  dataset=request.args.get('dataset', None),
+                                  start_time=request.args.get('start_time', None),
+                                  end_time=request.args.get('end_time', None),
+                                  sort=request.args.get('sort', None))
+        except Exception as e:
+            current_app.logger.debug(traceback.format_exc())
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+
+        items = rows[offset:offset + page_size]
+        return {
+            'success': True,
+            'total': len(rows),
+            'count': len(items),
+            'page_size': page_size,
+            'offset': offset,
+            'built_at': summary.built_at,
+            'summary': items
+        }
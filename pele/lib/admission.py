@@ -0,0 +1,240 @@
+import json
+import math
+import time
+import threading
+from datetime import datetime
+
+from limits import parse
+
+# cost in units of the requests to each endpoint before the page size, polygon, time range and ID count
+# are accounted for; a listing or a lookup by ID costs 1
+ENDPOINT_COSTS = {
+    'types': 1,
+    'summary': 1,
+    'datasets': 1,
+    'datasets_by_type': 1,
+    'types_by_dataset': 1,
+    'dataset_by_id': 1,
+    'ids_by_dataset': 2,
+    'ids_by_type': 2,
+    'histogram_by_dataset': 2,
+    'histogram_by_type': 2,
+    'fields_by_type_and_dataset': 2,
+    'overlaps_by_id': 4,
+    'overlaps_by_id_type_dataset': 4,
+    'datasets_by_ids': 2,
+    'batch': 1,
+    'export_ids_by_dataset': 10,
+    'export_fields_by_type_and_dataset': 20,
+    'join_overlaps': 50,
+}
+
+# batch query descriptor -> endpoint it runs as
+BATCH_QUERIES = {
+    'ids_by_dataset': 'ids_by_dataset',
+    'ids_by_type': 'ids_by_type',
+    'fields': 'fields_by_type_and_dataset',
+    'overlaps': 'overlaps_by_id',
+}
+
+# endpoints filtering on start_time, end_time and polygon
+FILTERED = {'ids_by_dataset', 'ids_by_type', 'histogram_by_dataset', 'histogram_by_type',
+            'fields_by_type_and_dataset', 'export_ids_by_dataset', 'export_fields_by_type_and_dataset',
+            'join_overlaps'}
+
+
+def _vertices(polygon):
+    """Return number of points of a polygon given as a JSON string or (nested) lists of coordinates."""
+    if isinstance(polygon, str):
+        try:
+            polygon = json.loads(polygon)
+        except ValueError:
+            return 0
+    if not isinstance(polygon, list):
+        return 0
+    if len(polygon) > 0 and all(isinstance(i, (int, float)) for i in polygon):
+        return 1
+    return sum(_vertices(i) for i in polygon)
+
+
+def _timestamp(value):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def estimate_cost(endpoint, params, costs=None):
+    """Return estimated cost of a request in units.
+
+    The endpoint cost grows with the page size (1 unit per 50 hits), the polygon (2 units for the
+    geo_shape filter and 1 per 20 vertices), the time range (2 units without one, up to 2 units for a
+    range of a year or more) and the number of IDs looked up (1 unit per 100); a batch costs the sum of
+    its queries.
+
+    :param endpoint: endpoint name (e.g. "ids_by_dataset")
+    :param params: Dict; query arguments or JSON body of the request
+    :param costs: (optional) Dict; base cost per endpoint overriding ENDPOINT_COSTS
+    :return: float
+    """
+    costs = costs or ENDPOINT_COSTS
+    cost = costs.get(endpoint, ENDPOINT_COSTS.get(endpoint, 1))
+
+    if endpoint == 'batch':
+        queries = params.get('queries', None)
+        for query in queries if isinstance(queries, list) else ():
+            if isinstance(query, dict) and query.get('query', None) in BATCH_QUERIES:
+                cost += estimate_cost(BATCH_QUERIES[query['query']], query, costs=costs)
+        return cost
+
+    try:
+        cost += int(params.get('page_size', 0) or 0) / 50.
+    except (TypeError, ValueError):
+        pass
+
+    ids = params.get('ids', None)
+    if isinstance(ids, list):
+        cost += len(ids) / 100.
+
+    source = params.get('source', None)
+    if isinstance(source, dict):  # join
+        params = source
+    if endpoint in FILTERED:
+        polygon = params.get('polygon', None)
+        if polygon:
+            cost += 2 + _vertices(polygon) / 20.
+        start, end = _timestamp(params.get('start_time', None)), _timestamp(params.get('end_time', None))
+        if start is not None and end is not None:
+            cost += min(2., max(0., end - start) / (365 * 86400.) * 2)
+        else:
+            cost += 2
+    return cost
+
+
+class Admission:
+    """Admission control of the requests of a worker:
+
+    - requests costing more than a user's remaining budget of cost units are answered with a 429; the
+      budgets are kept in the rate limiter storage, shared by all workers with e.g. a redis:// storage
+    - at most max_in_flight requests run at once in the worker, the others are answered with a 503
+    - while the EWMA of Elasticsearch latency is above shed_latency, requests costing shed_min_cost or more
+      are answered with a 503; with no call recorded for retry_after seconds requests are let through again
+    """
+
+    def __init__(self, limiter, budget=None, max_in_flight=0, shed_latency=0, shed_min_cost=5, retry_after=5,
+                 alpha=0.2, costs=None):
+        """
+        :param limiter: flask_limiter.Limiter whose storage keeps the budgets
+        :param budget: (optional) cost units per user and period, e.g. "600/minute"
+        :param max_in_flight: maximum requests running at once in the worker (0 for no limit)
+        :param shed_latency: seconds of Elasticsearch latency above which costly requests are shed (0 to never shed)
+        :param shed_min_cost: minimum cost of the requests shed
+        :param retry_after: seconds clients are asked to wait after a 503
+        :param alpha: weight of the latest call in the latency EWMA
+        :param costs: (optional) Dict; base cost per endpoint overriding ENDPOINT_COSTS
+        """
+        self.limiter = limiter
+        self.budget = parse(budget) if budget else None
+        self.max_in_flight = max_in_flight
+        self.shed_latency = shed_latency
+        self.shed_min_cost = shed_min_cost
+        self.retry_after = retry_after
+        self.alpha = alpha
+        self.costs = dict(ENDPOINT_COSTS, **(costs or {}))
+
+        self._slots = threading.BoundedSemaphore(max_in_flight) if max_in_flight > 0 else None
+        self._lock = threading.Lock()
+        self.latency = None
+        self.observed_at = 0.
+        self.in_flight = 0
+        self.admitted = 0
+        self.over_budget = 0
+        self.over_capacity = 0
+        self.shed = 0
+
+    def cost(self, endpoint, params):
+        return estimate_cost(endpoint, params, costs=self.costs)
+
+    def observe(self, secs):
+        """Record the latency of an Elasticsearch call."""
+        with self._lock:
+            self.latency = secs if self.latency is None else self.alpha * secs + (1 - self.alpha) * self.latency
+            self.observed_at = time.time()
+
+    def shedding(self):
+        """Return True if Elasticsearch latency is above shed_latency."""
+        return self.shed_latency > 0 and self.latency is not None and self.latency > self.shed_latency and \
+            time.time() - self.observed_at < self.retry_after
+
+    def admit(self, endpoint, params, key):
+        """Admit a request; call release() once it is done if admitted.
+
+        :param endpoint: endpoint name
+        :param params: Dict; query arguments or JSON body of the request
+        :param key: user the budget is charged to (JWT subject or remote address)
+        :return: None if admitted, otherwise (response body, status code, headers)
+        """
+        cost = self.cost(endpoint, params)
+        if cost >= self.shed_min_cost and self.shedding():
+            with self._lock:
+                self.shed += 1
+            return self._reject(503, "Elasticsearch is overloaded; retry later.", self.retry_after)
+
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.over_capacity += 1
+            return self._reject(503, "Too many requests in flight; retry later.", self.retry_after)
+
+        if self.budget is not None and not self.limiter.limiter.hit(self.budget, 'admission', key,
+                                                                      cost=max(1, math.ceil(cost))):
+            if self._slots is not None:
+                self._slots.release()
+            stats = self.limiter.limiter.get_window_stats(self.budget, 'admission', key)
+            with self._lock:
+                self.over_budget += 1
+            return self._reject(429, f"Request budget exceeded: the request costs {math.ceil(cost)} units of "
+                                     f"{self.budget}.", max(1, math.ceil(stats.reset_time - time.time())))
+
+        with self._lock:
+            self.in_flight += 1
+            self.admitted += 1
+        return None
+
+    def release(self):
+        """Release the slot of an admitted request."""
+        with self._lock:
+            self.in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    @staticmethod
+    def _reject(status, message, retry_after):
+        return {'success': False, 'message': message}, status, {'Retry-After': str(retry_after)}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'budget': str(self.budget) if self.budget is not None else None,
+                'max_in_flight': self.max_in_flight,
+                'in_flight': self.in_flight,
+                'es_latency': self.latency,
+                'shedding': self.shedding(),
+                'admitted': self.admitted,
+                'over_budget': self.over_budget,
+                'over_capacity': self.over_capacity,
+                'shed': self.shed,
+            }
+
+
+def init_app(app, limiter):
+    """Create app.admission if ADMISSION_CONTROL is set."""
+    if not app.config.get('ADMISSION_CONTROL', False):
+        return None
+    app.admission = Admission(limiter,
+                              budget=app.config.get('ADMISSION_USER_BUDGET', None),
+                              max_in_flight=app.config.get('ADMISSION_MAX_IN_FLIGHT', 0),
+                              shed_latency=app.config.get('ADMISSION_SHED_LATENCY', 0),
+                              shed_min_cost=app.config.get('ADMISSION_SHED_MIN_COST', 5),
+                              retry_after=app.config.get('ADMISSION_RETRY_AFTER', 5),
+                              costs=app.config.get('ADMISSION_ENDPOINT_COSTS', None))
+    return app.admission
@@ -0,0 +1,122 @@
+from flask import current_app
+
+from pele.lib.query import HITS_FILTER, DOCS_FILTER, AGGS_FILTER
+from pele.lib.timing import phase, es_response
+from pele.lib.metrics import es_call, es_methods
+
+
+@es_methods
+class AsyncQueryES:
+    """Runs the queries of the endpoints served by the ASGI app on an asyncio client
+    (AsyncElasticsearch/AsyncOpenSearch), so a worker can keep many requests waiting on Elasticsearch at once.
+
+    Queries are built by the QueryES of the app, whose in-process caches (catalog, id_indices, resolver)
+    are shared; only the methods below are available, the rest of the API being served by the sync app.
+    """
+
+    def __init__(self, es_client, queries):
+        """
+        :param es_client: the object returned from AsyncElasticsearch(...)
+        :param queries: QueryES building the queries
+        """
+        self.client = es_client
+        self.queries = queries
+
+    async def _execute(self, s, filter_path=None):
+        """Execute search and return the raw response; see QueryES._execute. The response is always
+        returned raw; RAW_SEARCH only decides whether it is trimmed to filter_path.
+
+        :param s: Search object
+        :param filter_path: (optional) List[str]; response fields to keep with RAW_SEARCH
+        :return: Dict
+        """
+        with phase('build'):
+            s = self.queries._track_total_hits(s)
+            body = s.to_dict()
+        current_app.logger.debug("search %s: %s", s._index, body)
+
+        params = dict(s._params)
+        if filter_path and current_app.config.get('RAW_SEARCH', False):
+            params['filter_path'] = ','.join(filter_path)
+        with es_call():
+            return es_response(await self.client.search(index=s._index, body=body, **params))
+
+    async def _search(self, s, filter_path=HITS_FILTER):
+        resp = await self._execute(s, filter_path=filter_path)
+        return self.queries._total(resp), self.queries._hits(resp)
+
+    async def _terms_keys(self, index, name, field, query=None):
+        s = self.queries._terms_agg(index, name, field, query=query)
+        return self.queries._keys(await self._execute(s, filter_path=AGGS_FILTER), name)
+
+    async def query_types(self, index, offset, page_size):
+        facets = self.queries._facets(index)
+        types = facets.types if facets is not None else \
+            await self._terms_keys(index, 'types', 'dataset_type.keyword')
+        return len(types), types[offset:offset + page_size]
+
+    async def query_datasets(self, index, offset, page_size):
+        facets = self.queries._facets(index)
+        datasets = facets.datasets if facets is not None else \
+            await self._terms_keys(index, 'datasets', 'dataset.keyword')
+        return len(datasets), datasets[offset:offset + page_size]
+
+    async def query_datasets_by_type(self, index, dataset_type, offset, page_size):
+        facets = self.queries._facets(index)
+        if facets is not None:
+            datasets = facets.datasets_by_type.get(dataset_type, [])
+        else:
+            q = self.queries.Q('term', dataset_type__keyword=dataset_type)
+            datasets = await self._terms_keys(index, 'datasets', 'dataset.keyword', query=q)
+        return len(datasets), datasets[offset:offset + page_size]
+
+    async def query_types_by_dataset(self, index, dataset, offset, page_size):
+        facets = self.queries._facets(index)
+        if facets is not None:
+            types = facets.types_by_dataset.get(dataset, [])
+        else:
+            q = self.queries.Q('term', dataset__keyword=dataset)
+            types = await self._terms_keys(index, 'types', 'dataset_type.keyword', query=q)
+        return len(types), types[offset:offset + page_size]
+
+    async def query_ids_by_dataset(self, index, dataset, offset, page_size, start_time=None, end_time=None,
+                                   polygon=None):
+        s = self.queries._ids_by_dataset(index, dataset, start_time=start_time, end_time=end_time, polygon=polygon)
+        total, hits = await self._search(s[offset:offset + page_size])
+        return total, [i['_source']['id'] for i in hits]
+
+    async def query_ids_by_type(self, index, dataset_type, offset, page_size, start_time=None, end_time=None,
+                                polygon=None):
+        s = self.queries._ids_by_type(index, dataset_type, start_time=start_time, end_time=end_time, polygon=polygon)
+        total, hits = await self._search(s[offset:offset + page_size])
+        return total, [i['_source']['id'] for i in hits]
+
+    async def query_id(self, index, _id, fields=None):
+        q = self.queries
+        mget = q._id_mget(index, _id, fields=fields)
+        if mget is not None:
+            with es_call():
+                doc = q._mget_found(es_response(await self.client.mget(**mget)))
+            if doc is not None:
+                return doc
+
+        _, hits = await self._search(q._id_search(index, _id, fields=fields), filter_path=DOCS_FILTER)
+        return q._id_hit(index, _id, hits)
+
+    async def query_fields(self, index, terms, fields, offset, page_size, start_time=None, end_time=None,
+                           polygon=None):
+        s = self.queries._fields(index, terms, fields, start_time=start_time, end_time=end_time, polygon=polygon)
+        total, hits = await self._search(s[offset:offset + page_size])
+        return total, [i.get('_source', {}) for i in hits]
+
+    async def overlaps(self, index, _id, terms, fields, offset, page_size):
+        doc = await self.query_id(index, _id, fields=['starttime', 'endtime', 'location'])
+        if doc is None:
+            raise RuntimeError(f"Failed to find dataset ID: {_id}")
+
+        s = self.queries._overlaps(index, doc, terms, fields)
+        total, hits = await self._search(s[offset:offset + page_size])
+        return total, [i.get('_source', {}) for i in hits]
+
+    async def close(self):
+        await self.client.close()
@@ -0,0 +1,137 @@
+import time
+import threading
+import traceback
+
+from pele.lib.refresher import BackgroundRefresher
+
+
+class Facets:
+    """Immutable snapshot of the type/dataset facets of an index."""
+
+    def __init__(self, rows):
+        """
+        :param rows: iterable of (dataset_type, dataset, doc_count) tuples
+        """
+        type_counts = {}
+        dataset_counts = {}
+        datasets_by_type = {}
+        types_by_dataset = {}
+        for dataset_type, dataset, count in rows:
+            type_counts[dataset_type] = type_counts.get(dataset_type, 0) + count
+            dataset_counts[dataset] = dataset_counts.get(dataset, 0) + count
+            datasets_by_type.setdefault(dataset_type, {})[dataset] = count
+            types_by_dataset.setdefault(dataset, {})[dataset_type] = count
+
+        self.type_counts = type_counts
+        self.dataset_counts = dataset_counts
+        self.types = self._order(type_counts)
+        self.datasets = self._order(dataset_counts)
+        self.datasets_by_type = {k: self._order(v) for k, v in datasets_by_type.items()}
+        self.types_by_dataset = {k: self._order(v) for k, v in types_by_dataset.items()}
+        self.built_at = time.time()
+
+    @staticmethod
+    def _order(counts):
+        """Order keys like an ES terms aggregation: doc count descending, then key ascending."""
+        return [k for k, _ in sorted(counts.items(), key=lambda i: (-i[1], i[0]))]
+
+
+class FacetCatalog(BackgroundRefresher):
+    """In-process catalog of dataset type -> datasets and dataset -> types with doc counts.
+
+    Snapshots are built by a per-process background thread and refreshed every `ttl` seconds,
+    so request threads never wait on the aggregation. On a cold start `get()` returns None and
+    the caller is expected to fall back to a live ES query.
+    """
+
+    thread_name = 'pele-facet-catalog'
+
+    def __init__(self, app, loader, ttl=300):
+        """
+        :param app: flask app; an app context is pushed around each refresh
+        :param loader: function(index) returning an iterable of (dataset_type, dataset, doc_count)
+        :param ttl: seconds between refreshes
+        """
+        super().__init__()
+        self.app = app
+        self.loader = loader
+        self.ttl = ttl
+
+        self._wakeup = threading.Event()
+        self._facets = {}
+        self._indices = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+        self.last_refresh_secs = None
+
+    def get(self, index):
+        """Return the Facets snapshot of index or None if not built yet."""
+        self._ensure_thread()
+        facets = self._facets.get(index, None)
+        with self._lock:
+            if facets is None:
+                self.misses += 1
+                if index not in self._indices:
+                    self._indices.add(index)
+                    self._wakeup.set()
+            else:
+                self.hits += 1
+        return facets
+
+    def refresh(self, index):
+        """Rebuild the snapshot of index synchronously."""
+        t0 = time.time()
+        try:
+            with self.app.app_context():
+                facets = Facets(self.loader(index))
+        except Exception:
+            self.app.logger.error(traceback.format_exc())
+            with self._lock:
+                self.errors += 1
+            return None
+        with self._lock:
+            self._facets[index] = facets
+            self._indices.add(index)
+            self.refreshes += 1
+            self.last_refresh_secs = facets.built_at - t0
+        return facets
+
+    def stats(self):
+        """Return hit/miss counters and the age of each snapshot."""
+        now = time.time()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'refreshes': self.refreshes,
+                'errors': self.errors,
+                'ttl': self.ttl,
+                'last_refresh_secs': self.last_refresh_secs,
+                'indices': {
+                    index: {
+                        'age': now - facets.built_at,
+                        'types': len(facets.types),
+                        'datasets': len(facets.datasets),
+                    } for index, facets in self._facets.items()
+                },
+            }
+
+    def _run(self):
+        while True:
+            now = time.time()
+            with self._lock:
+                due = [i for i in self._indices
+                       if i not in self._facets or now - self._facets[i].built_at >= self.ttl]
+            for index in due:
+                self.refresh(index)
+
+            with self._lock:
+                ages = [time.time() - f.built_at for f in self._facets.values()]
+            wait = max(self.ttl - max(ages), 1) if ages else self.ttl
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
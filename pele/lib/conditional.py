@@ -0,0 +1,91 @@
+"""Validators (ETag, Last-Modified) and conditional GETs of the pele namespace resources.
+
+The validators of a request are derived from the fingerprint of ES_INDEX (pele.lib.fingerprint) and
+the requested URL, so a request carrying a matching If-None-Match (or, without one, an If-Modified-Since
+not older than the last change of the index) is answered with a 304 before any search runs. Listings
+and the summary, served from in-process snapshots that may lag the index, get a hash of the response
+body as ETag instead.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from flask import g, request, current_app
+
+# endpoints served from the facet catalog when it is enabled
+CATALOG_ENDPOINTS = {'types', 'datasets', 'datasets_by_type', 'types_by_dataset'}
+
+# endpoints always served from an in-process snapshot
+SNAPSHOT_ENDPOINTS = {'summary'}
+
+
+def _body_etag(endpoint):
+    return endpoint in SNAPSHOT_ENDPOINTS or (endpoint in CATALOG_ENDPOINTS and current_app.es_util.catalog is not None)
+
+
+def validators():
+    """Return (ETag, Last-Modified datetime) of the current request from the fingerprint of ES_INDEX;
+    Last-Modified is truncated to the whole seconds of HTTP dates."""
+    fingerprint = current_app.es_util.fingerprints.get(current_app.config['ES_INDEX'])
+    url = hashlib.sha1(request.full_path.encode()).hexdigest()[:12]
+    last_modified = datetime.fromtimestamp(int(fingerprint.changed_at), tz=timezone.utc)
+    return f"{fingerprint.value}-{url}", last_modified
+
+
+def not_modified(etag, last_modified):
+    """Return True if the validators of the request match: If-None-Match takes precedence over
+    If-Modified-Since."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return since is not None and last_modified <= since
+
+
+def _cache_control(response):
+    cache_control = current_app.config.get('CONDITIONAL_GET_CACHE_CONTROL', 'no-cache')
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+
+
+def check(endpoint):
+    """Return a 304 response if the current GET request is not modified, otherwise None; the validators
+    are added to the response by the after_request hook of init_app."""
+    if _body_etag(endpoint):
+        g.conditional = (None, None)
+        return None
+    try:
+        etag, last_modified = validators()
+    except Exception as e:
+        current_app.logger.warning(f"Failed to fingerprint {current_app.config['ES_INDEX']}: {e}")
+        return None
+    if not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        _cache_control(response)
+        return response
+    g.conditional = (etag, last_modified)
+    return None
+
+
+def init_app(app):
+    """Add validators to the responses of the GET requests checked with check() if CONDITIONAL_GET is set."""
+    if not app.config.get('CONDITIONAL_GET', False):
+        return False
+
+    @app.after_request
+    def _validators(response):
+        conditional = g.pop('conditional', None)
+        if conditional is None or response.status_code != 200:
+            return response
+        etag, last_modified = conditional
+        if etag is None:
+            if response.is_streamed:
+                return response
+            etag = hashlib.sha1(response.get_data()).hexdigest()
+        response.set_etag(etag, weak=True)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        _cache_control(response)
+        return response if response.is_streamed else response.make_conditional(request)
+
+    return True
@@ -1,52 +1,242 @@
+import os
+import abc
+import socket
+import threading
+
 import boto3
-from elasticsearch import Elasticsearch, RequestsHttpConnection as RequestsHttpConnectionES
-from opensearchpy import OpenSearch, AWSV4SignerAuth, RequestsHttpConnection as RequestsHttpConnectionOS
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from elasticsearch import (Elasticsearch, Transport as TransportES, Urllib3HttpConnection as Urllib3HttpConnectionES,
+                           RequestsHttpConnection as RequestsHttpConnectionES)
+from opensearchpy import (OpenSearch, AWSV4SignerAuth, Transport as TransportOS,
+                          Urllib3HttpConnection as Urllib3HttpConnectionOS,
+                          RequestsHttpConnection as RequestsHttpConnectionOS)
+
+from pele.lib.host_selector import HostStats, LatencySelector, TimedConnection, HedgingTransport
 
 ES_CLIENT = None
 
+# guards creation of ES_CLIENT and the reset of connection pools after a fork
+_lock = threading.Lock()
+
+# default socket options plus TCP keep-alive probes on idle pooled connections
+KEEPALIVE_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+
+
+def _reinit_lock():
+    global _lock
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_lock)
+
+
+class ForkSafeTransport:
+    """Transport mixin that replaces its connections the first time it is used in a forked process,
+    so that workers of a preloaded gunicorn master never share sockets with the master or each other.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pid = os.getpid()
+
+    def perform_request(self, *args, **kwargs):
+        if self._pid != os.getpid():
+            with _lock:
+                if self._pid != os.getpid():
+                    self.set_connections(self.hosts)
+                    self._pid = os.getpid()
+        return super().perform_request(*args, **kwargs)
+
+
+class PeleTransportES(HedgingTransport, ForkSafeTransport, TransportES):
+    pass
+
+
+class PeleTransportOS(HedgingTransport, ForkSafeTransport, TransportOS):
+    pass
+
+
+class PooledUrllib3Connection(abc.ABC):
+    """Urllib3 connection mixin taking the pool size per host as pool_maxsize and optionally enabling
+    TCP keep-alive on the pooled sockets; subclasses name the pool size argument of their client."""
+
+    def __init__(self, *args, pool_maxsize=10, tcp_keepalive=False, **kwargs):
+        super().__init__(*args, **self.pool_kwargs(pool_maxsize), **kwargs)
+        if tcp_keepalive:
+            self.pool.conn_kw['socket_options'] = KEEPALIVE_SOCKET_OPTIONS
+
+    @staticmethod
+    @abc.abstractmethod
+    def pool_kwargs(pool_maxsize):
+        """Return the keyword arguments of the connection class setting its pool size."""
+
+
+class Urllib3HttpConnectionESPooled(TimedConnection, PooledUrllib3Connection, Urllib3HttpConnectionES):
+    @staticmethod
+    def pool_kwargs(pool_maxsize):
+        return {'maxsize': pool_maxsize}
+
+
+class Urllib3HttpConnectionOSPooled(TimedConnection, PooledUrllib3Connection, Urllib3HttpConnectionOS):
+    @staticmethod
+    def pool_kwargs(pool_maxsize):
+        return {'pool_maxsize': pool_maxsize}
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter passing socket options to its pools."""
+
+    def __init__(self, socket_options=None, **kwargs):
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.socket_options is not None:
+            kwargs['socket_options'] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+class PooledRequestsConnection:
+    """Requests connection mixin (used for signed AWS requests) mounting an adapter of pool_maxsize
+    connections per host and optionally enabling TCP keep-alive on the pooled sockets."""
+
+    def __init__(self, *args, pool_maxsize=10, tcp_keepalive=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        adapter = KeepAliveAdapter(socket_options=KEEPALIVE_SOCKET_OPTIONS if tcp_keepalive else None,
+                                   pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+
+class RequestsHttpConnectionESPooled(TimedConnection, PooledRequestsConnection, RequestsHttpConnectionES):
+    pass
+
+
+class RequestsHttpConnectionOSPooled(TimedConnection, PooledRequestsConnection, RequestsHttpConnectionOS):
+    pass
+
+
+def client_options(config, aws_es=False):
+    """Return connection pooling, compression, timeout and retry options of the ES clients from config.
+    Defaults without config are those the clients were created with before they were configurable.
+    """
+
+    return {
+        'pool_maxsize': config.get('ES_POOL_MAXSIZE', 10),
+        'tcp_keepalive': config.get('ES_TCP_KEEPALIVE', False),
+        'http_compress': config.get('ES_HTTP_COMPRESS', False),
+        'timeout': config.get('ES_TIMEOUT', 30 if aws_es else 10),
+        'max_retries': config.get('ES_MAX_RETRIES', 10 if aws_es else 3),
+        'retry_on_timeout': config.get('ES_RETRY_ON_TIMEOUT', aws_es),
+        'retry_on_status': tuple(config.get('ES_RETRY_ON_STATUS', (502, 503, 504))),
+    }
+
+
+def host_options(config):
+    """Return host selection and hedging options of the sync ES clients from config."""
+
+    options = {
+        'host_stats': HostStats(alpha=config.get('ES_HOST_EWMA_ALPHA', 0.3),
+                                eject_error_rate=config.get('ES_HOST_EJECT_ERROR_RATE', 0.5),
+                                eject_secs=config.get('ES_HOST_EJECT_SECS', 5),
+                                eject_max_secs=config.get('ES_HOST_EJECT_MAX_SECS', 300)),
+        'hedge_after': config.get('ES_HEDGE_AFTER', 0),
+    }
+    if config.get('ES_HOST_SELECTION', False):
+        options['selector_class'] = LatencySelector
+    return options
+
 
 def get_es_client(config):
     global ES_CLIENT
 
+    if ES_CLIENT is None:
+        with _lock:
+            if ES_CLIENT is None:
+                ES_CLIENT = _create_es_client(config)
+    return ES_CLIENT
+
+
+def _create_es_client(config):
     es_engine = config.get("ES_ENGINE", "elasticsearch")
     aws_es = config.get('AWS_ES', False)
     aws_region = config.get('AWS_REGION', 'us-west-2')
 
     es_url = config.get('ES_URL', 'http://127.0.0.1:9200')
+    hosts = es_url if isinstance(es_url, list) else [es_url]
+    is_aws = aws_es is True or "es.amazon.com" in str(es_url)
+    options = dict(client_options(config, aws_es=is_aws), **host_options(config))
 
-    if ES_CLIENT is None:
-        if es_engine == "opensearch":
-            if aws_es is True or "es.amazon.com" in es_url:
-                credentials = boto3.Session().get_credentials()
-                auth = AWSV4SignerAuth(credentials, aws_region)
-                ES_CLIENT = OpenSearch(
-                    hosts=es_url if isinstance(es_url, list) else [es_url],
-                    http_auth=auth,
-                    connection_class=RequestsHttpConnectionOS,
-                    use_ssl=True,
-                    verify_certs=False,
-                    ssl_show_warn=False,
-                    timeout=30,
-                    max_retries=10,
-                    retry_on_timeout=True,
-                )
-            else:
-                ES_CLIENT = OpenSearch(es_url)
-        else:
-            if aws_es is True or "es.amazon.com" in es_url:
-                credentials = boto3.Session().get_credentials()
-                auth = AWSV4SignerAuth(credentials, aws_region)
-                ES_CLIENT = Elasticsearch(
-                    hosts=es_url if isinstance(es_url, list) else [es_url],
-                    http_auth=auth,
-                    connection_class=RequestsHttpConnectionES,
-                    use_ssl=True,
-                    verify_certs=False,
-                    ssl_show_warn=False,
-                    timeout=30,
-                    max_retries=10,
-                    retry_on_timeout=True,
-                )
-            else:
-                ES_CLIENT = Elasticsearch(es_url)
-    return ES_CLIENT
+    if es_engine == "opensearch":
+        if is_aws:
+            credentials = boto3.Session().get_credentials()
+            auth = AWSV4SignerAuth(credentials, aws_region)
+            return OpenSearch(
+                hosts=hosts,
+                http_auth=auth,
+                connection_class=RequestsHttpConnectionOSPooled,
+                transport_class=PeleTransportOS,
+                use_ssl=True,
+                verify_certs=False,
+                ssl_show_warn=False,
+                **options
+            )
+        return OpenSearch(hosts, connection_class=Urllib3HttpConnectionOSPooled, transport_class=PeleTransportOS,
+                          **options)
+    else:
+        if is_aws:
+            credentials = boto3.Session().get_credentials()
+            auth = AWSV4SignerAuth(credentials, aws_region)
+            return Elasticsearch(
+                hosts=hosts,
+                http_auth=auth,
+                connection_class=RequestsHttpConnectionESPooled,
+                transport_class=PeleTransportES,
+                use_ssl=True,
+                verify_certs=False,
+                ssl_show_warn=False,
+                **options
+            )
+        return Elasticsearch(hosts, connection_class=Urllib3HttpConnectionESPooled,
+                             transport_class=PeleTransportES, **options)
+
+
+def get_async_es_client(config):
+    """Return an asyncio client (AsyncOpenSearch or AsyncElasticsearch) for ES_URL; requires aiohttp."""
+
+    es_engine = config.get("ES_ENGINE", "elasticsearch")
+    aws_es = config.get('AWS_ES', False)
+    aws_region = config.get('AWS_REGION', 'us-west-2')
+
+    es_url = config.get('ES_URL', 'http://127.0.0.1:9200')
+    hosts = es_url if isinstance(es_url, list) else [es_url]
+    is_aws = aws_es is True or "es.amazon.com" in str(es_url)
+
+    # aiohttp sessions take care of keep-alive and pool sizes are named differently by the two clients
+    options = client_options(config, aws_es=is_aws)
+    del options['pool_maxsize'], options['tcp_keepalive']
+
+    if es_engine == "opensearch":
+        from opensearchpy import AsyncOpenSearch, AsyncHttpConnection, AWSV4SignerAsyncAuth
+
+        if is_aws:
+            credentials = boto3.Session().get_credentials()
+            return AsyncOpenSearch(
+                hosts=hosts,
+                http_auth=AWSV4SignerAsyncAuth(credentials, aws_region),
+                connection_class=AsyncHttpConnection,
+                use_ssl=True,
+                verify_certs=False,
+                ssl_show_warn=False,
+                **options
+            )
+        return AsyncOpenSearch(hosts, **options)
+
+    from elasticsearch import AsyncElasticsearch
+
+    if is_aws:
+        raise RuntimeError("AWS request signing is not supported by AsyncElasticsearch; "
+                           "set ES_ENGINE = \"opensearch\" to serve an AWS domain asynchronously")
+    return AsyncElasticsearch(hosts, **options)
@@ -0,0 +1,77 @@
+import time
+import hashlib
+import threading
+
+from pele.lib.lru import LRUCache
+from pele.lib.metrics import es_call
+
+# index patterns whose fingerprints are remembered
+FINGERPRINT_CACHE_SIZE = 1024
+
+
+class Fingerprint:
+    """State of the indices matched by an index pattern."""
+
+    __slots__ = ('value', 'changed_at')
+
+    def __init__(self, value, changed_at):
+        """
+        :param value: str; changes whenever the searchable documents of the indices change
+        :param changed_at: epoch seconds the value was first seen
+        """
+        self.value = value
+        self.changed_at = changed_at
+
+
+class IndexFingerprints:
+    """Cheap fingerprints of the state of indices, from the doc, refresh and indexing stats of their primaries.
+
+    Doc stats are those of the searchable segments; as an in-place update leaves them unchanged, the
+    number of index operations and of refreshes are included, so a fingerprint changes once a refresh
+    makes indexed, updated or deleted documents visible (and on merges), and when indices are added to or
+    removed from the pattern. It is fetched with one _stats call per index pattern and remembered for
+    ttl seconds, so changes are seen at most ttl seconds late.
+    """
+
+    def __init__(self, es_util, ttl=5):
+        """
+        :param es_util: QueryES whose client is queried
+        :param ttl: seconds a fingerprint is remembered
+        """
+        self.es_util = es_util
+        self.ttl = ttl
+        self._cache = LRUCache(maxsize=FINGERPRINT_CACHE_SIZE, ttl=ttl)
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def get(self, index):
+        """Return the Fingerprint of an index, alias or pattern (or a list of them)."""
+        if isinstance(index, (list, tuple)):
+            index = ','.join(index)
+        fingerprint = self._cache.get(index, None)
+        if fingerprint is not None:
+            return fingerprint
+        value = self._load(index)
+        with self._lock:
+            fingerprint = self._seen.get(index, None)
+            if fingerprint is None or fingerprint.value != value:
+                if fingerprint is None and len(self._seen) >= FINGERPRINT_CACHE_SIZE:
+                    self._seen.clear()
+                fingerprint = self._seen[index] = Fingerprint(value, time.time())
+        self._cache.set(index, fingerprint)
+        return fingerprint
+
+    def _load(self, index):
+        with es_call():
+            stats = self.es_util.client.indices.stats(index=index, metric='docs,refresh,indexing')
+        state = []
+        for name, s in sorted(stats.get('indices', {}).items()):
+            primaries = s.get('primaries', {})
+            docs = primaries.get('docs', {})
+            state.append(f"{name}:{docs.get('count', 0)}:{docs.get('deleted', 0)}:"
+                         f"{primaries.get('indexing', {}).get('index_total', 0)}:"
+                         f"{primaries.get('refresh', {}).get('total', 0)}")
+        return hashlib.sha1('\n'.join(state).encode()).hexdigest()[:16]
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,131 @@
+import json
+import hashlib
+
+from shapely.geometry import Polygon
+from shapely.geometry.polygon import orient
+from shapely.validation import explain_validity
+
+from pele.lib.lru import LRUCache
+
+# parsed polygons remembered across requests, keyed by a hash of their input
+POLYGON_CACHE_SIZE = 1024
+
+# polygons wider than this many degrees of longitude may cross the antimeridian; they are passed to ES
+# as given, without envelope or simplification, since ES resolves the crossing from the ring orientation
+MAX_ENVELOPE_WIDTH = 180.
+
+_cache = LRUCache(maxsize=POLYGON_CACHE_SIZE)
+
+
+class AOI:
+    """Validated polygon of a spatial filter."""
+
+    __slots__ = ('coordinates', 'bbox', 'vertices', 'is_box')
+
+    def __init__(self, coordinates, bbox, vertices, is_box):
+        """
+        :param coordinates: List; GeoJSON polygon coordinates (closed rings, exterior first)
+        :param bbox: (min_lon, min_lat, max_lon, max_lat) or None if the polygon may cross the antimeridian
+        :param vertices: number of points of the rings
+        :param is_box: True if the polygon is its own envelope
+        """
+        self.coordinates = coordinates
+        self.bbox = bbox
+        self.vertices = vertices
+        self.is_box = is_box
+
+    def shape(self):
+        """Return the geo_shape of the polygon."""
+        if self.is_box:
+            return self.envelope()
+        return {'type': 'polygon', 'coordinates': self.coordinates}
+
+    def envelope(self):
+        """Return the geo_shape of the bounding box or None if there is none."""
+        if self.bbox is None:
+            return None
+        min_lon, min_lat, max_lon, max_lat = self.bbox
+        return {'type': 'envelope', 'coordinates': [[min_lon, max_lat], [max_lon, min_lat]]}
+
+
+def _rings(p):
+    """Return closed rings of [lon, lat] points of GeoJSON polygon coordinates or of a single ring."""
+    if not isinstance(p, list) or len(p) == 0:
+        raise ValueError("polygon must be a non-empty list of rings")
+    if all(isinstance(i, list) and len(i) > 0 and isinstance(i[0], (int, float)) for i in p):
+        p = [p]  # a single ring
+    rings = []
+    for ring in p:
+        if not isinstance(ring, list):
+            raise ValueError("polygon ring must be a list of points")
+        points = []
+        for point in ring:
+            if not isinstance(point, list) or len(point) < 2 or \
+                    not all(isinstance(i, (int, float)) and not isinstance(i, bool) for i in point[:2]):
+                raise ValueError("polygon point must be [lon, lat]: %s" % (point,))
+            lon, lat = point[0], point[1]
+            if not -180 <= lon <= 180 or not -90 <= lat <= 90:
+                raise ValueError("polygon point out of range: %s" % (point,))
+            points.append([lon, lat])
+        if points and points[0] != points[-1]:
+            points.append(points[0])
+        if len(points) < 4:
+            raise ValueError("polygon ring must have at least 3 distinct points")
+        rings.append(points)
+    return rings
+
+
+def _coordinates(polygon):
+    return [[list(i) for i in polygon.exterior.coords]] + [[list(i) for i in r.coords] for r in polygon.interiors]
+
+
+def prepare_polygon(p, tolerance=0., min_vertices=0):
+    """Validate, normalize and optionally simplify a polygon.
+
+    Rings are closed and a bare ring is taken as the exterior of a polygon. With a tolerance, polygons of
+    more than min_vertices points are simplified keeping their topology and ring orientation; their
+    boundary then moves by up to tolerance degrees. Results are cached by a hash of the input.
+
+    :param p: str (JSON) or List; GeoJSON polygon coordinates
+    :param tolerance: (optional) simplification tolerance in degrees (0 to never simplify)
+    :param min_vertices: (optional) polygons of this many points or fewer are never simplified
+    :return: AOI
+    :raises ValueError: if p is not a valid polygon
+    """
+    data = p if isinstance(p, str) else json.dumps(p, separators=(',', ':'))
+    key = (hashlib.sha1(data.encode()).hexdigest(), tolerance, min_vertices)
+    aoi = _cache.get(key, None)
+    if aoi is not None:
+        return aoi
+
+    if isinstance(p, str):
+        try:
+            p = json.loads(p)
+        except ValueError:
+            raise ValueError('Invalid polygon value: %s' % p)
+    rings = _rings(p)
+    polygon = Polygon(rings[0], rings[1:])
+    if not polygon.is_valid:
+        raise ValueError('Invalid polygon: %s' % explain_validity(polygon))
+
+    vertices = sum(len(i) for i in rings)
+    min_lon, _, max_lon, _ = polygon.bounds
+    if max_lon - min_lon > MAX_ENVELOPE_WIDTH:
+        aoi = AOI(rings, None, vertices, False)
+    else:
+        if tolerance > 0 and vertices > min_vertices:
+            simplified = polygon.simplify(tolerance, preserve_topology=True)
+            if isinstance(simplified, Polygon) and simplified.is_valid and not simplified.is_empty:
+                sign = 1. if polygon.exterior.is_ccw else -1.
+                polygon = orient(simplified, sign)
+                rings = _coordinates(polygon)
+                vertices = sum(len(i) for i in rings)
+        is_box = len(rings) == 1 and polygon.equals(polygon.envelope)
+        aoi = AOI(rings, polygon.bounds, vertices, is_box)
+    _cache.set(key, aoi)
+    return aoi
+
+
+def polygon_cache():
+    """Return the LRUCache of prepared polygons."""
+    return _cache
@@ -0,0 +1,107 @@
+import json
+import time
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from pele.lib.lru import LRUCache
+
+# calendar intervals of the date histograms
+INTERVALS = ('minute', 'hour', 'day', 'week', 'month', 'quarter', 'year')
+
+
+def bucket_start(t, interval):
+    """Return the start (UTC datetime) of the calendar interval holding t, as ES buckets it; weeks start on
+    Monday."""
+    if interval not in INTERVALS:
+        raise ValueError(f"Invalid interval: {interval}; one of {', '.join(INTERVALS)}")
+    t = t.astimezone(timezone.utc).replace(second=0, microsecond=0)
+    if interval == 'minute':
+        return t
+    t = t.replace(minute=0)
+    if interval == 'hour':
+        return t
+    t = t.replace(hour=0)
+    if interval == 'day':
+        return t
+    if interval == 'week':
+        return t - timedelta(days=t.weekday())
+    if interval == 'month':
+        return t.replace(day=1)
+    if interval == 'quarter':
+        return t.replace(month=(t.month - 1) // 3 * 3 + 1, day=1)
+    return t.replace(month=1, day=1)
+
+
+def isoformat(millis):
+    """Return the ISO time of epoch milliseconds."""
+    return datetime.fromtimestamp(millis / 1000., tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+class HistogramEntry:
+    """Closed buckets of a date histogram."""
+
+    __slots__ = ('buckets', 'closed_until', 'created_at')
+
+    def __init__(self, buckets, closed_until, created_at):
+        """
+        :param buckets: List[(key, count)] of the buckets starting before closed_until (epoch milliseconds)
+        :param closed_until: epoch milliseconds of the end of the last closed bucket
+        :param created_at: epoch seconds the oldest bucket was queried
+        """
+        self.buckets = buckets
+        self.closed_until = closed_until
+        self.created_at = created_at
+
+
+class HistogramCache:
+    """Closed buckets of date histograms by query, so repeated histograms only query the open tail.
+
+    A bucket is closed once it ends more than `lag` seconds ago, i.e. once late documents are no longer
+    expected in it; the closed buckets of a query are kept for `ttl` seconds from the first query (not
+    renewed as the tail is appended), after which documents ingested late into historical buckets show up.
+    """
+
+    def __init__(self, maxsize=10000, ttl=3600, lag=86400):
+        """
+        :param maxsize: maximum number of histograms kept
+        :param ttl: seconds the closed buckets of a histogram are kept
+        :param lag: seconds after its end a bucket is closed
+        """
+        self.ttl = ttl
+        self.lag = lag
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    @property
+    def hits(self):
+        return self._cache.hits
+
+    @property
+    def misses(self):
+        return self._cache.misses
+
+    @staticmethod
+    def key(index, body, interval):
+        """Return the cache key of the histogram of a query."""
+        query = json.dumps([index, body, interval], sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha1(query.encode()).hexdigest()
+
+    def closed_until(self, interval, now=None):
+        """Return the start (epoch milliseconds) of the first bucket of interval not closed yet."""
+        now = time.time() if now is None else now
+        t = datetime.fromtimestamp(now - self.lag, tz=timezone.utc)
+        return int(bucket_start(t, interval).timestamp() * 1000)
+
+    def get(self, key):
+        """Return the HistogramEntry of key or None."""
+        return self._cache.get(key, None)
+
+    def set(self, key, entry):
+        """Keep entry until ttl seconds after it was created."""
+        ttl = entry.created_at + self.ttl - time.time()
+        if ttl > 0:
+            self._cache.set(key, entry, ttl=ttl)
+
+    def stats(self):
+        stats = self._cache.stats()
+        stats.update(ttl=self.ttl, lag=self.lag)
+        return stats
@@ -0,0 +1,247 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
+
+
+# requests safe to send twice
+HEDGEABLE_ENDPOINTS = ('/_search', '/_msearch', '/_mget', '/_count')
+
+# guards creation of the executors of HedgingTransport, also after a fork
+_executor_lock = threading.Lock()
+
+
+def _reinit_lock():
+    global _executor_lock
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_lock)
+
+
+class HostStats:
+    """EWMA latency and error rate of every ES host, and ejection of hosts failing too often.
+
+    A host whose error rate reaches eject_error_rate is skipped for eject_secs, doubling on every
+    consecutive ejection up to eject_max_secs. After its ejection expires the host is tried again
+    and one successful request brings the backoff back to eject_secs.
+    """
+
+    def __init__(self, alpha=0.3, eject_error_rate=0.5, eject_secs=5, eject_max_secs=300):
+        """
+        :param alpha: weight of the latest request in the moving averages (0 < alpha <= 1)
+        :param eject_error_rate: error rate at which a host is ejected
+        :param eject_secs: seconds of the first ejection
+        :param eject_max_secs: maximum seconds of an ejection
+        """
+        self.alpha = alpha
+        self.eject_error_rate = eject_error_rate
+        self.eject_secs = eject_secs
+        self.eject_max_secs = eject_max_secs
+        self.hedged = 0
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        stats = self._hosts.get(host, None)
+        if stats is None:
+            stats = self._hosts[host] = {
+                'latency': None,
+                'error_rate': 0.,
+                'in_flight': 0,
+                'requests': 0,
+                'errors': 0,
+                'ejections': 0,
+                'ejected_until': 0.,
+            }
+        return stats
+
+    def start(self, host):
+        with self._lock:
+            self._host(host)['in_flight'] += 1
+
+    def record(self, host, secs, error=False):
+        """Record latency and outcome of a request to host."""
+        with self._lock:
+            stats = self._host(host)
+            stats['in_flight'] -= 1
+            stats['requests'] += 1
+            if stats['latency'] is None:
+                stats['latency'] = secs
+            else:
+                stats['latency'] += self.alpha * (secs - stats['latency'])
+            stats['error_rate'] += self.alpha * ((1. if error else 0.) - stats['error_rate'])
+
+            if not error:
+                stats['ejections'] = 0
+                return
+            stats['errors'] += 1
+            if stats['error_rate'] >= self.eject_error_rate and stats['ejected_until'] <= time.time():
+                backoff = min(self.eject_secs * 2 ** stats['ejections'], self.eject_max_secs)
+                stats['ejections'] += 1
+                stats['ejected_until'] = time.time() + backoff
+                # give the host a clean slate once it is tried again
+                stats['error_rate'] = self.eject_error_rate / 2
+
+    def score(self, host):
+        """Return expected latency of a new request to host; unmeasured hosts score 0 to be measured."""
+        stats = self._hosts.get(host, None)
+        if stats is None or stats['latency'] is None:
+            return 0.
+        return stats['latency'] * (stats['in_flight'] + 1)
+
+    def ejected(self, host, now=None):
+        return self.ejected_until(host) > (now or time.time())
+
+    def ejected_until(self, host):
+        """Return epoch seconds the ejection of host ends (0 if it was never ejected)."""
+        stats = self._hosts.get(host, None)
+        return stats['ejected_until'] if stats is not None else 0.
+
+    def record_hedge(self):
+        """Record a request sent a second time."""
+        with self._lock:
+            self.hedged += 1
+
+    def stats(self):
+        """Return stats of every host."""
+        now = time.time()
+        with self._lock:
+            return {
+                'hedged': self.hedged,
+                'hosts': {
+                    host: dict(stats, ejected=stats['ejected_until'] > now,
+                               ejected_until=stats['ejected_until'] or None)
+                    for host, stats in self._hosts.items()
+                }
+            }
+
+
+class LatencySelector:
+    """Connection selector choosing the better of two random healthy hosts by EWMA latency weighted by
+    requests in flight ("power of two choices"), so the fastest nodes get most of the load without all
+    workers herding onto the same one. Used as selector_class of the ES connection pool.
+    """
+
+    def __init__(self, opts):
+        self.connection_opts = opts
+
+    def select(self, connections):
+        host_stats = connections[0].host_stats
+        now = time.time()
+        healthy = [c for c in connections if not host_stats.ejected(c.host, now)]
+        if not healthy:
+            # every host is ejected: try the one coming back first
+            return min(connections, key=lambda c: host_stats.ejected_until(c.host))
+        if len(healthy) == 1:
+            return healthy[0]
+        return min(random.sample(healthy, 2), key=lambda c: host_stats.score(c.host))
+
+
+class TimedConnection:
+    """Connection mixin recording latency and errors of every request in host_stats."""
+
+    def __init__(self, *args, host_stats=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.host_stats = host_stats
+
+    def perform_request(self, *args, **kwargs):
+        if self.host_stats is None:
+            return super().perform_request(*args, **kwargs)
+
+        self.host_stats.start(self.host)
+        t0 = time.time()
+        error = False
+        try:
+            return super().perform_request(*args, **kwargs)
+        except Exception as e:
+            # missing documents and bad requests are not the host's fault
+            status = getattr(e, 'status_code', 'N/A')
+            error = not isinstance(status, int) or status >= 500 or status == 429
+            raise
+        finally:
+            self.host_stats.record(self.host, time.time() - t0, error=error)
+
+
+class HedgingTransport:
+    """Transport mixin sending a second copy of a read request to another host when the first one
+    has not answered within hedge_after seconds, and returning whichever answer comes first. The
+    selector chooses the host of the copy among the hosts the first request has not used.
+    """
+
+    def __init__(self, *args, hedge_after=0, host_stats=None, **kwargs):
+        super().__init__(*args, host_stats=host_stats, **kwargs)
+        self.hedge_after = hedge_after
+        self.host_stats = host_stats
+        self._executor = None
+        self._executor_pid = None
+        # connections used by, and excluded from, the request of the current thread
+        self._local = threading.local()
+
+    def executor(self):
+        """Return the executor of the hedged requests, created on first use in every process."""
+        pid = os.getpid()
+        if self._executor is not None and self._executor_pid == pid:
+            return self._executor
+        with _executor_lock:
+            if self._executor is None or self._executor_pid != pid:
+                # bounded by the connections hedged requests can use anyway
+                max_workers = self.kwargs.get('pool_maxsize', 10) * max(len(self.hosts), 1)
+                self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='es-hedge')
+                self._executor_pid = pid
+            return self._executor
+
+    def hedgeable(self, method, url):
+        if not self.hedge_after or len(self.connection_pool.connections) < 2:
+            return False
+        return method in ('GET', 'HEAD') or (method == 'POST' and url.endswith(HEDGEABLE_ENDPOINTS))
+
+    def get_connection(self):
+        exclude = getattr(self._local, 'exclude', None)
+        connection = None
+        if exclude:
+            self.connection_pool.resurrect()
+            connections = [c for c in self.connection_pool.connections if c not in exclude]
+            if len(connections) == 1:
+                connection = connections[0]
+            elif connections:
+                connection = self.connection_pool.selector.select(connections)
+        if connection is None:
+            connection = super().get_connection()
+        used = getattr(self._local, 'used', None)
+        if used is not None:
+            used.append(connection)
+        return connection
+
+    def _perform(self, used, exclude, method, url, headers=None, params=None, body=None):
+        """Perform a request on an executor thread, appending the connections it uses to used and
+        choosing them among those not in exclude."""
+        self._local.used, self._local.exclude = used, exclude
+        try:
+            return super().perform_request(method, url, headers=headers, params=params, body=body)
+        finally:
+            self._local.used = self._local.exclude = None
+
+    def perform_request(self, method, url, headers=None, params=None, body=None):
+        if not self.hedgeable(method, url):
+            return super().perform_request(method, url, headers=headers, params=params, body=body)
+
+        executor = self.executor()
+        used = []
+        first = executor.submit(self._perform, used, None, method, url, headers=headers, params=params, body=body)
+        try:
+            return first.result(timeout=self.hedge_after)
+        except FutureTimeoutError:
+            pass
+
+        if self.host_stats is not None:
+            self.host_stats.record_hedge()
+        hedge = executor.submit(self._perform, None, used, method, url, headers=headers, params=params, body=body)
+        pending = {first, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None or not pending:
+                    return f.result()
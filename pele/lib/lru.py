@@ -0,0 +1,87 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with optional per-entry expiration and hit/miss counters."""
+
+    def __init__(self, maxsize=1024, ttl=None, maxbytes=None):
+        """
+        :param maxsize: maximum number of entries
+        :param ttl: (optional) default seconds before an entry expires
+        :param maxbytes: (optional) maximum total len() of the values (e.g. bytes); larger values are not kept
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _size(self, value):
+        return len(value) if self.maxbytes is not None else 0
+
+    def _pop(self, key):
+        value, _ = self._data.pop(key)
+        self.nbytes -= self._size(value)
+
+    def get(self, key, default=None):
+        """Return value of key or default if missing or expired."""
+        with self._lock:
+            item = self._data.get(key, None)
+            if item is not None:
+                value, expires = item
+                if expires is None or expires > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._pop(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Set value of key; ttl overrides the default expiration."""
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl is not None else None
+        size = self._size(value)
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            self._data[key] = (value, expires)
+            self.nbytes += size
+            while len(self._data) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes):
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Return size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+            }
+            if self.maxbytes is not None:
+                stats['bytes'] = self.nbytes
+                stats['maxbytes'] = self.maxbytes
+            return stats
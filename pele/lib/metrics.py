@@ -0,0 +1,225 @@
+"""Prometheus metrics of the API and of its Elasticsearch calls, exported at /metrics.
+
+Requires prometheus_client (the "metrics" extras). To aggregate the metrics of all gunicorn workers,
+point PROMETHEUS_MULTIPROC_DIR to an empty directory in the environment of gunicorn and remove the
+files of exited workers with the child_exit hook of a gunicorn config file:
+
+    from pele.lib.metrics import child_exit
+"""
+import os
+import time
+import inspect
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+
+from flask import g, request, current_app, has_app_context
+
+from pele.lib.timing import phase
+from pele.lib.geo import polygon_cache
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess, CollectorRegistry, Counter, Histogram
+except ImportError:  # optional
+    prometheus_client = None
+
+# QueryES method issuing the current Elasticsearch calls
+current_method = contextvars.ContextVar('current_method', default='other')
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Metrics:
+    """Request, Elasticsearch, cache and rate limiter metrics of an app."""
+
+    def __init__(self, buckets=None):
+        """
+        :param buckets: (optional) latency histogram buckets in seconds
+        """
+        self.registry = CollectorRegistry(auto_describe=True)
+        buckets = tuple(buckets) if buckets else Histogram.DEFAULT_BUCKETS
+        self.requests = Counter('pele_requests_total', "Requests per endpoint, method and status",
+                                ['endpoint', 'method', 'status'], registry=self.registry)
+        self.request_latency = Histogram('pele_request_duration_seconds', "Request latency per endpoint",
+                                         ['endpoint'], buckets=buckets, registry=self.registry)
+        self.response_size = Histogram('pele_response_size_bytes', "Response body size per endpoint",
+                                       ['endpoint'], buckets=SIZE_BUCKETS, registry=self.registry)
+        self.es_requests = Counter('pele_es_requests_total', "Elasticsearch calls per QueryES method",
+                                   ['method'], registry=self.registry)
+        self.es_errors = Counter('pele_es_errors_total', "Failed Elasticsearch calls per QueryES method",
+                                 ['method'], registry=self.registry)
+        self.es_latency = Histogram('pele_es_request_duration_seconds',
+                                    "Elasticsearch call latency per QueryES method", ['method'], buckets=buckets,
+                                    registry=self.registry)
+        self.cache_lookups = Counter('pele_cache_lookups_total', "Cache lookups per cache and result",
+                                     ['cache', 'result'], registry=self.registry)
+        self.rate_limited = Counter('pele_rate_limited_total', "Requests rejected by the rate limiter per endpoint",
+                                    ['endpoint'], registry=self.registry)
+
+        self.caches = {}
+        self._seen = {}
+
+    def watch_cache(self, name, cache):
+        """Export the hits/misses counters of cache (e.g. an LRUCache) as cache lookups of name."""
+        self.caches[name] = cache
+        self._seen[name] = (cache.hits, cache.misses)
+
+    def sync_caches(self):
+        """Add the cache hits and misses counted since the last call."""
+        for name, cache in self.caches.items():
+            hits, misses = cache.hits, cache.misses
+            seen_hits, seen_misses = self._seen[name]
+            if hits > seen_hits:
+                self.cache_lookups.labels(name, 'hit').inc(hits - seen_hits)
+            if misses > seen_misses:
+                self.cache_lookups.labels(name, 'miss').inc(misses - seen_misses)
+            self._seen[name] = (hits, misses)
+
+    def observe_request(self, endpoint, method, status, secs, size=None):
+        self.requests.labels(endpoint, method, status).inc()
+        self.request_latency.labels(endpoint).observe(secs)
+        if size is not None:
+            self.response_size.labels(endpoint).observe(size)
+        if status == 429:
+            self.rate_limited.labels(endpoint).inc()
+        self.sync_caches()
+
+    def observe_es(self, secs, error=False):
+        method = current_method.get()
+        self.es_requests.labels(method).inc()
+        self.es_latency.labels(method).observe(secs)
+        if error:
+            self.es_errors.labels(method).inc()
+
+    def export(self):
+        """Return the metrics in Prometheus text format, aggregated over all workers in multiprocess mode."""
+        registry = self.registry
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        return prometheus_client.generate_latest(registry)
+
+
+def get_metrics():
+    """Return Metrics of the current app or None if disabled."""
+    return getattr(current_app, 'metrics', None) if has_app_context() else None
+
+
+@contextmanager
+def es_call():
+    """Time an Elasticsearch call as the es phase of the request, in the metrics of the current
+    QueryES method and in the latency tracked by admission control."""
+    app = current_app._get_current_object() if has_app_context() else None
+    metrics = getattr(app, 'metrics', None)
+    admission = getattr(app, 'admission', None)
+    with phase('es'):
+        if metrics is None and admission is None:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            secs = time.perf_counter() - t0
+            if metrics is not None:
+                metrics.observe_es(secs, error=True)
+            if admission is not None:
+                admission.observe(secs)
+            raise
+        secs = time.perf_counter() - t0
+        if metrics is not None:
+            metrics.observe_es(secs)
+        if admission is not None:
+            admission.observe(secs)
+
+
+def es_method(f):
+    """Label the Elasticsearch calls made by f (a function, coroutine or generator) with its name."""
+    name = f.__name__
+
+    if inspect.iscoroutinefunction(f):
+        @wraps(f)
+        async def coroutine(*args, **kwargs):
+            token = current_method.set(name)
+            try:
+                return await f(*args, **kwargs)
+            finally:
+                current_method.reset(token)
+        return coroutine
+
+    if inspect.isgeneratorfunction(f):
+        @wraps(f)
+        def generator(*args, **kwargs):
+            gen = f(*args, **kwargs)
+            while True:
+                token = current_method.set(name)
+                try:
+                    item = next(gen)
+                except StopIteration:
+                    return
+                finally:
+                    current_method.reset(token)
+                yield item
+        return generator
+
+    @wraps(f)
+    def function(*args, **kwargs):
+        token = current_method.set(name)
+        try:
+            return f(*args, **kwargs)
+        finally:
+            current_method.reset(token)
+    return function
+
+
+def es_methods(cls):
+    """Class decorator applying es_method to the public query methods of cls defined on it."""
+    for name, f in list(vars(cls).items()):
+        if not name.startswith('_') and name != 'close' and inspect.isfunction(f):
+            setattr(cls, name, es_method(f))
+    return cls
+
+
+def child_exit(server, worker):
+    """gunicorn hook removing the metric files of an exited worker in multiprocess mode."""
+    if prometheus_client is not None and 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def init_app(app):
+    """Record the metrics of app and export them at METRICS_PATH if METRICS is set."""
+    if not app.config.get('METRICS', False):
+        return None
+    if prometheus_client is None:
+        app.logger.warning("METRICS is set but prometheus_client is not installed")
+        return None
+
+    metrics = app.metrics = Metrics(buckets=app.config.get('METRICS_LATENCY_BUCKETS', None))
+    metrics.watch_cache('token', app.token_cache.tokens)
+    metrics.watch_cache('user', app.token_cache.users)
+    metrics.watch_cache('id_index', app.es_util.id_indices)
+    metrics.watch_cache('polygon', polygon_cache())
+    if app.es_util.catalog is not None:
+        metrics.watch_cache('facet_catalog', app.es_util.catalog)
+    if app.es_util.histograms is not None:
+        metrics.watch_cache('histogram', app.es_util.histograms)
+
+    @app.before_request
+    def _start():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            size = None if response.is_streamed else response.calculate_content_length()
+            metrics.observe_request(request.endpoint or 'none', request.method, response.status_code,
+                                    time.perf_counter() - start, size)
+        return response
+
+    def export():
+        return app.response_class(metrics.export(), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+    app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', export)
+    return metrics
@@ -1,19 +1,60 @@
+import re
 import json
+import time
+import base64
+import logging
+import binascii
 
-from flask import current_app
+from flask import current_app, has_app_context
 
 from pele import cache
+from pele.lib.lru import LRUCache
+from pele.lib.geo import AOI, prepare_polygon
+from pele.lib.histogram import INTERVALS, HistogramEntry, isoformat
+from pele.lib.timing import phase, es_response
+from pele.lib.metrics import es_call, es_methods
+from pele.lib.result_cache import active_cache, record as record_cache_status
 
 # MAX_SIZE = 2147483647
 MAX_SIZE = 10000
 
+# ID prefixes and concrete indices remembered for the direct dataset ID lookup
+ID_PREFIX_CACHE_SIZE = 10000
+
+# hits per ID requested by query_ids, for IDs held by more than one index of the alias
+ID_COPIES = 2
+MAX_PREFIX_INDICES = 8
+
+ID_PREFIX_RE = re.compile(r'[A-Za-z0-9]+')
+
+# parts of the responses kept by filter_path when RAW_SEARCH is set; _id keeps hits whose _source
+# holds none of the requested fields
+HITS_FILTER = ('took', 'hits.total', 'hits.hits._id', 'hits.hits._source')
+DOCS_FILTER = HITS_FILTER + ('hits.hits._index',)
+PAGE_FILTER = HITS_FILTER + ('hits.hits.sort', 'pit_id')
+AGGS_FILTER = ('took', 'aggregations')
+MSEARCH_FILTER = ('took', 'responses.error', 'responses.status', 'responses.hits.total',
+                  'responses.hits.hits._id', 'responses.hits.hits._source')
+
 
 def get_page_size(r):
     """Return page size."""
     page_size = int(r.form.get('page_size', r.args.get('page_size', current_app.config['DEFAULT_PAGE_SIZE'])))
+    check_page_size(page_size)
+    return page_size
+
+
+def check_page_size(page_size):
+    """Raise if page size is larger than allowed."""
     if page_size > current_app.config['MAX_PAGE_SIZE']:
         raise RuntimeError("Maximum page size is {}.".format(current_app.config['MAX_PAGE_SIZE']))
-    return page_size
+
+
+def check_page_size_and_offset(page_size, offset):
+    """Raise if page size and offset are outside of the from + size window."""
+    check_page_size(page_size)
+    if page_size + offset > 10000:
+        raise RuntimeError('Elasticsearch does not allow page_size + offset to be > 10,000')
 
 
 def get_offset(r):
@@ -21,31 +62,76 @@ def get_offset(r):
     return int(r.form.get('offset', r.args.get('offset', 0)))
 
 
+def id_prefix(_id):
+    """Return the dataset-level prefix of a dataset ID, everything up to its last "-", e.g.
+    "acquisition-S1-IW_SLC" for "acquisition-S1-IW_SLC-20170418T213512", so IDs of different datasets
+    sharing a leading word are not keyed together; IDs without a "-" are keyed on their leading
+    alphanumeric run, e.g. "AOI" for "AOI_earthquake_test_san_fran"."""
+    if '-' in _id:
+        return _id.rsplit('-', 1)[0]
+    m = ID_PREFIX_RE.match(_id)
+    return m.group() if m else ''
+
+
+def get_cursor(r, request_json=None):
+    """Return cursor or None if cursor paging was not requested (an empty cursor starts from the first page);
+    a cursor in request_json (the JSON body of a POST request) takes precedence over the form and arguments.
+
+    :raises ValueError: on a malformed cursor
+    """
+    cursor = request_json.get('cursor', None) if isinstance(request_json, dict) else None
+    if cursor is None:
+        cursor = r.form.get('cursor', r.args.get('cursor', None))
+    if cursor is not None and not isinstance(cursor, str):
+        raise ValueError('Invalid cursor value: %s' % cursor)
+    decode_cursor(cursor)
+    return cursor
+
+
+def encode_cursor(c):
+    """Encode JSON-serializable cursor state into an opaque URL-safe token."""
+    return base64.urlsafe_b64encode(json.dumps(c, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(token):
+    """Decode an opaque cursor token; an empty token decodes to None."""
+    if not token:
+        return None
+    try:
+        c = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (AttributeError, binascii.Error, ValueError):
+        c = None
+    if not isinstance(c, dict):
+        raise ValueError('Invalid cursor value: %s' % token)
+    return c
+
+
 def parse_polygon(p):
     """
-    Parses string polygon to List
+    Parses, validates and normalizes a polygon; see pele.lib.geo.prepare_polygon. Polygons are simplified
+    according to POLYGON_SIMPLIFY_TOLERANCE and POLYGON_SIMPLIFY_MIN_VERTICES.
     ex: [[[148.16571324025443, -34.86565143737159], ... , [148.16571324025443, -34.86565143737159]]]
-    :param p: str
-    :return: List
+    :param p: str (JSON), List or AOI
+    :return: AOI
     """
-    try:
-        p = json.loads(p)
-        if type(p) != list:
-            raise TypeError("polygon must be type list")
+    if isinstance(p, AOI):
         return p
-    except json.JSONDecodeError:
-        raise ValueError('Invalid polygon value: %s' % p)
+    if not isinstance(p, (str, list)):
+        raise TypeError("polygon must be type list")
+    config = current_app.config if has_app_context() else {}
+    return prepare_polygon(p, tolerance=config.get('POLYGON_SIMPLIFY_TOLERANCE', 0.),
+                           min_vertices=config.get('POLYGON_SIMPLIFY_MIN_VERTICES', 0))
 
 
 def get_page_size_and_offset(r):
     """Return page size and offset."""
     page_size = get_page_size(r)
     offset = get_offset(r)
-    if page_size + offset > 10000:
-        raise RuntimeError('Elasticsearch does not allow page_size + offset to be > 10,000')
+    check_page_size_and_offset(page_size, offset)
     return page_size, offset
 
 
+@es_methods
 class QueryES:
     """Class for querying ES backend."""
 
@@ -61,6 +147,371 @@ class QueryES:
         self.Q = Q
         self.A = A
 
+        # optional FacetCatalog serving the type/dataset listings from memory
+        self.catalog = None
+
+        # (index, ID prefix) -> concrete indices that held IDs with that prefix
+        self.id_indices = LRUCache(maxsize=ID_PREFIX_CACHE_SIZE)
+
+        # optional IndexFingerprints of the state of the searched indices
+        self.fingerprints = None
+
+        # optional IndexResolver narrowing searches of the alias to the indices of a dataset or type
+        self.resolver = None
+
+        # optional HistogramCache of the closed buckets of date histograms
+        self.histograms = None
+
+    def _facets(self, index):
+        """Return the cached Facets of index or None to fall back to a live query."""
+        if self.catalog is None:
+            return None
+        return self.catalog.get(index)
+
+    def _resolve(self, index, dataset=None, dataset_type=None):
+        """Return the indices of index that can hold documents of dataset and/or dataset_type."""
+        if self.resolver is None:
+            return index
+        return self.resolver.resolve(index, dataset=dataset, dataset_type=dataset_type)
+
+    def _filter(self, s, start_time=None, end_time=None, polygon=None):
+        """Add temporal and spatial filters to a Search object.
+
+        :param s: Search object
+        :param start_time: (optional) Greater than or equal of Timestamp field (start_time) in ISO format
+        :param end_time: (optional) Less than of Timestamp field (end_time) in ISO format
+        :param polygon: (optional) AOI or List[List[int]]
+        :return: Search object
+        """
+        if start_time is not None:
+            s = s.query('range', **{'starttime': {'gte': start_time}})
+        if end_time is not None:
+            s = s.query('range', **{'endtime': {'lt': end_time}})
+        if polygon is not None:
+            polygon = parse_polygon(polygon)
+            envelope = polygon.envelope()
+            if envelope is not None and not polygon.is_box and \
+                    (current_app.config.get('POLYGON_ENVELOPE_PREFILTER', True) if has_app_context() else True):
+                # cheap bounding box clause ahead of the exact shape; as a filter it is cached by ES
+                s = s.filter('geo_shape', **{'location': {'shape': envelope}})
+            s = s.query('geo_shape', **{'location': {'shape': polygon.shape()}})
+        return s
+
+    def _terms(self, terms):
+        """Return bool query of term queries (None if no terms); "." in field names is mapped to "__"."""
+        q = None
+        for field, val in list(terms.items()):
+            f = field.lower().replace('.', '__')
+            if q is None:
+                q = self.Q('term', **{f: val})
+            else:
+                q += self.Q('term', **{f: val})
+        return q
+
+    def _execute(self, s, filter_path=None):
+        """Execute search and return the raw response; hits.total is tracked according to
+        TRACK_TOTAL_HITS (True, False or an accuracy threshold) unless set on s. With RAW_SEARCH the
+        compiled body is sent through the low-level client and ES trims the response to filter_path,
+        skipping the DSL Response/AttrDict wrappers; parts of the response without any value kept
+        (e.g. hits.hits of an empty page) are then missing. Searches of the endpoints opted in to the
+        result cache are answered from it when cached (see pele.lib.result_cache).
+
+        :param s: Search object
+        :param filter_path: (optional) List[str]; response fields to keep with RAW_SEARCH
+        :return: Dict
+        """
+        with phase('build'):
+            s = self._track_total_hits(s)
+            body = s.to_dict()
+        current_app.logger.debug("search %s: %s", s._index, body)
+
+        raw = current_app.config.get('RAW_SEARCH', False)
+        params = dict(s._params)
+        if raw and filter_path:
+            params['filter_path'] = ','.join(filter_path)
+
+        result_cache = active_cache() if 'pit' not in body else None
+        key = result_cache.key(s._index, body, params) if result_cache is not None else None
+        if key is not None:
+            resp, status = result_cache.get(key)
+            record_cache_status(status)
+            if resp is not None:
+                return resp
+
+        if not raw:
+            with es_call():
+                resp = s.execute()
+            with phase('hits'):
+                resp = es_response(resp.to_dict())
+        else:
+            with es_call():
+                resp = es_response(self.client.search(index=s._index, body=body, **params))
+        if key is not None:
+            result_cache.set(key, resp)
+        return resp
+
+    @staticmethod
+    def _track_total_hits(s):
+        """Set track_total_hits from TRACK_TOTAL_HITS unless set on s."""
+        if 'track_total_hits' not in s._extra:
+            s = s.extra(track_total_hits=current_app.config.get('TRACK_TOTAL_HITS', True))
+        return s
+
+    def _search(self, s, filter_path=HITS_FILTER):
+        """Execute search and return total and raw hits from a single round trip.
+
+        :param s: Search object
+        :param filter_path: response fields to keep with RAW_SEARCH
+        :return: (total, List[Dict])
+        """
+        resp = self._execute(s, filter_path=filter_path)
+        return self._total(resp), self._hits(resp)
+
+    @staticmethod
+    def _hits(resp):
+        """Return hits of a raw response."""
+        return resp.get('hits', {}).get('hits', [])
+
+    @staticmethod
+    def _total(resp):
+        """Return hits.total of a raw response (None if not tracked)."""
+        total = resp.get('hits', {}).get('total', None)
+        if isinstance(total, dict):
+            total = total['value']
+        return total
+
+    def _open_pit(self, index):
+        """Open a point-in-time on index and return its id."""
+        keep_alive = current_app.config.get('PIT_KEEP_ALIVE', '1m')
+        with es_call():
+            if hasattr(self.client, 'open_point_in_time'):
+                return self.client.open_point_in_time(index=index, keep_alive=keep_alive)['id']
+            if hasattr(self.client, 'create_point_in_time'):  # opensearch
+                return self.client.create_point_in_time(index=index, keep_alive=keep_alive)['pit_id']
+        raise RuntimeError("Cursor paging requires point-in-time support: elasticsearch>=7.10 or opensearch-py")
+
+    def _close_pit(self, pit):
+        """Close a point-in-time; failures are logged since the PIT expires on its own."""
+        try:
+            with es_call():
+                if hasattr(self.client, 'close_point_in_time'):
+                    self.client.close_point_in_time(body={'id': pit})
+                else:
+                    self.client.delete_point_in_time(body={'pit_id': [pit]})  # opensearch
+        except Exception as e:
+            current_app.logger.warning(f"Failed to close point-in-time: {e}")
+
+    def _search_after(self, s, index, cursor, page_size):
+        """Return one page of a search using point-in-time and search_after so that deep pages cost the
+        same as the first one. Hits are sorted by starttime (descending) with SEARCH_AFTER_TIEBREAKER
+        (ascending) as tiebreaker. If the point-in-time of the cursor expired, a new one is opened and
+        paging resumes after the last sort values.
+
+        :param s: Search object holding the query
+        :param index: Elasticsearch index/alias
+        :param cursor: cursor returned with the previous page; empty for the first page
+        :param page_size: self-explanatory
+        :return: (total, List[Dict], next cursor); total is only tracked on the first page and the
+                 next cursor is None on the last page
+        """
+        state = decode_cursor(cursor) or {}
+        after = state.get('after', None)
+        tiebreaker = current_app.config.get('SEARCH_AFTER_TIEBREAKER', 'id.keyword')
+        keep_alive = current_app.config.get('PIT_KEEP_ALIVE', '1m')
+
+        index = ','.join(s._index) if s._index else index  # as narrowed by the resolver
+        s = s.index().sort({'starttime': {'order': 'desc'}}, {tiebreaker: {'order': 'asc'}})
+        s = s.extra(size=page_size)
+        if after is not None:
+            s = s.extra(search_after=after, track_total_hits=False)
+
+        pit = state.get('pit', None)
+        resp = None
+        if pit is not None:
+            try:
+                resp = self._execute(s.extra(pit={'id': pit, 'keep_alive': keep_alive}), filter_path=PAGE_FILTER)
+            except Exception as e:
+                if getattr(e, 'status_code', None) != 404:
+                    raise
+                current_app.logger.debug("Point-in-time expired, reopening: %s", e)
+        if resp is None:
+            pit = self._open_pit(index)
+            resp = self._execute(s.extra(pit={'id': pit, 'keep_alive': keep_alive}), filter_path=PAGE_FILTER)
+
+        pit = resp.get('pit_id', pit)
+        hits = self._hits(resp)
+        if len(hits) < page_size:
+            self._close_pit(pit)
+            return self._total(resp), hits, None
+        return self._total(resp), hits, encode_cursor({'pit': pit, 'after': hits[-1]['sort']})
+
+    def _scan(self, s, index, cursor=None, page_size=MAX_SIZE):
+        """Walk all hits of a search with point-in-time and search_after.
+
+        :param s: Search object holding the query
+        :param index: Elasticsearch index/alias
+        :param cursor: (optional) cursor to resume from
+        :param page_size: hits per ES request
+        :return: generator of (List[Dict], next cursor) per page; the cursor of the last page is None
+        """
+        s = s.extra(track_total_hits=False)
+        while True:
+            _, hits, cursor = self._search_after(s, index, cursor, page_size)
+            yield hits, cursor
+            if cursor is None:
+                return
+
+    def _terms_agg(self, index, name, field, query=None):
+        """Return Search object of a terms aggregation of up to MAX_SIZE buckets."""
+        s = self.Search(using=self.client, index=index).extra(size=0, track_total_hits=False)
+        if query is not None:
+            s = s.query(query)
+        s.aggs.bucket(name, self.A('terms', field=field, size=MAX_SIZE))
+        return s
+
+    @staticmethod
+    def _keys(resp, name):
+        """Return bucket keys of an aggregation of a raw response."""
+        return [i['key'] for i in resp.get('aggregations', {}).get(name, {}).get('buckets', [])]
+
+    def _composite_page(self, s, sources, page_size, after=None, aggs=None):
+        """Return (buckets, after_key) of one page of a composite aggregation.
+
+        :param s: Search object holding the query
+        :param sources: List[Dict]; composite sources, e.g. [{"types": {"terms": {"field": "dataset_type.keyword"}}}]
+        :param page_size: number of buckets to return
+        :param after: (optional) after_key of the previous page
+        :param aggs: (optional) Dict; sub-aggregations of every bucket by name
+        :return: buckets and the after_key of this page (None if no more pages)
+        """
+        s = s.extra(size=0, track_total_hits=False)
+        kwargs = {'sources': sources, 'size': page_size}
+        if after is not None:
+            kwargs['after'] = after
+        pages = s.aggs.bucket('pages', self.A('composite', **kwargs))
+        for name, agg in (aggs or {}).items():
+            pages.metric(name, agg)
+
+        agg = self._execute(s, filter_path=AGGS_FILTER).get('aggregations', {}).get('pages', {})
+        buckets = agg.get('buckets', [])
+        after_key = agg.get('after_key', None) if len(buckets) == page_size else None
+        return buckets, after_key
+
+    def query_summary(self, index, datasets=None, ingested_since=None):
+        """Return a summary row per type/dataset pair with its doc count, temporal extent, bounding box
+        and latest ingest time, paging through one composite aggregation with metric sub-aggregations:
+        {
+          "aggs": {
+            "pages": {
+              "composite": {
+                "sources": [
+                  {"dataset_type": {"terms": {"field": "dataset_type.keyword"}}},
+                  {"dataset": {"terms": {"field": "dataset.keyword"}}}
+                ],
+                "size": 10000
+              },
+              "aggs": {
+                "starttime": {"min": {"field": "starttime"}},
+                "endtime": {"max": {"field": "endtime"}},
+                "bbox": {"geo_bounds": {"field": "location"}},
+                "ingest": {"max": {"field": "creation_timestamp"}}
+              }
+            }
+          },
+          "size": 0
+        }
+        The bounding box and ingest fields are SUMMARY_BBOX_FIELD and SUMMARY_INGEST_FIELD.
+
+        :param index: Elasticsearch index/alias
+        :param datasets: (optional) List[str]; only summarize these datasets
+        :param ingested_since: (optional) only count documents ingested at or after this ISO time
+        :return: List[Dict] of type, dataset, count, starttime, endtime, bbox ([min_lon, min_lat, max_lon,
+                 max_lat]) and latest_ingest
+        """
+
+        s = self.Search(using=self.client, index=index)
+        if datasets is not None:
+            s = s.filter('terms', dataset__keyword=list(datasets))
+        ingest_field = current_app.config.get('SUMMARY_INGEST_FIELD', 'creation_timestamp')
+        if ingested_since is not None:
+            s = s.filter('range', **{ingest_field: {'gte': ingested_since}})
+        sources = [
+            {'dataset_type': {'terms': {'field': 'dataset_type.keyword'}}},
+            {'dataset': {'terms': {'field': 'dataset.keyword'}}},
+        ]
+        aggs = {
+            'starttime': self.A('min', field='starttime'),
+            'endtime': self.A('max', field='endtime'),
+            'bbox': self.A('geo_bounds', field=current_app.config.get('SUMMARY_BBOX_FIELD', 'location')),
+            'ingest': self.A('max', field=ingest_field),
+        }
+        rows = []
+        after = None
+        while True:
+            buckets, after = self._composite_page(s, sources, MAX_SIZE, after=after, aggs=aggs)
+            rows.extend(self._summary_row(i) for i in buckets)
+            if after is None:
+                return rows
+
+    @staticmethod
+    def _summary_row(bucket):
+        bounds = bucket.get('bbox', {}).get('bounds', None)
+        bbox = None
+        if bounds is not None:
+            bbox = [bounds['top_left']['lon'], bounds['bottom_right']['lat'],
+                    bounds['bottom_right']['lon'], bounds['top_left']['lat']]
+        return {
+            'type': bucket['key']['dataset_type'],
+            'dataset': bucket['key']['dataset'],
+            'count': bucket['doc_count'],
+            'starttime': bucket.get('starttime', {}).get('value_as_string', None),
+            'endtime': bucket.get('endtime', {}).get('value_as_string', None),
+            'bbox': bbox,
+            'latest_ingest': bucket.get('ingest', {}).get('value_as_string', None),
+        }
+
+    def _query_terms_after(self, index, field, cursor, page_size, query=None):
+        """Return one page of distinct values of field and the cursor of the next page (None on the last page)."""
+        s = self.Search(using=self.client, index=index)
+        if query is not None:
+            s = s.query(query)
+        sources = [{'key': {'terms': {'field': field}}}]
+        buckets, after_key = self._composite_page(s, sources, page_size, after=decode_cursor(cursor))
+        next_cursor = encode_cursor(after_key) if after_key is not None else None
+        return [i['key']['key'] for i in buckets], next_cursor
+
+    def query_facets(self, index):
+        """Return (dataset_type, dataset, doc_count) for every type/dataset pair, paging through a
+        composite aggregation so the listing is not truncated at MAX_SIZE buckets:
+        {
+          "aggs": {
+            "pages": {
+              "composite": {
+                "sources": [
+                  {"dataset_type": {"terms": {"field": "dataset_type.keyword"}}},
+                  {"dataset": {"terms": {"field": "dataset.keyword"}}}
+                ],
+                "size": 10000
+              }
+            }
+          },
+          "size": 0
+        }
+        """
+
+        s = self.Search(using=self.client, index=index)
+        sources = [
+            {'dataset_type': {'terms': {'field': 'dataset_type.keyword'}}},
+            {'dataset': {'terms': {'field': 'dataset.keyword'}}},
+        ]
+        rows = []
+        after = None
+        while True:
+            buckets, after = self._composite_page(s, sources, MAX_SIZE, after=after)
+            rows.extend((i['key']['dataset_type'], i['key']['dataset'], i['doc_count']) for i in buckets)
+            if after is None:
+                return rows
+
     def query_types(self, index, offset, page_size):
         """Return list of dataset types:
         {
@@ -79,13 +530,12 @@ class QueryES:
         }
         """
 
-        s = self.Search(using=self.client, index=index).extra(size=0)
-        a = self.A('terms', field='dataset_type.keyword', size=MAX_SIZE)
-        s.aggs.bucket('types', a)
+        facets = self._facets(index)
+        if facets is not None:
+            return len(facets.types), facets.types[offset:offset + page_size]
 
-        current_app.logger.debug(s.to_dict())
-
-        types = [i['key'] for i in s.execute().aggregations.to_dict()['types']['buckets']]
+        s = self._terms_agg(index, 'types', 'dataset_type.keyword')
+        types = self._keys(self._execute(s, filter_path=AGGS_FILTER), 'types')
         return len(types), types[offset:offset+page_size]
 
     def query_datasets(self, index, offset, page_size):
@@ -106,13 +556,12 @@ class QueryES:
         }
         """
 
-        s = self.Search(using=self.client, index=index).extra(size=0)
-        a = self.A('terms', field='dataset.keyword', size=MAX_SIZE)
-        s.aggs.bucket('datasets', a)
-
-        current_app.logger.debug(s.to_dict())
+        facets = self._facets(index)
+        if facets is not None:
+            return len(facets.datasets), facets.datasets[offset:offset + page_size]
 
-        datasets = [i['key'] for i in s.execute().aggregations.to_dict()['datasets']['buckets']]
+        s = self._terms_agg(index, 'datasets', 'dataset.keyword')
+        datasets = self._keys(self._execute(s, filter_path=AGGS_FILTER), 'datasets')
         return len(datasets), datasets[offset:offset+page_size]
 
     def query_datasets_by_type(self, index, dataset_type, offset, page_size):
@@ -135,15 +584,14 @@ class QueryES:
         }
         """
 
-        s = self.Search(using=self.client, index=index).extra(size=0)
-        q = self.Q('term', dataset_type__keyword=dataset_type)
-        a = self.A('terms', field='dataset.keyword', size=MAX_SIZE)
-        s = s.query(q)
-        s.aggs.bucket('datasets', a)
-
-        current_app.logger.debug(s.to_dict())
+        facets = self._facets(index)
+        if facets is not None:
+            datasets = facets.datasets_by_type.get(dataset_type, [])
+            return len(datasets), datasets[offset:offset + page_size]
 
-        datasets = [i['key'] for i in s.execute().aggregations.to_dict()['datasets']['buckets']]
+        q = self.Q('term', dataset_type__keyword=dataset_type)
+        s = self._terms_agg(index, 'datasets', 'dataset.keyword', query=q)
+        datasets = self._keys(self._execute(s, filter_path=AGGS_FILTER), 'datasets')
         return len(datasets), datasets[offset:offset + page_size]
 
     def query_types_by_dataset(self, index, dataset, offset, page_size):
@@ -166,16 +614,33 @@ class QueryES:
         }
         """
 
-        s = self.Search(using=self.client, index=index).extra(size=0)
+        facets = self._facets(index)
+        if facets is not None:
+            types = facets.types_by_dataset.get(dataset, [])
+            return len(types), types[offset:offset + page_size]
+
         q = self.Q('term', dataset__keyword=dataset)
-        a = self.A('terms', field='dataset_type.keyword', size=MAX_SIZE)
-        s = s.query(q)
-        s.aggs.bucket('types', a)
+        s = self._terms_agg(index, 'types', 'dataset_type.keyword', query=q)
+        types = self._keys(self._execute(s, filter_path=AGGS_FILTER), 'types')
+        return len(types), types[offset:offset+page_size]
 
-        current_app.logger.debug(s.to_dict())
+    def query_types_after(self, index, cursor, page_size):
+        """Return page of dataset types in key order and the cursor of the next page."""
+        return self._query_terms_after(index, 'dataset_type.keyword', cursor, page_size)
 
-        types = [i['key'] for i in s.execute().aggregations.to_dict()['types']['buckets']]
-        return len(types), types[offset:offset+page_size]
+    def query_datasets_after(self, index, cursor, page_size):
+        """Return page of datasets in key order and the cursor of the next page."""
+        return self._query_terms_after(index, 'dataset.keyword', cursor, page_size)
+
+    def query_datasets_by_type_after(self, index, dataset_type, cursor, page_size):
+        """Return page of datasets by type in key order and the cursor of the next page."""
+        q = self.Q('term', dataset_type__keyword=dataset_type)
+        return self._query_terms_after(index, 'dataset.keyword', cursor, page_size, query=q)
+
+    def query_types_by_dataset_after(self, index, dataset, cursor, page_size):
+        """Return page of types by dataset in key order and the cursor of the next page."""
+        q = self.Q('term', dataset__keyword=dataset)
+        return self._query_terms_after(index, 'dataset_type.keyword', cursor, page_size, query=q)
 
     def query_ids_by_dataset(self, index, dataset, offset, page_size, start_time=None, end_time=None, polygon=None):
         """
@@ -200,25 +665,38 @@ class QueryES:
         :return: Elasticsearch document
         """
 
-        s = self.Search(using=self.client, index=index).query(self.Q('term', dataset__keyword=dataset))
-        if start_time is not None:
-            s = s.query('range', **{'starttime': {'gte': start_time}})
-        if end_time is not None:
-            s = s.query('range', **{'endtime': {'lt': end_time}})
-        if polygon is not None:
-            s = s.query('geo_shape', **{
-                'location': {
-                    'shape': {
-                        'type': 'polygon',
-                        'coordinates': polygon
-                    }
-                }
-            })
+        s = self._ids_by_dataset(index, dataset, start_time=start_time, end_time=end_time, polygon=polygon)
+        s = s[offset:offset + page_size]
+        total, hits = self._search(s)
+        return total, [i['_source']['id'] for i in hits]
+
+    def query_ids_by_dataset_after(self, index, dataset, cursor, page_size, start_time=None, end_time=None,
+                              polygon=None):
+        """Return page of ids by dataset using point-in-time and search_after; see query_ids_by_dataset.
+        :return: (total, List[str], next cursor)
+        """
+
+        s = self._ids_by_dataset(index, dataset, start_time=start_time, end_time=end_time, polygon=polygon)
+        total, hits, next_cursor = self._search_after(s, index, cursor, page_size)
+        return total, [i['_source']['id'] for i in hits], next_cursor
 
+    def _ids_by_dataset(self, index, dataset, start_time=None, end_time=None, polygon=None):
+        """Return Search object of ids by dataset."""
+        index = self._resolve(index, dataset=dataset)
+        s = self.Search(using=self.client, index=index).query(self.Q('term', dataset__keyword=dataset))
+        s = self._filter(s, start_time=start_time, end_time=end_time, polygon=polygon)
         s._source = ['id']
-        current_app.logger.debug(s.to_dict())
-        s = s[offset:offset + page_size]
-        return s.count(), [i['id'] for i in s]
+        return s
+
+    def export_ids_by_dataset(self, index, dataset, cursor=None, page_size=MAX_SIZE, start_time=None,
+                              end_time=None, polygon=None):
+        """Return generator of pages of {"id": ...} records by dataset and the cursor after each page;
+        see query_ids_by_dataset.
+        """
+
+        s = self._ids_by_dataset(index, dataset, start_time=start_time, end_time=end_time, polygon=polygon)
+        for hits, next_cursor in self._scan(s, index, cursor=cursor, page_size=page_size):
+            yield [{'id': i['_source']['id']} for i in hits], next_cursor
 
     def query_ids_by_type(self, index, dataset_type, offset, page_size, start_time=None, end_time=None, polygon=None):
         """Return list of ids by type:
@@ -242,43 +720,216 @@ class QueryES:
         :return: Elasticsearch document
         """
 
-        s = self.Search(using=self.client, index=index).query(self.Q('term', dataset_type__keyword=dataset_type))
-        if start_time is not None:
-            s = s.query('range', **{'starttime': {'gte': start_time}})
-        if end_time is not None:
-            s = s.query('range', **{'endtime': {'lt': end_time}})
-        if polygon is not None:
-            s = s.query('geo_shape', **{
-                'location': {
-                    'shape': {
-                        'type': 'polygon',
-                        'coordinates': polygon
-                    }
-                }
-            })
+        s = self._ids_by_type(index, dataset_type, start_time=start_time, end_time=end_time, polygon=polygon)
+        s = s[offset:offset + page_size]
+        total, hits = self._search(s)
+        return total, [i['_source']['id'] for i in hits]
+
+    def query_ids_by_type_after(self, index, dataset_type, cursor, page_size, start_time=None, end_time=None,
+                              polygon=None):
+        """Return page of ids by type using point-in-time and search_after; see query_ids_by_type.
+        :return: (total, List[str], next cursor)
+        """
 
+        s = self._ids_by_type(index, dataset_type, start_time=start_time, end_time=end_time, polygon=polygon)
+        total, hits, next_cursor = self._search_after(s, index, cursor, page_size)
+        return total, [i['_source']['id'] for i in hits], next_cursor
+
+    def _ids_by_type(self, index, dataset_type, start_time=None, end_time=None, polygon=None):
+        """Return Search object of ids by type."""
+        index = self._resolve(index, dataset_type=dataset_type)
+        s = self.Search(using=self.client, index=index).query(self.Q('term', dataset_type__keyword=dataset_type))
+        s = self._filter(s, start_time=start_time, end_time=end_time, polygon=polygon)
         s._source = ['id']
-        current_app.logger.debug(s.to_dict())
-        s = s[offset:offset + page_size]
-        return s.count(), [i['id'] for i in s]
+        return s
 
-    def query_id(self, index, _id):
-        """Return metadata for dataset ID:
+    def query_histogram(self, index, interval, dataset=None, dataset_type=None, start_time=None, end_time=None,
+                        polygon=None):
+        """Return the doc counts of a dataset or type per calendar interval of starttime:
         {
           "query": {
             "term": {
-              "_id": "AOI_earthquake_test_san_fran"
+              "dataset.keyword": "area_of_interest"
             }
           },
-          "fields": [
-            "_id"
+          "aggs": {
+            "histogram": {
+              "date_histogram": {
+                "field": "starttime",
+                "calendar_interval": "day",
+                "min_doc_count": 1
+              }
+            }
+          },
+          "size": 0
+        }
+        With a HistogramCache, the closed buckets of a previous identical query are reused and only
+        documents starting from the first open bucket are aggregated.
+
+        :param index: Elasticsearch index/alias
+        :param interval: calendar interval (see pele.lib.histogram.INTERVALS)
+        :param dataset: dataset field in ES (or dataset_type)
+        :param dataset_type: dataset_type field in ES
+        :param start_time: (optional) Greater than or equal of Timestamp field (start_time) in ISO format
+        :param end_time: (optional) Less than of Timestamp field (end_time) in ISO format
+        :param polygon: (optional) List[List[int]]
+        :return: (List[Dict] of start (ISO time) and count of the non-empty buckets, number of buckets
+                 served from the cache)
+        """
+
+        if interval not in INTERVALS:
+            raise ValueError(f"Invalid interval: {interval}; one of {', '.join(INTERVALS)}")
+        if dataset is not None:
+            s = self._ids_by_dataset(index, dataset, start_time=start_time, end_time=end_time, polygon=polygon)
+        else:
+            s = self._ids_by_type(index, dataset_type, start_time=start_time, end_time=end_time, polygon=polygon)
+
+        histograms = self.histograms
+        if histograms is None:
+            buckets = self._histogram(s, interval)
+            return [{'start': isoformat(k), 'count': n} for k, n in buckets], 0
+
+        key = histograms.key(s._index, s.to_dict(), interval)
+        entry = histograms.get(key)
+        closed_until = histograms.closed_until(interval)
+        if entry is None:
+            cached, since, created_at = [], None, time.time()
+        else:
+            cached, since, created_at = entry.buckets, entry.closed_until, entry.created_at
+        tail = self._histogram(s, interval, since=since)
+        if since is None or closed_until > since:
+            # buckets closed since the last query join the cached ones
+            closed = cached + [i for i in tail if i[0] < closed_until]
+            histograms.set(key, HistogramEntry(closed, closed_until, created_at))
+        return [{'start': isoformat(k), 'count': n} for k, n in cached + tail], len(cached)
+
+    def _histogram(self, s, interval, since=None):
+        """Return List[(key, count)] of the non-empty starttime buckets of a Search object, starting at
+        since (epoch milliseconds) if set."""
+        if since is not None:
+            s = s.filter('range', starttime={'gte': isoformat(since)})
+        s = s.extra(size=0, track_total_hits=False)
+        s.aggs.bucket('histogram', self.A('date_histogram', field='starttime', calendar_interval=interval,
+                                          min_doc_count=1))
+        agg = self._execute(s, filter_path=AGGS_FILTER).get('aggregations', {}).get('histogram', {})
+        return [(i['key'], i['doc_count']) for i in agg.get('buckets', [])]
+
+    def query_id(self, index, _id, fields=None):
+        """Return metadata for dataset ID with a real-time multi-get on the concrete indices that
+        previously held IDs with the same prefix:
+        {
+          "docs": [
+            {
+              "_index": "grq_v2.0_area_of_interest",
+              "_id": "AOI_earthquake_test_san_fran"
+            }
           ]
         }
+        falling back to a search across index and remembering the concrete index of the hit:
+        {
+          "query": {
+            "term": {
+              "_id": "AOI_earthquake_test_san_fran"
+            }
+          },
+          "size": 1
+        }
+        :param index: Elasticsearch index/alias
+        :param _id: dataset ID
+        :param fields: (optional) List[str]; fields to return instead of the whole document
+        :return: document or None if not found
         """
+
+        mget = self._id_mget(index, _id, fields=fields)
+        if mget is not None:
+            with es_call():
+                doc = self._mget_found(es_response(self.client.mget(**mget)))
+            if doc is not None:
+                return doc
+
+        _, hits = self._search(self._id_search(index, _id, fields=fields), filter_path=DOCS_FILTER)
+        return self._id_hit(index, _id, hits)
+
+    def _id_mget(self, index, _id, fields=None):
+        """Return the arguments of the multi-get of dataset ID on the concrete indices that previously held
+        IDs with the same prefix, or None if there are none."""
+        candidates = self.id_indices.get((index, id_prefix(_id)), ())
+        if len(candidates) == 0:
+            return None
+        docs = [{'_index': i, '_id': _id} for i in candidates]
+        current_app.logger.debug("mget: %s", docs)
+        params = {'_source_includes': ','.join(fields)} if fields else {}
+        return dict(body={'docs': docs}, **params)
+
+    @staticmethod
+    def _mget_found(resp):
+        """Return the source of the first document found by a multi-get or None."""
+        for doc in resp['docs']:
+            if doc.get('found', False):
+                return doc.get('_source', {})
+        return None
+
+    def _id_search(self, index, _id, fields=None):
+        """Return the search of dataset ID across index."""
         s = self.Search(using=self.client, index=index).query(self.Q('term', _id=_id))
-        current_app.logger.debug(s.to_dict())
-        resp = s.execute()
-        return resp[0].to_dict() if s.count() > 0 else None
+        s = s.extra(track_total_hits=False)[0:1]
+        if fields:
+            s._source = fields
+        return s
+
+    def _id_hit(self, index, _id, hits):
+        """Return the source of the hit of the search of dataset ID, remembering its concrete index, or None."""
+        if len(hits) == 0:
+            return None
+        self._learn_index(index, _id, hits[0]['_index'])
+        return hits[0].get('_source', {})
+
+    def _learn_index(self, index, _id, concrete):
+        """Remember that the concrete index behind index holds IDs with the prefix of _id."""
+        key = (index, id_prefix(_id))
+        candidates = self.id_indices.get(key, ())
+        if concrete not in candidates:
+            self.id_indices.set(key, (concrete,) + tuple(candidates)[:MAX_PREFIX_INDICES - 1])
+
+    def query_ids(self, index, ids, fields=None):
+        """Return metadata of many dataset IDs with one search:
+        {
+          "query": {
+            "ids": {
+              "values": [
+                "AOI_earthquake_test_san_fran",
+                "AOI_earthquake_test_la"
+              ]
+            }
+          },
+          "size": 2
+        }
+        :param index: Elasticsearch index/alias
+        :param ids: List[str]; dataset IDs
+        :param fields: (optional) List[str]; fields to return instead of the whole documents
+        :return: Dict; dataset ID -> document of the IDs found
+        """
+
+        docs = {}
+        remaining = list(dict.fromkeys(ids))
+        while remaining:
+            # an ID held by several indices of the alias takes several hits; if the page fills up,
+            # search again for the IDs it did not reach
+            size = min(len(remaining) * ID_COPIES, MAX_SIZE)
+            s = self.Search(using=self.client, index=index).query(self.Q('ids', values=remaining))
+            s = s.extra(track_total_hits=False)[0:size]
+            if fields:
+                s._source = fields
+            _, hits = self._search(s, filter_path=DOCS_FILTER)
+
+            for hit in hits:
+                if hit['_id'] not in docs:
+                    docs[hit['_id']] = hit.get('_source', {})
+                    self._learn_index(index, hit['_id'], hit['_index'])
+            if len(hits) < size:
+                break
+            remaining = [i for i in remaining if i not in docs]
+        return docs
 
     def query_fields(self, index, terms, fields, offset, page_size, start_time=None, end_time=None, polygon=None):
         """Return list of documents by term bool query:
@@ -316,28 +967,35 @@ class QueryES:
         :return: Elasticsearch document
         """
 
-        q = None
-        for field, val in list(terms.items()):
-            f = field.lower().replace('.', '__')
-            if q is None:
-                q = self.Q('term', **{f: val})
-            else:
-                q += self.Q('term', **{f: val})
+        s = self._fields(index, terms, fields, start_time=start_time, end_time=end_time, polygon=polygon)
+        s = s[offset:offset + page_size]
+        total, hits = self._search(s)
+        return total, [i.get('_source', {}) for i in hits]
 
-        s = self.Search(using=self.client, index=index).query(q)
-        if start_time is not None:
-            s = s.query('range', **{'starttime': {'gte': start_time}})
-        if end_time is not None:
-            s = s.query('range', **{'endtime': {'lt': end_time}})
-        if polygon is not None:
-            s = s.query('geo_shape', **{
-                'location': {
-                    'shape': {
-                        'type': 'polygon',
-                        'coordinates': polygon
-                    }
-                }
-            })
+    def query_fields_after(self, index, terms, fields, cursor, page_size, start_time=None, end_time=None,
+                           polygon=None):
+        """Return page of documents by term bool query using point-in-time and search_after; see query_fields.
+        :return: (total, List[Dict], next cursor)
+        """
+
+        s = self._fields(index, terms, fields, start_time=start_time, end_time=end_time, polygon=polygon)
+        total, hits, next_cursor = self._search_after(s, index, cursor, page_size)
+        return total, [i.get('_source', {}) for i in hits], next_cursor
+
+    def export_fields(self, index, terms, fields, cursor=None, page_size=MAX_SIZE, start_time=None, end_time=None,
+                      polygon=None):
+        """Return generator of pages of documents by term bool query and the cursor after each page;
+        see query_fields.
+        """
+
+        s = self._fields(index, terms, fields, start_time=start_time, end_time=end_time, polygon=polygon)
+        for hits, next_cursor in self._scan(s, index, cursor=cursor, page_size=page_size):
+            yield [i.get('_source', {}) for i in hits], next_cursor
+
+    def _fields(self, index, terms, fields, start_time=None, end_time=None, polygon=None):
+        """Return Search object of documents by term bool query."""
+        s = self.Search(using=self.client, index=index).query(self._terms(terms))
+        s = self._filter(s, start_time=start_time, end_time=end_time, polygon=polygon)
 
         s._source = fields
         # sort by starttime in descending order; TODO: expose sort parameters out through API
@@ -346,10 +1004,7 @@ class QueryES:
                 "order": "desc"
             }
         })
-        s = s[offset:offset + page_size]
-
-        current_app.logger.debug(s.to_dict())
-        return s.count(), [i.to_dict() for i in s]
+        return s
 
     def overlaps(self, index, _id, terms, fields, offset, page_size):
         """Return list of documents that overlap temporally and spatially:
@@ -420,24 +1075,27 @@ class QueryES:
         """
 
         # get document by id
-        doc = self.query_id(index, _id)
-        current_app.logger.debug(json.dumps(doc, indent=2))
+        doc = self.query_id(index, _id, fields=['starttime', 'endtime', 'location'])
+        if current_app.logger.isEnabledFor(logging.DEBUG):
+            current_app.logger.debug(json.dumps(doc, indent=2))
         if doc is None:
             raise RuntimeError(f"Failed to find dataset ID: {_id}")
 
+        s = self._overlaps(index, doc, terms, fields)
+        s = s[offset:offset + page_size]
+        total, hits = self._search(s)
+        return total, [i.get('_source', {}) for i in hits]
+
+    def _overlaps(self, index, doc, terms, fields):
+        """Return Search object of documents that overlap doc temporally and spatially."""
+
         # get spatial and temporal fields
         starttime = doc.get('starttime', None)
         endtime = doc.get('endtime', None)
         location = doc.get('location', None)
 
         # build terms query
-        t = None
-        for field, val in list(terms.items()):
-            f = field.lower().replace('.', '__')
-            if t is None:
-                t = self.Q('term', **{f: val})
-            else:
-                t += self.Q('term', **{f: val})
+        t = self._terms(terms)
 
         # set temporal query
         q = self.Q()
@@ -452,6 +1110,8 @@ class QueryES:
             f = self.Q('geo_shape', **{'location': {'shape': location}})
 
         # search
+        index = self._resolve(index, dataset=terms.get('dataset.keyword', None),
+                              dataset_type=terms.get('dataset_type.keyword', None))
         s = self.Search(using=self.client, index=index)
         if t is not None:
             s = s.query(t)
@@ -460,6 +1120,165 @@ class QueryES:
         if f is not None:
             s = s.filter(f)
         s._source = fields
+        return s
+
+    def query_batch(self, index, queries):
+        """Run a batch of query descriptors with a single _msearch:
+        [
+          {"query": "ids_by_dataset", "dataset": "acquisition-S1-IW_SLC", "start_time": "2017-04-18T00:00:00Z"},
+          {"query": "ids_by_type", "type": "acquisition", "page_size": 100},
+          {"query": "fields", "type": "acquisition", "dataset": "acquisition-S1-IW_SLC", "fields": ["id"]},
+          {"query": "overlaps", "id": "acquisition-S1A_IW_SLC__1SDV_20170418", "fields": ["id"],
+           "type": "slc", "dataset": "S1-IW_SLC"}
+        ]
+        Every descriptor also takes offset and page_size; ids_by_dataset, ids_by_type and fields take
+        start_time, end_time and polygon. The reference documents of all overlaps queries are fetched
+        with one lookup ahead of the _msearch.
+        :param index: Elasticsearch index/alias
+        :param queries: List[Dict]; query descriptors
+        :return: List[Dict]; {"success": true, "total": ..., "results": [...]} or
+                 {"success": false, "message": ...} per descriptor
+        """
+
+        results = [None] * len(queries)
+
+        overlap_ids = [q['id'] for q in queries if isinstance(q, dict) and q.get('query') == 'overlaps' and
+                       isinstance(q.get('id', None), str)]
+        ref_docs = self.query_ids(index, overlap_ids, fields=['starttime', 'endtime', 'location']) \
+            if overlap_ids else {}
+
+        searches = []
+        for i, q in enumerate(queries):
+            try:
+                searches.append((i,) + self._batch_search(index, q, ref_docs))
+            except KeyError as e:
+                results[i] = {'success': False, 'message': f"Missing parameter: {e.args[0]}"}
+            except Exception as e:
+                results[i] = {'success': False, 'message': str(e)}
+
+        if len(searches) > 0:
+            responses = self._msearch([(idx, s) for _, idx, s, _ in searches])
+            for (i, _, _, extract), resp in zip(searches, responses):
+                if 'error' in resp:
+                    error = resp['error']
+                    results[i] = {
+                        'success': False,
+                        'message': error.get('reason', str(error)) if isinstance(error, dict) else str(error)
+                    }
+                else:
+                    results[i] = {
+                        'success': True,
+                        'total': self._total(resp),
+                        'results': [extract(h) for h in self._hits(resp)]
+                    }
+        return results
+
+    def _msearch(self, searches):
+        """Execute searches with a single _msearch.
+
+        :param searches: List[(index, Search object)]
+        :return: List[Dict]; raw response (or error) per search
+        """
+        body = []
+        with phase('build'):
+            for idx, s in searches:
+                body.append({'index': idx})
+                body.append(self._track_total_hits(s).to_dict())
+        current_app.logger.debug("msearch: %s", body)
+        params = {'filter_path': ','.join(MSEARCH_FILTER)} if current_app.config.get('RAW_SEARCH', False) else {}
+        with es_call():
+            return es_response(self.client.msearch(body=body, **params)).get('responses', [])
+
+    def join_overlaps(self, index, terms, target_index, target_terms, fields, cursor=None, page_size=100,
+                      max_matches=1000, start_time=None, end_time=None, polygon=None):
+        """Return generator of pages of pairs of source documents and the target documents that overlap them
+        temporally and spatially. Source documents are walked with point-in-time/search_after and the overlaps
+        of each page of sources are searched with one _msearch. A source document with more than max_matches
+        overlapping targets gets a {"source": <source ID>, "truncated": true} record after its first max_matches
+        pairs.
+        :param index: Elasticsearch index/alias of the source documents
+        :param terms: Dict; "custom" fields to filter the source documents on
+        :param target_index: Elasticsearch index/alias of the target documents
+        :param target_terms: Dict; "custom" fields to filter the target documents on
+        :param fields: fields of the target documents to return
+        :param cursor: (optional) cursor to resume from
+        :param page_size: source documents per _msearch
+        :param max_matches: maximum number of target documents per source document
+        :param start_time: (optional) Greater than or equal of source Timestamp field (start_time) in ISO format
+        :param end_time: (optional) Less than of source Timestamp field (end_time) in ISO format
+        :param polygon: (optional) List[List[int]]; bounding polygon of the source documents
+        :return: generator of (List[{"source": <source ID>, "target": <target document>} or
+                 {"source": <source ID>, "truncated": true}], next cursor)
+        """
+
+        s = self._fields(index, terms, ['id', 'starttime', 'endtime', 'location'], start_time=start_time,
+                         end_time=end_time, polygon=polygon)
+        for hits, next_cursor in self._scan(s, index, cursor=cursor, page_size=page_size):
+            sources = [i.get('_source', {}) for i in hits]
+            # one hit more than max_matches tells whether the targets of a source were truncated
+            searches = [(target_index, self._overlaps(target_index, doc, target_terms, fields)
+                         .exclude('ids', values=[doc['id']])
+                         .extra(track_total_hits=False)[0:max_matches + 1]) for doc in sources]
+            pairs = []
+            for doc, resp in zip(sources, self._msearch(searches) if searches else []):
+                if 'error' in resp:
+                    raise RuntimeError(f"Failed to find overlaps of dataset ID {doc['id']}: {resp['error']}")
+                hits = self._hits(resp)
+                pairs.extend({'source': doc['id'], 'target': i.get('_source', {})} for i in hits[:max_matches])
+                if len(hits) > max_matches:
+                    pairs.append({'source': doc['id'], 'truncated': True})
+            yield pairs, next_cursor
+
+    def _batch_search(self, index, q, ref_docs):
+        """Return (index, Search object, hit extractor) of a batch query descriptor."""
+        if not isinstance(q, dict):
+            raise ValueError("query descriptor must be an object")
+        name = q.get('query', None)
+        offset = int(q.get('offset', 0))
+        page_size = int(q.get('page_size', current_app.config['DEFAULT_PAGE_SIZE']))
+        check_page_size_and_offset(page_size, offset)
+
+        filters = {
+            'start_time': q.get('start_time', None),
+            'end_time': q.get('end_time', None),
+            'polygon': q.get('polygon', None),
+        }
+        if filters['polygon'] is not None:
+            filters['polygon'] = parse_polygon(filters['polygon'])
+
+        if name == 'ids_by_dataset':
+            s = self._ids_by_dataset(index, q['dataset'], **filters)
+            extract = self._extract_id
+        elif name == 'ids_by_type':
+            s = self._ids_by_type(index, q['type'], **filters)
+            extract = self._extract_id
+        elif name == 'fields':
+            terms = {
+                'dataset_type.keyword': q['type'],
+                'dataset.keyword': q['dataset'],
+            }
+            index = f"{index}_*_{q['dataset'].lower()}"
+            s = self._fields(index, terms, q['fields'], **filters)
+            extract = self._extract_source
+        elif name == 'overlaps':
+            doc = ref_docs.get(q['id'], None)
+            if doc is None:
+                raise RuntimeError(f"Failed to find dataset ID: {q['id']}")
+            terms = {}
+            if q.get('type', None) is not None:
+                terms['dataset_type.keyword'] = q['type']
+            if q.get('dataset', None) is not None:
+                terms['dataset.keyword'] = q['dataset']
+            s = self._overlaps(index, doc, terms, q['fields'])
+            extract = self._extract_source
+        else:
+            raise ValueError(f"Unknown query: {name}")
+        return ','.join(s._index), s[offset:offset + page_size], extract
+
+    @staticmethod
+    def _extract_id(hit):
+        return hit['_source']['id']
 
-        current_app.logger.debug(s.to_dict())
-        return s.count(), [i.to_dict() for i in s[offset:offset+page_size]]
+    @staticmethod
+    def _extract_source(hit):
+        return hit.get('_source', {})
@@ -0,0 +1,36 @@
+import os
+import abc
+import threading
+
+
+class BackgroundRefresher(abc.ABC):
+    """Base of the in-process caches rebuilt by a per-process background thread, so request threads never
+    wait on Elasticsearch to refresh them.
+
+    The thread is started on first use by _ensure_thread() and runs _run(); threads do not survive a fork,
+    so it is started again in every worker of a preloaded gunicorn master.
+    """
+
+    # name of the refresh thread
+    thread_name = 'pele-refresher'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_thread(self):
+        """Start the refresh thread unless it runs in this process."""
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid:
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    @abc.abstractmethod
+    def _run(self):
+        """Refresh loop of the thread; never returns."""
@@ -0,0 +1,139 @@
+import time
+import traceback
+
+from pele.lib.metrics import es_call
+from pele.lib.refresher import BackgroundRefresher
+
+
+class IndexMap:
+    """Immutable snapshot of the concrete indices of an alias by dataset."""
+
+    def __init__(self, alias, indices):
+        """
+        :param alias: index alias (e.g. "grq")
+        :param indices: concrete index names of the alias (e.g. "grq_v1.0_acquisition-s1-iw_slc")
+        """
+        prefix = f"{alias}_"
+        by_dataset = {}
+        unparsed = []
+        for index in sorted(indices):
+            parts = index[len(prefix):].split('_', 1) if index.startswith(prefix) else ()
+            if len(parts) == 2 and parts[1]:
+                by_dataset.setdefault(parts[1], []).append(index)
+            else:
+                unparsed.append(index)
+
+        self.by_dataset = by_dataset  # lowercased dataset -> indices
+        self.unparsed = unparsed  # indices that may hold any dataset
+        self.built_at = time.time()
+
+    def dataset_indices(self, dataset):
+        """Return indices of dataset, empty if no index is named after it."""
+        indices = self.by_dataset.get(dataset.lower(), None)
+        return indices + self.unparsed if indices is not None else []
+
+
+class IndexResolver(BackgroundRefresher):
+    """Narrows searches of an alias to the concrete indices that can hold the requested dataset or type.
+
+    GRQ indices are named <alias>_<version>_<dataset lowercased> (as the fields endpoints already assume
+    with their <alias>_*_<dataset> pattern), so the indices of a dataset are read from the index names of
+    the alias; the datasets of a type are taken from the facet catalog, and
+    indices of datasets the catalog does not know yet are kept. The map is rebuilt by a per-process
+    background thread every `ttl` seconds, so request threads (and the ASGI event loop) never wait on
+    it; until it is built, and whenever the narrowed list would be empty or longer than max_indices,
+    searches go to the whole alias.
+    """
+
+    thread_name = 'pele-index-resolver'
+
+    def __init__(self, app, es_util, alias, ttl=60, max_indices=64):
+        """
+        :param app: flask app; an app context is pushed around each refresh
+        :param es_util: QueryES whose client lists the indices of the alias
+        :param alias: alias narrowed (ES_INDEX)
+        :param ttl: seconds between refreshes
+        :param max_indices: maximum number of indices searched instead of the alias
+        """
+        super().__init__()
+        self.app = app
+        self.es_util = es_util
+        self.alias = alias
+        self.ttl = ttl
+        self.max_indices = max_indices
+
+        self._map = None
+
+        self.narrowed = 0
+        self.fallbacks = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def resolve(self, index, dataset=None, dataset_type=None):
+        """Return the indices (comma-separated) to search for documents of dataset and/or dataset_type,
+        or index itself if it is not the alias or cannot be narrowed."""
+        if index != self.alias or (dataset is None and dataset_type is None):
+            return index
+        self._ensure_thread()
+        index_map = self._map
+        indices = None
+        if index_map is not None:
+            if dataset is not None:
+                indices = index_map.dataset_indices(dataset)
+            else:
+                indices = self._type_indices(index_map, dataset_type)
+        if not indices or len(indices) > self.max_indices:
+            with self._lock:
+                self.fallbacks += 1
+            return index
+        with self._lock:
+            self.narrowed += 1
+        return ','.join(indices)
+
+    def _type_indices(self, index_map, dataset_type):
+        facets = self.es_util.catalog.get(self.alias) if self.es_util.catalog is not None else None
+        if facets is None:
+            return None
+        datasets = {i.lower() for i in facets.datasets_by_type.get(dataset_type, [])}
+        known = {i.lower() for i in facets.datasets}
+        indices = list(index_map.unparsed)
+        for dataset, dataset_indices in index_map.by_dataset.items():
+            if dataset in datasets or dataset not in known:
+                indices.extend(dataset_indices)
+        return sorted(indices)
+
+    def refresh(self):
+        """Rebuild the index map synchronously."""
+        try:
+            with self.app.app_context():
+                with es_call():
+                    indices = self.es_util.client.indices.get_alias(index=self.alias)
+        except Exception:
+            self.app.logger.error(traceback.format_exc())
+            with self._lock:
+                self.errors += 1
+            return None
+        index_map = IndexMap(self.alias, indices.keys())
+        with self._lock:
+            self._map = index_map
+            self.refreshes += 1
+        return index_map
+
+    def stats(self):
+        with self._lock:
+            index_map = self._map
+            return {
+                'alias': self.alias,
+                'ttl': self.ttl,
+                'age': time.time() - index_map.built_at if index_map is not None else None,
+                'datasets': len(index_map.by_dataset) if index_map is not None else None,
+                'narrowed': self.narrowed,
+                'fallbacks': self.fallbacks,
+                'refreshes': self.refreshes,
+                'errors': self.errors,
+            }
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.ttl)
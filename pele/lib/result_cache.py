@@ -0,0 +1,160 @@
+"""Two-tier cache of raw search responses.
+
+Responses are cached under a hash of the index, the compiled query body and the search parameters,
+combined with the fingerprint of the index (pele.lib.fingerprint), so entries are invalidated as soon
+as the searchable documents of the index change, or after RESULT_CACHE_TTL seconds. The local tier is
+a per-process LRU bounded in bytes; the shared tier is the Flask-Caching cache of the app, shared by
+all workers when CACHE_TYPE is a shared backend (e.g. "RedisCache").
+
+Only searches made while serving the endpoints listed in RESULT_CACHE_ENDPOINTS are cached, and
+point-in-time searches never are. The X-Cache response header of those endpoints tells whether their
+searches were answered from the local tier (HIT-LOCAL), the shared tier (HIT-SHARED) or ES (MISS).
+Searches of the ASGI app are not cached.
+"""
+import json
+import time
+import hashlib
+
+from flask import g, request, current_app, has_request_context
+
+from pele.lib.lru import LRUCache
+from pele.lib.fast_json import dumps
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+RESULT_CACHE_MAX_ENTRIES = 100000
+
+# seconds between the warnings of failed fingerprints
+FINGERPRINT_WARNING_INTERVAL = 60
+
+# X-Cache values of a request, from the least to the most expensive
+STATUSES = ('HIT-LOCAL', 'HIT-SHARED', 'MISS')
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class ResultCache:
+    """Local LRU tier over an optional shared tier of raw search responses."""
+
+    def __init__(self, fingerprints, maxbytes=64 * 1024 * 1024, ttl=60, shared=None, prefix='pele:result:'):
+        """
+        :param fingerprints: pele.lib.fingerprint.IndexFingerprints of the searched indices
+        :param maxbytes: maximum bytes of JSON responses kept by the local tier
+        :param ttl: seconds an entry is kept
+        :param shared: (optional) shared tier with get(key) and set(key, value, timeout=...) (e.g. flask_caching.Cache)
+        :param prefix: prefix of the keys of the shared tier
+        """
+        self.fingerprints = fingerprints
+        self.ttl = ttl
+        self.local = LRUCache(maxsize=RESULT_CACHE_MAX_ENTRIES, ttl=ttl, maxbytes=maxbytes)
+        self.shared = shared
+        self.prefix = prefix
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self.fingerprint_errors = 0
+        self.disabled = False
+        self._warned_at = 0.
+
+    def key(self, index, body, params):
+        """Return the cache key of a search, valid until the fingerprint of index changes, or None if the
+        fingerprint cannot be fetched. The cache is disabled once _stats is forbidden to the ES user."""
+        if self.disabled:
+            return None
+        try:
+            fingerprint = self.fingerprints.get(index)
+        except Exception as e:
+            self.fingerprint_errors += 1
+            if getattr(e, 'status_code', None) == 403:
+                self.disabled = True
+                current_app.logger.error(f"Not allowed to fingerprint {index}, disabling the result cache: {e}")
+            elif time.time() - self._warned_at >= FINGERPRINT_WARNING_INTERVAL:
+                self._warned_at = time.time()
+                current_app.logger.warning(f"Failed to fingerprint {index}, not caching: {e} "
+                                           f"({self.fingerprint_errors} failures)")
+            return None
+        query = json.dumps([index, body, params], sort_keys=True, separators=(',', ':'), default=str)
+        return f"{fingerprint.value}:{hashlib.sha1(query.encode()).hexdigest()}"
+
+    def get(self, key):
+        """Return (response, status) of a cached search or (None, "MISS")."""
+        data = self.local.get(key, None)
+        if data is not None:
+            return loads(data), 'HIT-LOCAL'
+        if self.shared is not None:
+            try:
+                data = self.shared.get(self.prefix + key)
+            except Exception as e:
+                self.shared_errors += 1
+                current_app.logger.warning(f"Failed to read shared result cache: {e}")
+                data = None
+            if data is not None:
+                self.shared_hits += 1
+                self.local.set(key, data)
+                return loads(data), 'HIT-SHARED'
+        return None, 'MISS'
+
+    def set(self, key, resp):
+        data = dumps(resp)
+        self.local.set(key, data)
+        if self.shared is not None:
+            try:
+                self.shared.set(self.prefix + key, data, timeout=self.ttl)
+            except Exception as e:
+                self.shared_errors += 1
+                current_app.logger.warning(f"Failed to write shared result cache: {e}")
+
+    def stats(self):
+        stats = self.local.stats()
+        stats.update(ttl=self.ttl, shared=self.shared is not None, shared_hits=self.shared_hits,
+                     shared_errors=self.shared_errors, fingerprint_errors=self.fingerprint_errors,
+                     disabled=self.disabled)
+        return stats
+
+
+def active_cache():
+    """Return the ResultCache of the app if the endpoint of the current request opted in, otherwise None."""
+    if not has_request_context() or request.endpoint is None:
+        return None
+    result_cache = getattr(current_app, 'result_cache', None)
+    if result_cache is None:
+        return None
+    if request.endpoint.rsplit('.', 1)[-1] not in current_app.config.get('RESULT_CACHE_ENDPOINTS', ()):
+        return None
+    return result_cache
+
+
+def record(status):
+    """Record the cache status of a search of the current request."""
+    current = g.get('result_cache_status', None)
+    if current is None or STATUSES.index(status) > STATUSES.index(current):
+        g.result_cache_status = status
+
+
+def init_app(app, shared=None):
+    """Create app.result_cache if RESULT_CACHE is set.
+
+    :param app: flask app
+    :param shared: (optional) shared tier, e.g. the Flask-Caching cache of the app
+    """
+    if not app.config.get('RESULT_CACHE', False):
+        return None
+    app.result_cache = ResultCache(app.es_util.fingerprints,
+                                   maxbytes=app.config.get('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+                                   ttl=app.config.get('RESULT_CACHE_TTL', 60),
+                                   shared=shared if app.config.get('RESULT_CACHE_SHARED', True) else None)
+    if getattr(app, 'metrics', None) is not None:
+        app.metrics.watch_cache('result', app.result_cache.local)
+
+    @app.after_request
+    def _x_cache(response):
+        status = g.pop('result_cache_status', None)
+        if status is not None:
+            response.headers['X-Cache'] = status
+        return response
+
+    return app.result_cache
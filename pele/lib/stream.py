@@ -0,0 +1,35 @@
+import json
+import zlib
+
+
+def accepts_gzip(r):
+    """Return True if the client accepts gzip content encoding (with a non-zero quality)."""
+    return r.accept_encodings['gzip'] > 0
+
+
+def ndjson_pages(pages):
+    """Yield one NDJSON chunk per page of (records, next cursor). Each page ends with a {"next": <cursor>}
+    line so clients can resume after a dropped connection; the last page carries {"next": null}.
+
+    :param pages: iterable of (List[Dict], str)
+    :return: generator of bytes
+    """
+    for records, next_cursor in pages:
+        lines = [json.dumps(r) for r in records]
+        lines.append(json.dumps({'next': next_cursor}))
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of byte chunks, flushing after every chunk so that clients receive whole pages.
+
+    :param chunks: iterable of bytes
+    :param level: compression level
+    :return: generator of bytes
+    """
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = z.compress(chunk) + z.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield z.flush()
@@ -0,0 +1,170 @@
+import time
+import fnmatch
+import traceback
+from datetime import datetime, timezone
+
+from pele.lib.refresher import BackgroundRefresher
+
+# datasets re-summarized per query by an incremental refresh
+DATASETS_PER_QUERY = 1000
+
+# summary fields the rows can be sorted on
+SORT_FIELDS = ('type', 'dataset', 'count', 'starttime', 'endtime', 'latest_ingest')
+
+
+class Summary:
+    """Immutable snapshot of the summary rows of an index."""
+
+    def __init__(self, rows, started_at, full_started_at=None):
+        """
+        :param rows: iterable of summary rows (see QueryES.query_summary)
+        :param started_at: epoch seconds the queries building the rows started
+        :param full_started_at: (optional) epoch seconds the last full build started (default started_at)
+        """
+        self.rows = {(i['type'], i['dataset']): i for i in rows}
+        self._extents = {k: (_epoch(i['starttime']), _epoch(i['endtime'])) for k, i in self.rows.items()}
+        self.started_at = started_at
+        self.full_started_at = started_at if full_started_at is None else full_started_at
+        self.built_at = time.time()
+
+    def updated(self, rows, datasets, started_at):
+        """Return a new Summary with the rows of datasets replaced by rows."""
+        kept = [i for i in self.rows.values() if i['dataset'] not in datasets]
+        return Summary(kept + list(rows), started_at, full_started_at=self.full_started_at)
+
+    def select(self, dataset_type=None, dataset=None, start_time=None, end_time=None, sort=None):
+        """Return rows filtered by type, dataset (a glob pattern) and overlap with [start_time, end_time),
+        sorted by a SORT_FIELDS field ("-" prefix for descending; default type, then dataset).
+
+        :raises ValueError: on an invalid time or an unknown sort field
+        """
+        start, end = _epoch(start_time), _epoch(end_time)
+        rows = []
+        for key, row in self.rows.items():
+            if dataset_type is not None and row['type'] != dataset_type:
+                continue
+            if dataset is not None and not fnmatch.fnmatchcase(row['dataset'], dataset):
+                continue
+            row_start, row_end = self._extents[key]
+            if start is not None and (row_end is None or row_end <= start):
+                continue
+            if end is not None and (row_start is None or row_start >= end):
+                continue
+            rows.append(row)
+
+        rows.sort(key=lambda i: (i['type'], i['dataset']))
+        if sort:
+            reverse = sort.startswith('-')
+            field = sort.lstrip('-')
+            if field not in SORT_FIELDS:
+                raise ValueError(f"Invalid sort field: {field}; one of {', '.join(SORT_FIELDS)}")
+            # rows without the field last in either direction
+            present = [i for i in rows if i[field] is not None]
+            missing = [i for i in rows if i[field] is None]
+            rows = sorted(present, key=lambda i: i[field], reverse=reverse) + missing
+        return rows
+
+
+def _epoch(value):
+    """Return epoch seconds of an ISO time (None for None)."""
+    if value is None:
+        return None
+    t = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return (t if t.tzinfo is not None else t.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def _isoformat(t):
+    return datetime.fromtimestamp(t, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class SummaryCatalog(BackgroundRefresher):
+    """In-process summary of the type/dataset pairs of an index, rebuilt by a per-process background
+    thread so request threads never wait on the aggregation; get() returns None until the first build.
+
+    Every `ttl` seconds the datasets with documents ingested since the previous refresh (less `lag`
+    seconds for documents not yet searchable then) are re-summarized and their rows replaced; the whole
+    summary is rebuilt every `full_ttl` seconds, which also drops deleted documents and datasets.
+    """
+
+    thread_name = 'pele-summary'
+
+    def __init__(self, app, loader, index, ttl=300, full_ttl=3600, lag=300):
+        """
+        :param app: flask app; an app context is pushed around each refresh
+        :param loader: function(index, datasets=None, ingested_since=None) returning summary rows
+                       (QueryES.query_summary)
+        :param index: Elasticsearch index/alias summarized
+        :param ttl: seconds between incremental refreshes
+        :param full_ttl: seconds between full rebuilds
+        :param lag: seconds ingested documents may take to become searchable
+        """
+        super().__init__()
+        self.app = app
+        self.loader = loader
+        self.index = index
+        self.ttl = ttl
+        self.full_ttl = full_ttl
+        self.lag = lag
+
+        self._summary = None
+
+        self.full_refreshes = 0
+        self.incremental_refreshes = 0
+        self.errors = 0
+        self.last_refresh_secs = None
+
+    def get(self):
+        """Return the Summary snapshot or None if not built yet."""
+        self._ensure_thread()
+        return self._summary
+
+    def refresh(self, full=False):
+        """Refresh the summary synchronously; incrementally unless full or never built."""
+        summary = self._summary
+        t0 = time.time()
+        try:
+            with self.app.app_context():
+                if full or summary is None:
+                    summary = Summary(self.loader(self.index), t0)
+                else:
+                    since = _isoformat(summary.started_at - self.lag)
+                    changed = sorted({i['dataset'] for i in self.loader(self.index, ingested_since=since)})
+                    rows = []
+                    for i in range(0, len(changed), DATASETS_PER_QUERY):
+                        rows.extend(self.loader(self.index, datasets=changed[i:i + DATASETS_PER_QUERY]))
+                    summary = summary.updated(rows, set(changed), t0)
+        except Exception:
+            self.app.logger.error(traceback.format_exc())
+            with self._lock:
+                self.errors += 1
+            return None
+        with self._lock:
+            self._summary = summary
+            if summary.full_started_at == t0:
+                self.full_refreshes += 1
+            else:
+                self.incremental_refreshes += 1
+            self.last_refresh_secs = summary.built_at - t0
+        return summary
+
+    def stats(self):
+        with self._lock:
+            summary = self._summary
+            return {
+                'index': self.index,
+                'ttl': self.ttl,
+                'full_ttl': self.full_ttl,
+                'age': time.time() - summary.built_at if summary is not None else None,
+                'full_age': time.time() - summary.full_started_at if summary is not None else None,
+                'rows': len(summary.rows) if summary is not None else None,
+                'full_refreshes': self.full_refreshes,
+                'incremental_refreshes': self.incremental_refreshes,
+                'errors': self.errors,
+                'last_refresh_secs': self.last_refresh_secs,
+            }
+
+    def _run(self):
+        while True:
+            summary = self._summary
+            self.refresh(full=summary is None or time.time() - summary.full_started_at >= self.full_ttl)
+            time.sleep(self.ttl if self._summary is not None else min(self.ttl, 30))
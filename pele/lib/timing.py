@@ -0,0 +1,114 @@
+import json
+import time
+import logging
+from contextlib import contextmanager
+
+from flask import g, request, has_app_context
+
+# Server-Timing metrics in the order they are reported
+PHASES = ('auth', 'build', 'es', 'es_took', 'hits', 'handler', 'marshal', 'serialize')
+
+
+class RequestTimer:
+    """Seconds spent per phase of one request: auth (token verification), build (compiling searches),
+    es (wall time of Elasticsearch calls), es_took (the "took" reported by Elasticsearch), hits
+    (converting responses), handler (the resource method), marshal and serialize (the response body).
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.es_calls = 0
+
+    def add(self, name, secs):
+        self.phases[name] = self.phases.get(name, 0.) + secs
+
+    def took(self, resp):
+        """Add the "took" of an Elasticsearch response (or of each response of an _msearch)."""
+        for r in resp.get('responses', None) or (resp,):
+            if isinstance(r, dict) and 'took' in r:
+                self.add('es_took', r['took'] / 1000.)
+
+    def total(self):
+        return time.perf_counter() - self.start
+
+    def header(self):
+        """Return value of the Server-Timing header, durations in milliseconds."""
+        metrics = [f"{i};dur={self.phases[i] * 1000:.2f}" for i in PHASES if i in self.phases]
+        metrics.append(f"total;dur={self.total() * 1000:.2f}")
+        return ', '.join(metrics)
+
+    def record(self, **kwargs):
+        """Return dict of the timings in milliseconds for structured logging."""
+        record = dict(kwargs)
+        record.update({f"{i}_ms": round(secs * 1000, 3) for i, secs in self.phases.items()})
+        record['es_calls'] = self.es_calls
+        record['total_ms'] = round(self.total() * 1000, 3)
+        return record
+
+
+def start_timer(app):
+    """Start timing the current request if SERVER_TIMING or SERVER_TIMING_LOG is set."""
+    if app.config.get('SERVER_TIMING', False) or app.config.get('SERVER_TIMING_LOG', False):
+        g.timer = RequestTimer()
+        return g.timer
+    return None
+
+
+def get_timer():
+    """Return RequestTimer of the current request or None when not timed."""
+    return g.get('timer', None) if has_app_context() else None
+
+
+@contextmanager
+def phase(name, timer=None):
+    """Add the time spent in the block to phase name of the current request."""
+    timer = timer or get_timer()
+    if timer is None:
+        yield None
+        return
+    t0 = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        timer.add(name, time.perf_counter() - t0)
+
+
+def es_response(resp):
+    """Count an Elasticsearch call and its "took" in the current request; return resp."""
+    timer = get_timer()
+    if timer is not None:
+        timer.es_calls += 1
+        timer.took(resp)
+    return resp
+
+
+def finish_timer(app, timer, **kwargs):
+    """Log the structured record of timer and return its Server-Timing header value.
+
+    :param app: Flask app
+    :param timer: RequestTimer
+    :param kwargs: extra fields of the log record (e.g. method, path, status)
+    :return: header value or None if SERVER_TIMING is not set
+    """
+    if app.config.get('SERVER_TIMING_LOG', False) and app.logger.isEnabledFor(logging.INFO):
+        app.logger.info(json.dumps(timer.record(**kwargs)))
+    return timer.header() if app.config.get('SERVER_TIMING', False) else None
+
+
+def init_app(app):
+    """Time every request of app."""
+
+    @app.before_request
+    def _start():
+        start_timer(app)
+
+    @app.after_request
+    def _finish(response):
+        timer = get_timer()
+        if timer is not None:
+            header = finish_timer(app, timer, method=request.method, path=request.path, endpoint=request.endpoint,
+                                  status=response.status_code)
+            if header is not None:
+                response.headers['Server-Timing'] = header
+        return response
@@ -0,0 +1,75 @@
+import time
+import hashlib
+import threading
+
+from pele.lib.lru import LRUCache
+
+
+class TokenCache:
+    """Cache of verified API tokens and of the existence of the users they were issued to.
+
+    Tokens are keyed by their SHA-256 hash and never outlive their own "exp" claim. Users are
+    cached separately so that removing or renaming a user takes effect through invalidate_user()
+    without waiting for the tokens to expire. The cache is per process: other processes see the
+    change once their entry of the user expires, after at most user_ttl seconds.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300, user_ttl=300):
+        """
+        :param maxsize: maximum number of tokens and of users cached
+        :param ttl: maximum seconds a verified token is cached
+        :param user_ttl: seconds the existence of a user is cached
+        """
+        self.ttl = ttl
+        self.tokens = LRUCache(maxsize=maxsize)
+        self.users = LRUCache(maxsize=maxsize, ttl=user_ttl)
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.auth_secs = 0.
+        self.request_secs = 0.
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get_token(self, token):
+        """Return subject of a verified token or None if not cached."""
+        return self.tokens.get(self._key(token))
+
+    def set_token(self, token, sub, exp=None):
+        """Cache the subject of a verified token until min(now + ttl, exp)."""
+        ttl = self.ttl
+        if exp is not None:
+            ttl = min(ttl, exp - time.time())
+        if ttl > 0:
+            self.tokens.set(self._key(token), sub, ttl=ttl)
+
+    def user_exists(self, email):
+        """Return True if the user is known to exist."""
+        return self.users.get(email, False)
+
+    def set_user(self, email):
+        self.users.set(email, True)
+
+    def invalidate_user(self, email):
+        self.users.delete(email)
+
+    def record(self, auth_secs, request_secs):
+        """Record time spent on authentication and on the whole request."""
+        with self._lock:
+            self.requests += 1
+            self.auth_secs += auth_secs
+            self.request_secs += request_secs
+
+    def stats(self):
+        """Return hit rates and the share of request latency spent on authentication."""
+        with self._lock:
+            return {
+                'tokens': self.tokens.stats(),
+                'users': self.users.stats(),
+                'requests': self.requests,
+                'auth_secs': self.auth_secs,
+                'request_secs': self.request_secs,
+                'auth_share': self.auth_secs / self.request_secs if self.request_secs else None,
+            }
@@ -31,3 +31,24 @@ class DevelopmentConfig(Config):
 
     # This allows us to test the forms from WTForm
     WTF_CSRF_ENABLED = False
+
+
+class TestConfig(DevelopmentConfig):
+    """Self-contained config of the test suite; settings.cfg is not read."""
+
+    TESTING = True
+    SQLALCHEMY_ECHO = False
+
+    ES_INDEX = 'grq'
+    AUTH = False
+    OPS_USER = 'ops'
+    TOKEN_EXPIRATION_SECS = 86400
+
+    RESTX_MASK_SWAGGER = False
+    RATELIMIT_ENABLED = True
+    RATELIMIT_STRATEGY = 'moving-window'
+    RATELIMIT_STORAGE_URL = 'memory://'
+    RATELIMIT_HEADERS_ENABLED = True
+
+    DEFAULT_PAGE_SIZE = 10
+    MAX_PAGE_SIZE = 100
@@ -24,7 +24,7 @@ setup(
         'Flask-SQLAlchemy>=3.0.0',
         'Flask-Testing>=0.8.1',
         'Flask-WTF>=0.15.1',
-        "elasticsearch>=7.0.0,<7.14.0",
+        "elasticsearch>=7.10.0,<7.14.0",  # point-in-time API
         'elasticsearch-dsl>=7.0.0,<7.4.0',
         'opensearch-py>=2.3.0,<3.0.0',
         'shapely>=1.5.15',
@@ -50,5 +50,13 @@ setup(
         # TODO: remove this pin after fix has been made to resolve
         #  https://stackoverflow.com/questions/77213053/importerror-cannot-import-name-url-quote-from-werkzeug-urls
         "werkzeug<3.0.0",
-    ]
+    ],
+    extras_require={
+        # ASGI entry point (pele.asgi) with asyncio Elasticsearch/OpenSearch clients
+        'async': ['aiohttp', 'asgiref', 'uvicorn'],
+        # faster JSON encoder of the FAST_JSON response path
+        'fast': ['orjson'],
+        # Prometheus metrics endpoint (METRICS)
+        'metrics': ['prometheus_client'],
+    }
 )
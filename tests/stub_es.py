@@ -0,0 +1,326 @@
+"""Stub Elasticsearch transport serving synthetic GRQ documents without a cluster."""
+import json
+import time
+import asyncio
+from datetime import datetime
+
+from elasticsearch import Elasticsearch, Transport, AsyncElasticsearch, AsyncTransport
+
+
+def make_doc(i, dataset='acquisition-S1-IW_SLC', dataset_type='acquisition'):
+    """Return a synthetic GRQ-like document."""
+    _id = f"{dataset}-{i:08d}"
+    return {
+        'id': _id,
+        'dataset': dataset,
+        'dataset_type': dataset_type,
+        'starttime': f"2017-04-18T21:{i // 60 % 60:02d}:{i % 60:02d}.000Z",
+        'endtime': f"2017-04-18T21:{i // 60 % 60:02d}:{i % 60:02d}.999Z",
+        'location': {
+            'type': 'polygon',
+            'coordinates': [[[123.2, -33.3], [120.5, -32.7], [121.1, -31.1], [123.7, -31.7], [123.2, -33.3]]]
+        },
+        'metadata': {'trackNumber': i % 175},
+        'creation_timestamp': f"2017-04-19T00:{i // 60 % 60:02d}:{i % 60:02d}.000Z",
+    }
+
+
+def _filter_path(obj, paths):
+    """Apply filter_path (List[List[str]] of dotted field names; "*" matches any field)."""
+    if isinstance(obj, list):
+        items = [_filter_path(i, paths) for i in obj]
+        return [i for i in items if i not in ({}, [])]
+    if not isinstance(obj, dict):
+        return obj
+    out = {}
+    for key, value in obj.items():
+        sub = [p[1:] for p in paths if p[0] in (key, '*')]
+        if not sub:
+            continue
+        value = value if any(len(p) == 0 for p in sub) else _filter_path(value, sub)
+        if value not in ({}, []):
+            out[key] = value
+    return out
+
+
+def _matches(doc, query):
+    """Apply a term query or the term, terms and range clauses of a bool query (other clauses match
+    everything)."""
+    clauses = [query] if 'term' in query else \
+        query.get('bool', {}).get('must', []) + query.get('bool', {}).get('filter', [])
+    for clause in clauses:
+        if 'term' in clause:
+            (field, value), = clause['term'].items()
+            value = value.get('value') if isinstance(value, dict) else value
+            if doc.get(field.replace('.keyword', '')) != value:
+                return False
+        if 'terms' in clause:
+            (field, values), = clause['terms'].items()
+            if doc.get(field.replace('.keyword', '')) not in values:
+                return False
+        if 'range' in clause:
+            (field, bounds), = clause['range'].items()
+            value = doc.get(field)
+            if value is None or ('gte' in bounds and value < bounds['gte']) or \
+                    ('lt' in bounds and value >= bounds['lt']):
+                return False
+    return True
+
+
+def _metrics(docs, aggs):
+    """Answer min, max and geo_bounds sub-aggregations (dates compared as ISO strings)."""
+    out = {}
+    for name, agg in aggs.items():
+        (kind, params), = agg.items()
+        if kind == 'geo_bounds':
+            points = [p for d in docs for ring in d[params['field']]['coordinates'] for p in ring]
+            out[name] = {'bounds': {
+                'top_left': {'lon': min(p[0] for p in points), 'lat': max(p[1] for p in points)},
+                'bottom_right': {'lon': max(p[0] for p in points), 'lat': min(p[1] for p in points)},
+            }} if points else {}
+            continue
+        values = [d[params['field']] for d in docs if d.get(params['field']) is not None]
+        value = (min if kind == 'min' else max)(values) if values else None
+        out[name] = {'value': value, 'value_as_string': value} if value is not None else {'value': None}
+    return out
+
+
+# ISO time prefix kept and suffix appended to floor a time to a calendar interval
+_FLOOR = {'minute': (16, ':00.000Z'), 'hour': (13, ':00:00.000Z'), 'day': (10, 'T00:00:00.000Z'),
+          'month': (7, '-01T00:00:00.000Z'), 'year': (4, '-01-01T00:00:00.000Z')}
+
+
+def _date_histogram(docs, agg):
+    """Answer a date_histogram aggregation of minute to year (but week and quarter) calendar intervals."""
+    n, suffix = _FLOOR[agg['calendar_interval']]
+    counts = {}
+    for doc in docs:
+        key = doc[agg['field']][:n] + suffix
+        counts[key] = counts.get(key, 0) + 1
+    return {'buckets': [{
+        'key_as_string': key,
+        'key': int(datetime.fromisoformat(key.replace('Z', '+00:00')).timestamp() * 1000),
+        'doc_count': counts[key],
+    } for key in sorted(counts) if counts[key] >= agg.get('min_doc_count', 0)]}
+
+
+def _select(doc, includes):
+    """Apply _source filtering of dotted field names."""
+    if includes is None:
+        return doc
+    out = {}
+    for field in includes:
+        src, dst = doc, out
+        parts = field.split('.')
+        for part in parts[:-1]:
+            if not isinstance(src, dict) or part not in src:
+                src = None
+                break
+            src = src[part]
+            dst = dst.setdefault(part, {})
+        if isinstance(src, dict) and parts[-1] in src:
+            dst[parts[-1]] = src[parts[-1]]
+    return out
+
+
+class StubES:
+    """Answers requests from an in-memory list of documents and records every call."""
+
+    def __init__(self, hosts, docs=None, index='grq_v1.0_acquisition-s1-iw_slc', latency=0., roundtrip=False,
+                 **kwargs):
+        """
+        :param docs: documents served (default 100 make_doc() documents)
+        :param index: concrete index of the documents
+        :param latency: seconds every request waits before answering
+        :param roundtrip: encode and decode every response as a real transport would
+        """
+        super().__init__(hosts, **kwargs)
+        self.docs = docs if docs is not None else [make_doc(i) for i in range(100)]
+        self.index = index
+        self.latency = latency
+        self.roundtrip = roundtrip
+        self.calls = []
+        self.response_bytes = 0
+        self.index_total = len(self.docs)  # index operations, bumped by tests updating documents in place
+        self._sorted = None
+
+    def respond(self, method, url, params=None, body=None):
+        self.calls.append((method, url, params, body))
+        resp = self.route(method, url, params, body)
+        filter_path = (params or {}).get('filter_path', None)
+        if filter_path:
+            if isinstance(filter_path, bytes):
+                filter_path = filter_path.decode()
+            resp = _filter_path(resp, [i.split('.') for i in filter_path.split(',')])
+        if self.roundtrip:
+            data = json.dumps(resp)
+            self.response_bytes += len(data)
+            resp = json.loads(data)
+        return resp
+
+    def route(self, method, url, params, body):
+        if url.endswith('/_search') or url == '/_search':
+            return self.search(body or {})
+        if url.endswith('/_msearch'):
+            return self.msearch(body)
+        if url.endswith('/_mget'):
+            return self.mget(body, params or {})
+        if url.endswith('/_alias'):
+            return {self.index: {'aliases': {url.split('/')[1]: {}}}}
+        if '/_stats' in url:
+            return {'indices': {self.index: {'primaries': {'docs': {'count': len(self.docs), 'deleted': 0},
+                                                           'indexing': {'index_total': self.index_total},
+                                                           'refresh': {'total': self.index_total}}}}}
+        if url.endswith('/_pit') and method == 'POST':
+            return {'id': 'stub-pit'}
+        if url == '/_pit' and method == 'DELETE':
+            return {'succeeded': True, 'num_freed': 1}
+        raise NotImplementedError(f"{method} {url}")
+
+    def msearch(self, body):
+        if isinstance(body, bytes):
+            body = body.decode()
+        lines = body.splitlines() if isinstance(body, str) else body
+        bodies = [json.loads(i) if isinstance(i, str) else i for i in lines[1::2]]
+        return {'took': 1, 'responses': [self.search(i) for i in bodies]}
+
+    def mget(self, body, params):
+        includes = params.get('_source_includes', None)
+        if includes is not None:
+            includes = (includes.decode() if isinstance(includes, bytes) else includes).split(',')
+        by_id = {doc['id']: doc for doc in self.docs}
+        docs = []
+        for d in body['docs']:
+            doc = by_id.get(d['_id'], None) if d['_index'] == self.index else None
+            if doc is None:
+                docs.append({'_index': d['_index'], '_type': '_doc', '_id': d['_id'], 'found': False})
+            else:
+                docs.append({'_index': d['_index'], '_type': '_doc', '_id': d['_id'], 'found': True,
+                             '_source': _select(doc, includes)})
+        return {'docs': docs}
+
+    def aggregations(self, aggs, query=None):
+        """Answer terms, date_histogram and composite (of terms, with metric sub-aggregations) aggregations."""
+        docs = [d for d in self.docs if _matches(d, query)] if query else self.docs
+        out = {}
+        for name, agg in aggs.items():
+            if 'composite' in agg:
+                out[name] = self.composite(agg['composite'], docs, agg.get('aggs', {}))
+                continue
+            if 'date_histogram' in agg:
+                out[name] = _date_histogram(docs, agg['date_histogram'])
+                continue
+            field = agg['terms']['field'].replace('.keyword', '')
+            counts = {}
+            for doc in docs:
+                counts[doc[field]] = counts.get(doc[field], 0) + 1
+            buckets = sorted(counts.items(), key=lambda i: (-i[1], i[0]))
+            out[name] = {'buckets': [{'key': k, 'doc_count': n} for k, n in buckets]}
+        return out
+
+    def composite(self, agg, docs, aggs=None):
+        sources = [(k, v['terms']['field'].replace('.keyword', '')) for i in agg['sources'] for k, v in i.items()]
+        groups = {}
+        for doc in docs:
+            key = tuple(doc[f] for _, f in sources)
+            groups.setdefault(key, []).append(doc)
+        counts = {k: len(v) for k, v in groups.items()}
+        keys = sorted(counts)
+        if 'after' in agg:
+            after = tuple(agg['after'][k] for k, _ in sources)
+            keys = [k for k in keys if k > after]
+        keys = keys[:agg.get('size', 10)]
+        buckets = [{'key': dict(zip([k for k, _ in sources], key)), 'doc_count': counts[key],
+                    **_metrics(groups[key], aggs or {})} for key in keys]
+        out = {'buckets': buckets}
+        if len(keys) == agg.get('size', 10):
+            out['after_key'] = buckets[-1]['key']
+        return out
+
+    def sorted(self, docs):
+        """Return docs in (starttime desc, id asc) order; the order of all documents is computed once."""
+        def order(items):
+            items = sorted(items, key=lambda d: d['id'])
+            return sorted(items, key=lambda d: d['starttime'], reverse=True)
+
+        if docs is not self.docs:
+            return order(docs)
+        if self._sorted is None:
+            self._sorted = order(docs)
+        return self._sorted
+
+    def search(self, body):
+        start = body.get('from', 0)
+        size = body.get('size', 10)
+        includes = body.get('_source', None)
+        docs = self.docs
+        _id = body.get('query', {}).get('term', {}).get('_id', None)
+        if _id is not None:
+            docs = [d for d in docs if d['id'] == _id]
+        ids = body.get('query', {}).get('ids', {}).get('values', None)
+        if ids is not None:
+            ids = set(ids)
+            docs = [d for d in docs if d['id'] in ids]
+        query = body.get('query', {}).get('bool', {})
+        must_not = query.get('must_not', []) + \
+            [j for i in query.get('filter', []) for j in i.get('bool', {}).get('must_not', [])]
+        for clause in must_not:
+            if 'ids' in clause:
+                excluded = set(clause['ids']['values'])
+                docs = [d for d in docs if d['id'] not in excluded]
+        if 'sort' in body:
+            docs = self.sorted(docs)
+        if 'search_after' in body:
+            keys = [[d['starttime'], d['id']] for d in docs]
+            start = keys.index(body['search_after']) + 1
+        hits = [{
+            '_index': self.index,
+            '_type': '_doc',
+            '_id': doc['id'],
+            '_score': 1.0,
+            '_source': _select(doc, includes),
+        } for doc in docs[start:start + size]]
+        if 'sort' in body:
+            for hit, doc in zip(hits, docs[start:start + size]):
+                hit['sort'] = [doc['starttime'], doc['id']]
+        resp = {
+            'took': 1,
+            'timed_out': False,
+            '_shards': {'total': 1, 'successful': 1, 'skipped': 0, 'failed': 0},
+            'hits': {'max_score': 1.0, 'hits': hits},
+        }
+        if 'pit' in body:
+            resp['pit_id'] = body['pit']['id']
+        if body.get('track_total_hits', True) is not False:
+            resp['hits']['total'] = {'value': len(self.docs), 'relation': 'eq'}
+        if 'aggs' in body:
+            resp['aggregations'] = self.aggregations(body['aggs'], body.get('query', None))
+        return resp
+
+
+class StubTransport(StubES, Transport):
+    """Transport answering from StubES."""
+
+    def perform_request(self, method, url, headers=None, params=None, body=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.respond(method, url, params=params, body=body)
+
+
+class AsyncStubTransport(StubES, AsyncTransport):
+    """AsyncTransport answering from StubES."""
+
+    async def perform_request(self, method, url, headers=None, params=None, body=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.respond(method, url, params=params, body=body)
+
+
+def stub_client(**kwargs):
+    """Return an Elasticsearch client backed by a StubTransport."""
+    return Elasticsearch(transport_class=StubTransport, **kwargs)
+
+
+def async_stub_client(**kwargs):
+    """Return an AsyncElasticsearch client backed by an AsyncStubTransport."""
+    return AsyncElasticsearch(transport_class=AsyncStubTransport, **kwargs)
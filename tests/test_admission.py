@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+import asyncio
+import threading
+import unittest
+from unittest import mock
+import jwt
+
+from pele import create_app, limiter
+from pele.asgi import AsyncApp
+from pele.controllers import request_user
+from pele.lib import admission
+from pele.lib.admission import Admission, estimate_cost
+from pele.lib.async_query import AsyncQueryES
+from tests.stub_es import stub_client, async_stub_client
+
+POLYGON = '[[-122.9,40.0],[-122.0,40.0],[-122.0,41.0],[-122.9,41.0],[-122.9,40.0]]'
+
+
+class TestCost(unittest.TestCase):
+    def test_estimate(self):
+        assert estimate_cost('types', {}) == 1
+        assert estimate_cost('dataset_by_id', {}) == 1
+        # no time range: 2 + 2 + 100 / 50
+        assert estimate_cost('ids_by_dataset', {'page_size': '100'}) == 6
+        narrow = estimate_cost('ids_by_dataset', {'page_size': '10', 'start_time': '2020-01-01T00:00:00Z',
+                                                  'end_time': '2020-01-02T00:00:00Z'})
+        wide = estimate_cost('ids_by_dataset', {'page_size': '10', 'start_time': '2010-01-01T00:00:00Z',
+                                                'end_time': '2020-01-01T00:00:00Z'})
+        assert narrow < wide == 4.2
+        assert estimate_cost('ids_by_dataset', {'polygon': POLYGON}) == 2 + 2 + 2 + 5 / 20.
+        assert estimate_cost('overlaps_by_id', {}) > estimate_cost('dataset_by_id', {})
+        assert estimate_cost('datasets_by_ids', {'ids': ['a'] * 1000}) == 12
+        assert estimate_cost('batch', {'queries': [{'query': 'overlaps', 'page_size': 50},
+                                                   {'query': 'unknown'}]}) == 1 + 4 + 1
+        assert estimate_cost('join_overlaps', {'source': {'polygon': [[[0, 0], [1, 1], [0, 0]]]}}) == 50 + 2 + 2 + 3 / 20.
+        assert estimate_cost('types', {}, costs={'types': 3}) == 3
+
+    def test_in_flight(self):
+        a = Admission(limiter, max_in_flight=1)
+        assert a.admit('types', {}, 'user') is None
+        body, status, headers = a.admit('types', {}, 'user')
+        assert status == 503
+        assert headers['Retry-After'] == '5'
+        a.release()
+        assert a.admit('types', {}, 'user') is None
+        assert a.stats()['over_capacity'] == 1
+
+    def test_shedding(self):
+        a = Admission(limiter, shed_latency=0.5, shed_min_cost=5)
+        a.observe(2.)
+        assert a.admit('overlaps_by_id', {'page_size': 100}, 'user')[1] == 503
+        assert a.admit('types', {}, 'user') is None  # cheap requests still pass
+        a.observed_at -= a.retry_after  # no call recorded since: let requests probe again
+        assert a.admit('overlaps_by_id', {'page_size': 100}, 'user') is None
+
+
+class TestAdmission(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('pele.settings.TestConfig')
+        self.app.config.update(AUTH=False, ADMISSION_CONTROL=True, ADMISSION_USER_BUDGET="10/minute")
+        self.app.es_util.client = stub_client()
+        self.admission = admission.init_app(self.app, limiter)
+        self.client = self.app.test_client()
+        limiter.enabled = False
+        limiter.reset()
+
+    def tearDown(self):
+        limiter.enabled = True
+        limiter.reset()
+
+    def test_budget(self):
+        path = '/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids?page_size=100'
+        assert self.client.get(path).status_code == 200
+        resp = self.client.get(path)
+        assert resp.status_code == 429
+        assert int(resp.headers['Retry-After']) > 0
+        assert resp.json['success'] is False
+        # cheaper requests fit in what is left of the budget
+        assert self.client.get('/api/v0.1/pele/dataset/acquisition-S1-IW_SLC-00000001').status_code == 200
+        assert self.admission.stats()['in_flight'] == 0
+
+    def test_streamed(self):
+        self.admission.budget = None
+        resp = self.client.get('/api/v0.1/pele/export/dataset/acquisition-S1-IW_SLC/dataset_ids', buffered=False)
+        assert resp.status_code == 200
+        assert self.admission.in_flight == 1
+        resp.get_data()
+        resp.close()
+        assert self.admission.in_flight == 0
+
+    def test_user_key(self):
+        # budgets follow the verified token subject even when tokens are not cached
+        self.app.config.update(AUTH=True)
+        self.app.token_cache.ttl = 0
+        self.app.token_cache.set_user('user@example.com')
+        token = jwt.encode({'sub': 'user@example.com'}, self.app.config['SECRET_KEY']).decode()
+        path = '/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids?page_size=100'
+        assert self.client.get(path, headers={'X-API-KEY': token}).status_code == 200
+        assert self.client.get(path, headers={'X-API-KEY': token}).status_code == 429
+        # another user behind the same address has a budget of its own
+        self.app.token_cache.set_user('other@example.com')
+        other = jwt.encode({'sub': 'other@example.com'}, self.app.config['SECRET_KEY']).decode()
+        assert self.client.get(path, headers={'X-API-KEY': other}).status_code == 200
+        with self.app.test_request_context(path, environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+            assert request_user() == '10.0.0.1'
+
+    def test_asgi_off_loop(self):
+        # the limiter storage may be remote: the ASGI app must not call it on the event loop
+        asgi_app = AsyncApp(self.app, AsyncQueryES(async_stub_client(), self.app.es_util))
+        limiter.enabled = True
+        threads = []
+
+        def record(f):
+            def wrapper(*args, **kwargs):
+                threads.append(threading.current_thread())
+                return f(*args, **kwargs)
+            return wrapper
+
+        async def get(path):
+            scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': [],
+                     'client': ('10.0.0.1', 0)}
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            await asgi_app(scope, None, send)
+            return threading.current_thread(), sent[0]['status']
+
+        with mock.patch.object(limiter.limiter, 'hit', record(limiter.limiter.hit)), \
+                mock.patch.object(self.admission, 'admit', record(self.admission.admit)):
+            loop_thread, status = asyncio.run(get('/api/v0.1/pele/types'))
+        assert status == 200
+        assert len(threads) == 3  # rate limit, admission and its budget
+        assert loop_thread not in threads
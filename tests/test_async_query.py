@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+import unittest
+from flask import Flask
+from elasticsearch_dsl import Search, Q, A
+
+from pele.lib.query import QueryES
+from pele.lib.async_query import AsyncQueryES
+from tests.stub_es import stub_client, async_stub_client
+
+
+class TestAsyncQueryES(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TRACK_TOTAL_HITS'] = True
+        self.client = async_stub_client()
+        self.calls = self.client.transport.calls
+        self.es_util = AsyncQueryES(self.client, QueryES(self.client, Search, Q, A))
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    async def asyncTearDown(self):
+        self.ctx.pop()
+
+    async def test_same_results_as_sync(self):
+        es_util = QueryES(stub_client(), Search, Q, A)
+        terms = {'dataset_type.keyword': 'acquisition', 'dataset.keyword': 'acquisition-S1-IW_SLC'}
+        assert await self.es_util.query_types('grq', 0, 10) == es_util.query_types('grq', 0, 10)
+        assert await self.es_util.query_datasets_by_type('grq', 'acquisition', 0, 10) == \
+            es_util.query_datasets_by_type('grq', 'acquisition', 0, 10)
+        assert await self.es_util.query_ids_by_dataset('grq', 'acquisition-S1-IW_SLC', 10, 5) == \
+            es_util.query_ids_by_dataset('grq', 'acquisition-S1-IW_SLC', 10, 5)
+        assert await self.es_util.query_fields('grq', terms, ['id'], 0, 3) == \
+            es_util.query_fields('grq', terms, ['id'], 0, 3)
+
+    async def test_id(self):
+        _id = 'acquisition-S1-IW_SLC-00000007'
+        doc = await self.es_util.query_id('grq', _id, fields=['id'])
+        assert doc == {'id': _id}
+        assert self.calls[-1][1].endswith('/_search')
+
+        # concrete index learned from the search is used for a multi-get
+        doc = await self.es_util.query_id('grq', _id)
+        assert doc['id'] == _id
+        assert self.calls[-1][1].endswith('/_mget')
+
+    async def test_overlaps(self):
+        total, docs = await self.es_util.overlaps('grq', 'acquisition-S1-IW_SLC-00000005', {}, ['id'], 0, 2)
+        assert total == 100
+        assert len(docs) == 2
+        assert len(self.calls) == 2
+
+    async def test_sync_methods(self):
+        # only the queries of the ASGI endpoints are available, not the sync callers of QueryES
+        assert not hasattr(self.es_util, 'query_batch')
+        assert not hasattr(self.es_util, 'join_overlaps')
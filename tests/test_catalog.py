@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+import unittest
+from flask import Flask
+
+from pele.lib.catalog import FacetCatalog
+
+
+ROWS = [
+    ('acquisition', 'acquisition-S1-IW_SLC', 30),
+    ('acquisition', 'acquisition-ALOS2', 5),
+    ('area_of_interest', 'area_of_interest', 5),
+    ('slc', 'S1-IW_SLC', 12),
+]
+
+
+class TestFacetCatalog(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def loader(index):
+            self.calls.append(index)
+            return ROWS
+
+        self.catalog = FacetCatalog(Flask(__name__), loader, ttl=3600)
+
+    def test_facets(self):
+        facets = self.catalog.refresh('grq')
+
+        assert facets.types == ['acquisition', 'slc', 'area_of_interest']
+        assert facets.datasets[0] == 'acquisition-S1-IW_SLC'
+        assert facets.datasets[1:3] == ['S1-IW_SLC', 'acquisition-ALOS2']
+        assert facets.datasets_by_type['acquisition'] == ['acquisition-S1-IW_SLC', 'acquisition-ALOS2']
+        assert facets.types_by_dataset['S1-IW_SLC'] == ['slc']
+        assert facets.type_counts['acquisition'] == 35
+
+    def test_stats(self):
+        self.catalog.refresh('grq')
+        assert self.catalog.get('grq') is not None
+
+        stats = self.catalog.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 0
+        assert stats['refreshes'] == 1
+        assert stats['indices']['grq']['types'] == 3
+        assert self.calls == ['grq']
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import unittest
+
+from pele import create_app, limiter
+from pele.lib import conditional
+from tests.stub_es import stub_client, make_doc
+
+PATH = '/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids?page_size=5'
+
+
+class TestConditionalGet(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('pele.settings.TestConfig')
+        self.app.config.update(AUTH=False, ADMISSION_CONTROL=False, CONDITIONAL_GET=True,
+                               CONDITIONAL_GET_CACHE_CONTROL='private, no-cache')
+        self.app.es_util.client = stub_client()
+        conditional.init_app(self.app)
+        self.client = self.app.test_client()
+        limiter.enabled = False
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def searches(self):
+        return [c for c in self.app.es_util.client.transport.calls if c[1].endswith('/_search')]
+
+    def test_etag(self):
+        resp = self.client.get(PATH)
+        assert resp.status_code == 200
+        etag = resp.headers['ETag']
+        assert etag.startswith('W/')
+        assert resp.headers['Cache-Control'] == 'private, no-cache'
+        assert 'Last-Modified' in resp.headers
+
+        resp = self.client.get(PATH, headers={'If-None-Match': etag})
+        assert resp.status_code == 304
+        assert resp.headers['ETag'] == etag
+        assert resp.get_data() == b''
+        assert len(self.searches()) == 1
+
+        # other arguments, other representation
+        other = self.client.get(PATH.replace('page_size=5', 'page_size=6'), headers={'If-None-Match': etag})
+        assert other.status_code == 200 and other.headers['ETag'] != etag
+
+    def test_last_modified(self):
+        resp = self.client.get(PATH)
+        resp = self.client.get(PATH, headers={'If-Modified-Since': resp.headers['Last-Modified']})
+        assert resp.status_code == 304
+        assert len(self.searches()) == 1  # answered before searching
+
+    def test_index_change(self):
+        etag = self.client.get(PATH).headers['ETag']
+        self.app.es_util.client.transport.docs.append(make_doc(100))
+        self.app.es_util.fingerprints._cache.clear()
+        resp = self.client.get(PATH, headers={'If-None-Match': etag})
+        assert resp.status_code == 200
+        assert resp.headers['ETag'] != etag
+
+    def test_catalog_listing(self):
+        # listings served from the facet catalog are validated by a hash of their body
+        self.app.es_util.catalog.refresh(self.app.config['ES_INDEX'])
+        resp = self.client.get('/api/v0.1/pele/types')
+        assert resp.status_code == 200
+        resp = self.client.get('/api/v0.1/pele/types', headers={'If-None-Match': resp.headers['ETag']})
+        assert resp.status_code == 304
+
+    def test_errors_and_posts(self):
+        resp = self.client.get('/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids?polygon=x')
+        assert resp.status_code == 400
+        assert 'ETag' not in resp.headers
+        resp = self.client.post('/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids', json={})
+        assert 'ETag' not in resp.headers
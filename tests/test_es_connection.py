@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+import unittest
+
+from elasticsearch import Urllib3HttpConnection
+
+from pele.lib import es_connection
+from pele.lib.es_connection import get_es_client, KEEPALIVE_SOCKET_OPTIONS, PooledUrllib3Connection
+
+
+class TestEsConnection(unittest.TestCase):
+    def setUp(self):
+        es_connection.ES_CLIENT = None
+
+    def tearDown(self):
+        es_connection.ES_CLIENT = None
+
+    def test_options(self):
+        for engine in ('elasticsearch', 'opensearch'):
+            es_connection.ES_CLIENT = None
+            client = get_es_client({
+                'ES_ENGINE': engine,
+                'ES_URL': ['http://127.0.0.1:9200', 'http://127.0.0.2:9200'],
+                'ES_POOL_MAXSIZE': 25,
+                'ES_TCP_KEEPALIVE': True,
+                'ES_HTTP_COMPRESS': True,
+                'ES_TIMEOUT': 5,
+                'ES_MAX_RETRIES': 1,
+            })
+            connections = client.transport.connection_pool.connections
+            assert len(connections) == 2
+            for conn in connections:
+                assert conn.pool.pool.maxsize == 25
+                assert conn.pool.conn_kw['socket_options'] == KEEPALIVE_SOCKET_OPTIONS
+                assert conn.http_compress is True
+                assert conn.timeout == 5
+            assert client.transport.max_retries == 1
+
+    def test_singleton(self):
+        client = get_es_client({'ES_URL': 'http://127.0.0.1:9200'})
+        assert get_es_client({'ES_URL': 'http://127.0.0.1:9200'}) is client
+        conn = client.transport.connection_pool.connections[0]
+        assert conn.pool.pool.maxsize == 10
+        assert conn.http_compress is False
+
+    def test_reset_after_fork(self):
+        client = get_es_client({'ES_URL': 'http://127.0.0.1:1', 'ES_MAX_RETRIES': 0})
+        pool = client.transport.connection_pool
+
+        # pretend the client was created by the parent of this process
+        client.transport._pid = -1
+        with self.assertRaises(Exception):
+            client.transport.perform_request('GET', '/')
+        assert client.transport.connection_pool is not pool
+
+    def test_pool_kwargs_required(self):
+        class Unsized(PooledUrllib3Connection, Urllib3HttpConnection):
+            pass
+
+        with self.assertRaises(TypeError):
+            Unsized(host='127.0.0.1')
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+import json
+import zlib
+import unittest
+
+from pele import create_app, limiter
+from tests.stub_es import stub_client
+
+PATH = '/api/v0.1/pele/export/dataset/acquisition-S1-IW_SLC/dataset_ids'
+
+
+def lines(data):
+    return [json.loads(i) for i in data.decode().splitlines()]
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('pele.settings.TestConfig')
+        self.app.config.update(AUTH=False, ADMISSION_CONTROL=False, EXPORT_PAGE_SIZE=30)
+        self.app.es_util.client = stub_client()
+        self.client = self.app.test_client()
+        limiter.enabled = False
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def test_framing(self):
+        resp = self.client.get(PATH, headers={'Accept-Encoding': 'identity'})
+        assert resp.status_code == 200
+        assert resp.mimetype == 'application/x-ndjson'
+        assert 'Content-Encoding' not in resp.headers
+        assert resp.headers['Vary'] == 'Accept-Encoding'
+        records = lines(resp.get_data())
+        # pages of 30, 30, 30 and 10 records, each followed by its cursor
+        nexts = [i for i, r in enumerate(records) if 'next' in r]
+        assert nexts == [30, 61, 92, 103]
+        assert records[-1] == {'next': None}
+        ids = [r['id'] for r in records if 'id' in r]
+        assert ids == sorted(ids, reverse=True) and len(set(ids)) == 100
+
+        # resume from the cursor after the second page
+        resp = self.client.get(PATH, query_string={'cursor': records[61]['next']})
+        resumed = [r['id'] for r in lines(resp.get_data()) if 'id' in r]
+        assert resumed == ids[60:]
+
+        resp = self.client.post(PATH, json={'cursor': records[92]['next']})
+        assert [r['id'] for r in lines(resp.get_data()) if 'id' in r] == ids[90:]
+
+        assert self.client.get(PATH, query_string={'cursor': 'Zm9v'}).status_code == 400
+
+    def test_fields(self):
+        resp = self.client.get('/api/v0.1/pele/export/type/acquisition/dataset/acquisition-S1-IW_SLC/id,starttime')
+        records = lines(resp.get_data())
+        assert len(records) == 104
+        assert set(records[0]) == {'id', 'starttime'}
+
+    def test_gzip(self):
+        identity = self.client.get(PATH).get_data()
+        resp = self.client.get(PATH, headers={'Accept-Encoding': 'gzip, deflate'})
+        assert resp.headers['Content-Encoding'] == 'gzip'
+        assert zlib.decompress(resp.get_data(), 31) == identity
+
+        resp = self.client.get(PATH, headers={'Accept-Encoding': 'gzip;q=0, identity'})
+        assert 'Content-Encoding' not in resp.headers
+        assert resp.get_data() == identity
+
+    def test_error(self):
+        def pages(*args, **kwargs):
+            yield [{'id': 'a'}], 'cursor-1'
+            raise RuntimeError("ES is down")
+
+        self.app.es_util.export_ids_by_dataset = pages
+        records = lines(self.client.get(PATH).get_data())
+        # the error record takes the place of the final {"next": null}
+        assert records == [{'id': 'a'}, {'next': 'cursor-1'}, {'error': "ES is down"}]
+
+
+class TestJoinOverlaps(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('pele.settings.TestConfig')
+        self.app.config.update(AUTH=False, ADMISSION_CONTROL=False, JOIN_BATCH_SIZE=2, JOIN_MAX_MATCHES=10)
+        self.app.es_util.client = stub_client()
+        del self.app.es_util.client.transport.docs[4:]
+        self.client = self.app.test_client()
+        limiter.enabled = False
+        self.body = {
+            'source': {'type': 'acquisition', 'dataset': 'acquisition-S1-IW_SLC'},
+            'target': {'type': 'acquisition', 'dataset': 'acquisition-S1-IW_SLC'},
+            'fields': ['id'],
+        }
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def join(self, **kwargs):
+        resp = self.client.post('/api/v0.1/pele/join/overlaps', json=dict(self.body, **kwargs))
+        assert resp.status_code == 200
+        return lines(resp.get_data())
+
+    def test_pairs(self):
+        records = self.join()
+        # two pages of two sources (and an empty last page), each overlapping the three other documents
+        # but not itself
+        pairs = [r for r in records if 'target' in r]
+        assert len(pairs) == 12
+        assert all(r['source'] != r['target']['id'] for r in pairs)
+        assert [r['next'] is None for r in records if 'next' in r] == [False, False, True]
+        assert not any('truncated' in r for r in records)
+
+        # resume after the first page
+        resumed = self.join(cursor=records[6]['next'])
+        assert [r for r in resumed if 'target' in r] == pairs[6:]
+
+    def test_truncated(self):
+        self.app.config['JOIN_MAX_MATCHES'] = 2
+        records = self.join()
+        assert len([r for r in records if 'target' in r]) == 8
+        assert records[2] == {'source': records[0]['source'], 'truncated': True}
+
+    def test_error(self):
+        self.app.es_util._msearch = lambda searches: [{'error': {'type': 'search_phase_execution_exception'}}
+                                                      for _ in searches]
+        records = self.join()
+        assert list(records[-1]) == ['error']
+        assert 'Failed to find overlaps' in records[-1]['error']
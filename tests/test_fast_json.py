@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+import json
+import unittest
+from flask_restx import marshal
+
+from pele.lib import fast_json
+from pele.lib.fast_json import field_plan, apply_plan
+from pele.controllers.api_v01.datasets import MetadataById, FieldsByTypeDataset, IdsByDataset
+from tests.stub_es import make_doc
+
+
+class TestFastJson(unittest.TestCase):
+    def same_as_marshal(self, model, data):
+        expected = json.loads(json.dumps(marshal(data, model)))
+        assert json.loads(fast_json.dumps(apply_plan(field_plan(model), data))) == expected
+
+    def test_pages(self):
+        docs = [make_doc(i) for i in range(100)]
+        self.same_as_marshal(FieldsByTypeDataset.model, {
+            'success': True,
+            'total': 100,
+            'count': 100,
+            'page_size': 100,
+            'offset': 0,
+            'results': docs
+        })
+        self.same_as_marshal(IdsByDataset.model, {
+            'success': True,
+            'total': 100,
+            'count': 100,
+            'next': 'abc',
+            'dataset_ids': [i['id'] for i in docs]
+        })
+        self.same_as_marshal(IdsByDataset.model, {'success': False, 'message': "Invalid polygon value"})
+
+    def test_nested(self):
+        doc = make_doc(0)
+        doc['images'] = [{'img': 'a.png', 'small_img': None}]
+        doc['center'] = {'type': 'point', 'coordinates': [1, 2]}
+        doc['version'] = 2
+        self.same_as_marshal(MetadataById.model, {'success': True, 'result': doc})
+        self.same_as_marshal(MetadataById.model, {'success': True, 'result': None})
+        self.same_as_marshal(MetadataById.model, {'success': True, 'result': {'id': 'x', 'location': None}})
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+import math
+import json
+import unittest
+
+from pele import create_app, limiter
+from pele.lib.geo import prepare_polygon, polygon_cache
+from tests.stub_es import stub_client
+
+TRIANGLE = [[[-122.9, 40.0], [-122.0, 40.0], [-122.5, 41.0], [-122.9, 40.0]]]
+
+
+def circle(n, radius=1.):
+    ring = [[round(radius * math.cos(2 * math.pi * i / n), 6), round(radius * math.sin(2 * math.pi * i / n), 6)]
+            for i in range(n)]
+    return [ring + [ring[0]]]
+
+
+class TestPreparePolygon(unittest.TestCase):
+    def test_normalize(self):
+        aoi = prepare_polygon(json.dumps(TRIANGLE[0][:-1]))  # bare, unclosed ring
+        assert aoi.coordinates == TRIANGLE
+        assert aoi.bbox == (-122.9, 40.0, -122.0, 41.0)
+        assert aoi.envelope() == {'type': 'envelope', 'coordinates': [[-122.9, 41.0], [-122.0, 40.0]]}
+        assert aoi.shape() == {'type': 'polygon', 'coordinates': TRIANGLE}
+        assert not aoi.is_box
+
+    def test_invalid(self):
+        for p in ('not json', '{"a": 1}', '[[[0, 0], [1, 1]]]', '[[[0, 0], [1, 1], [1, 0], [0, 1], [0, 0]]]',
+                  '[[[0, 0], [200, 0], [0, 1], [0, 0]]]', '[[[0, "a"], [1, 0], [0, 1], [0, 0]]]'):
+            with self.assertRaises(ValueError, msg=p):
+                prepare_polygon(p)
+
+    def test_box(self):
+        aoi = prepare_polygon([[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]])
+        assert aoi.is_box
+        assert aoi.shape() == aoi.envelope()
+
+    def test_antimeridian(self):
+        aoi = prepare_polygon([[[170, 0], [-170, 0], [-170, 10], [170, 10], [170, 0]]])
+        assert aoi.envelope() is None
+        assert aoi.shape()['type'] == 'polygon'
+
+    def test_simplify(self):
+        p = circle(5000)
+        assert prepare_polygon(p, tolerance=0.01, min_vertices=10000).vertices == 5001
+        aoi = prepare_polygon(p, tolerance=0.01, min_vertices=100)
+        assert 4 <= aoi.vertices < 100
+        ring = aoi.coordinates[0]
+        area = sum(a[0] * b[1] - b[0] * a[1] for a, b in zip(ring, ring[1:]))
+        assert area > 0  # counterclockwise as given
+
+    def test_cache(self):
+        cache = polygon_cache()
+        p = json.dumps(circle(100))
+        hits = cache.hits
+        assert prepare_polygon(p) is prepare_polygon(p)
+        assert cache.hits == hits + 1
+
+
+class TestPolygonFilter(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('pele.settings.TestConfig')
+        self.app.config['AUTH'] = False
+        self.app.config['ADMISSION_CONTROL'] = False
+        self.app.es_util.client = stub_client()
+        self.client = self.app.test_client()
+        limiter.enabled = False
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def last_body(self):
+        return self.app.es_util.client.transport.calls[-1][3]
+
+    def test_prefilter(self):
+        resp = self.client.get('/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids',
+                               query_string={'polygon': json.dumps(TRIANGLE)})
+        assert resp.status_code == 200
+        q = self.last_body()['query']['bool']
+        assert q['filter'] == [{'geo_shape': {'location': {'shape': {
+            'type': 'envelope', 'coordinates': [[-122.9, 41.0], [-122.0, 40.0]]}}}}]
+        assert {'geo_shape': {'location': {'shape': {'type': 'polygon', 'coordinates': TRIANGLE}}}} in q['must']
+
+        self.app.config['POLYGON_ENVELOPE_PREFILTER'] = False
+        self.client.get('/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids',
+                        query_string={'polygon': json.dumps(TRIANGLE)})
+        assert 'filter' not in self.last_body()['query']['bool']
+
+    def test_invalid(self):
+        bowtie = [[[0, 0], [1, 1], [1, 0], [0, 1], [0, 0]]]
+        resp = self.client.get('/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids',
+                               query_string={'polygon': json.dumps(bowtie)})
+        assert resp.status_code == 400
+        assert 'Self-intersection' in resp.json['message']
+        resp = self.client.post('/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids', json={'polygon': bowtie})
+        assert resp.status_code == 400
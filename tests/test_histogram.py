@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+import unittest
+from datetime import datetime, timezone
+
+from pele import create_app, limiter
+from pele.lib.histogram import HistogramCache, bucket_start
+from tests.stub_es import stub_client, make_doc
+
+PATH = '/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/histogram?interval=minute'
+
+
+class TestBuckets(unittest.TestCase):
+    def test_bucket_start(self):
+        t = datetime(2017, 4, 20, 21, 35, 12, tzinfo=timezone.utc)  # a Thursday
+        assert bucket_start(t, 'hour') == datetime(2017, 4, 20, 21, tzinfo=timezone.utc)
+        assert bucket_start(t, 'week') == datetime(2017, 4, 17, tzinfo=timezone.utc)
+        assert bucket_start(t, 'quarter') == datetime(2017, 4, 1, tzinfo=timezone.utc)
+        assert bucket_start(t, 'year') == datetime(2017, 1, 1, tzinfo=timezone.utc)
+        with self.assertRaises(ValueError):
+            bucket_start(t, 'fortnight')
+
+    def test_closed_until(self):
+        histograms = HistogramCache(lag=3600)
+        now = datetime(2017, 4, 20, 21, 35, tzinfo=timezone.utc).timestamp()
+        # the bucket holding now - lag is still open
+        assert histograms.closed_until('hour', now=now) == \
+            datetime(2017, 4, 20, 20, tzinfo=timezone.utc).timestamp() * 1000
+        assert histograms.closed_until('day', now=now) == \
+            datetime(2017, 4, 20, tzinfo=timezone.utc).timestamp() * 1000
+
+
+class TestHistogram(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('pele.settings.TestConfig')
+        self.app.config.update(AUTH=False, ADMISSION_CONTROL=False)
+        self.app.es_util.client = stub_client()
+        self.client = self.app.test_client()
+        limiter.enabled = False
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def searches(self):
+        return [c for c in self.app.es_util.client.transport.calls if c[1].endswith('/_search')]
+
+    def test_histogram(self):
+        self.app.es_util.histograms = None
+        resp = self.client.get(PATH)
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data['histogram'] == [{'start': '2017-04-18T21:00:00.000Z', 'count': 60},
+                                     {'start': '2017-04-18T21:01:00.000Z', 'count': 40}]
+        assert data['total'] == 100
+        assert data['cached'] == 0
+
+        resp = self.client.get('/api/v0.1/pele/type/acquisition/histogram')
+        assert resp.get_json()['histogram'] == [{'start': '2017-04-18T00:00:00.000Z', 'count': 100}]
+
+        assert self.client.get(PATH.replace('minute', 'fortnight')).status_code == 400
+
+    def test_cached(self):
+        self.app.es_util.histograms = HistogramCache(ttl=3600, lag=86400)
+        assert self.client.get(PATH).get_json()['cached'] == 0
+
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:00.000Z')
+        recent = make_doc(100)
+        recent['starttime'] = now
+        docs = self.app.es_util.client.transport.docs
+        docs.extend([recent, make_doc(101)])
+
+        data = self.client.get(PATH).get_json()
+        # closed buckets from the cache (not seeing the late document), the open tail from ES
+        assert data['cached'] == 2
+        assert data['histogram'] == [{'start': '2017-04-18T21:00:00.000Z', 'count': 60},
+                                     {'start': '2017-04-18T21:01:00.000Z', 'count': 40},
+                                     {'start': now, 'count': 1}]
+        body = self.searches()[-1][3]
+        # only documents from the first open bucket (a day before now) were aggregated
+        assert body['query']['bool']['filter'][-1]['range']['starttime']['gte'] > '2018'
+        assert self.app.es_util.histograms.stats()['hits'] == 1
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+import time
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from elasticsearch import Transport, Connection
+
+from pele.lib.host_selector import HostStats, LatencySelector, TimedConnection, HedgingTransport
+
+
+class SlowFirstTransport:
+    """Transport whose first request takes 0.5 seconds."""
+
+    def __init__(self, *args, host_stats=None, **kwargs):
+        self.kwargs = {}
+        self.hosts = [{'host': 'a'}, {'host': 'b'}]
+        self.connection_pool = SimpleNamespace(connections=[1, 2])
+        self.requests = 0
+
+    def perform_request(self, method, url, headers=None, params=None, body=None):
+        self.requests += 1
+        if self.requests == 1:
+            time.sleep(0.5)
+            return 'slow'
+        return 'fast'
+
+
+class HedgedTransport(HedgingTransport, SlowFirstTransport):
+    pass
+
+
+class HostConnection(TimedConnection, Connection):
+    """Connection answering with its host name, after 0.5 seconds on host "slow"."""
+
+    def perform_request(self, method, url, params=None, body=None, timeout=None, ignore=(), headers=None):
+        if self.host == 'http://slow:9200':
+            time.sleep(0.5)
+        return 200, {}, '{"host": "%s"}' % self.host
+
+
+class FirstSelector:
+    """Selector always choosing the first connection."""
+
+    def __init__(self, opts):
+        pass
+
+    def select(self, connections):
+        return connections[0]
+
+
+class HedgedESTransport(HedgingTransport, Transport):
+    pass
+
+
+class TestHostSelector(unittest.TestCase):
+    def setUp(self):
+        self.stats = HostStats(alpha=0.5, eject_error_rate=0.5, eject_secs=60)
+
+    def request(self, host, secs, error=False):
+        self.stats.start(host)
+        self.stats.record(host, secs, error=error)
+
+    def test_ewma(self):
+        self.request('a', 0.1)
+        self.request('a', 0.3)
+        assert abs(self.stats.stats()['hosts']['a']['latency'] - 0.2) < 1e-9
+        # unmeasured hosts are tried first
+        assert self.stats.score('b') == 0.
+
+    def test_prefers_fastest(self):
+        self.request('fast', 0.01)
+        self.request('slow', 1.0)
+        connections = [SimpleNamespace(host='fast', host_stats=self.stats),
+                       SimpleNamespace(host='slow', host_stats=self.stats)]
+        selector = LatencySelector({})
+        assert all(selector.select(connections).host == 'fast' for _ in range(10))
+
+    def test_ejection(self):
+        self.request('a', 0.01)
+        self.request('a', 0.01, error=True)
+        hosts = self.stats.stats()['hosts']
+        assert hosts['a']['ejected'] is True
+        assert hosts['a']['ejections'] == 1
+
+        connections = [SimpleNamespace(host='a', host_stats=self.stats),
+                       SimpleNamespace(host='b', host_stats=self.stats)]
+        assert all(LatencySelector({}).select(connections).host == 'b' for _ in range(10))
+
+        # a success after the ejection resets the backoff
+        self.request('a', 0.01)
+        assert self.stats.stats()['hosts']['a']['ejections'] == 0
+
+    def test_hedging(self):
+        transport = HedgedTransport(hedge_after=0.05, host_stats=self.stats)
+        t0 = time.time()
+        assert transport.perform_request('POST', '/grq/_search', body={}) == 'fast'
+        assert time.time() - t0 < 0.4
+        assert self.stats.stats()['hedged'] == 1
+
+        # writes are never hedged
+        transport = HedgedTransport(hedge_after=0.05, host_stats=self.stats)
+        assert transport.perform_request('POST', '/grq/_doc', body={}) == 'slow'
+
+    def test_hedge_other_host(self):
+        # the copy goes to another host even though the selector prefers the first one
+        transport = HedgedESTransport([{'host': 'slow'}, {'host': 'fast'}], connection_class=HostConnection,
+                                      selector_class=FirstSelector, randomize_hosts=False, hedge_after=0.05,
+                                      host_stats=self.stats)
+        t0 = time.time()
+        assert transport.perform_request('POST', '/grq/_search', body={}) == {'host': 'http://fast:9200'}
+        assert time.time() - t0 < 0.4
+        assert self.stats.stats()['hedged'] == 1
+        assert self.stats.ejected_until('http://slow:9200') == 0.
+
+    def test_one_executor(self):
+        # concurrent first hedged requests share one executor
+        transport = HedgedTransport(hedge_after=0.05, host_stats=self.stats)
+        barrier = threading.Barrier(8)
+        executors = []
+
+        def first():
+            barrier.wait()
+            executors.append(transport.executor())
+
+        def slow_executor(**kwargs):
+            time.sleep(0.05)
+            return object()
+
+        threads = [threading.Thread(target=first) for _ in range(8)]
+        with mock.patch('pele.lib.host_selector.ThreadPoolExecutor', side_effect=slow_executor) as created:
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        assert created.call_count == 1
+        assert len({id(i) for i in executors}) == 1
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import json
+import unittest
+
+from pele import create_app, limiter
+from tests.stub_es import stub_client, make_doc
+
+PATH = '/api/v0.1/pele/datasets/lookup'
+
+
+def doc_id(i):
+    return make_doc(i)['id']
+
+
+class TestLookup(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('pele.settings.TestConfig')
+        self.app.config.update(AUTH=False, ADMISSION_CONTROL=False, BATCH_STREAM_THRESHOLD=10)
+        self.app.es_util.client = stub_client()
+        self.client = self.app.test_client()
+        limiter.enabled = False
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def test_buffered(self):
+        ids = [doc_id(3), 'unknown', doc_id(1)]
+        resp = self.client.post(PATH, json={'ids': ids, 'fields': ['id']})
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data['success'] is True
+        assert data['results'] == [{'id': doc_id(3)}, None, {'id': doc_id(1)}]
+        assert data['missing'] == ['unknown']
+
+        assert self.client.post(PATH, json={'ids': 'x'}).status_code == 400
+
+    def test_streamed(self):
+        ids = [doc_id(i) for i in range(24)] + ['unknown']
+        resp = self.client.post(PATH, json={'ids': ids, 'fields': ['id']})
+        assert resp.status_code == 200
+        assert resp.is_streamed
+        data = json.loads(resp.get_data())
+        assert data['success'] is True
+        assert data['count'] == 25
+        assert data['results'][:24] == [{'id': i} for i in ids[:24]]
+        assert data['results'][24] is None
+        assert data['missing'] == ['unknown']
+
+    def test_streamed_error(self):
+        query_ids = self.app.es_util.query_ids
+        calls = []
+
+        def failing(index, ids, fields=None):
+            calls.append(ids)
+            if len(calls) > 1:
+                raise RuntimeError("ES is down")
+            return query_ids(index, ids, fields=fields)
+
+        self.app.es_util.query_ids = failing
+        resp = self.client.post(PATH, json={'ids': [doc_id(i) for i in range(25)]})
+        data = json.loads(resp.get_data())  # one valid document with a single status
+        assert data['success'] is False
+        assert data['message'] == "ES is down"
+        assert len(data['results']) == 10
+        assert 'missing' not in data
+
+    def test_copies(self):
+        # an ID held by several indices of the alias must not crowd out the other IDs
+        docs = self.app.es_util.client.transport.docs
+        docs[:] = [make_doc(0)] * 3 + [make_doc(1)]
+        resp = self.client.post(PATH, json={'ids': [doc_id(0), doc_id(1)]})
+        assert resp.get_json()['missing'] == []
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import unittest
+
+from pele import create_app, limiter
+from pele.lib import metrics
+from tests.stub_es import stub_client
+
+
+@unittest.skipIf(metrics.prometheus_client is None, "prometheus_client not installed")
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('pele.settings.TestConfig')
+        self.app.config['AUTH'] = False
+        self.app.config['METRICS'] = True
+        self.app.es_util.client = stub_client()
+        self.app.es_util.catalog = None
+        self.metrics = metrics.init_app(self.app)
+        self.client = self.app.test_client()
+        limiter.enabled = False
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def samples(self):
+        resp = self.client.get('/metrics')
+        assert resp.status_code == 200
+        samples = {}
+        from prometheus_client.parser import text_string_to_metric_families
+        for family in text_string_to_metric_families(resp.get_data(as_text=True)):
+            for s in family.samples:
+                samples[(s.name, tuple(sorted(s.labels.items())))] = s.value
+        return samples
+
+    def test_requests(self):
+        for _ in range(2):
+            resp = self.client.get('/api/v0.1/pele/dataset/acquisition-S1-IW_SLC-00000007')
+            assert resp.status_code == 200
+        samples = self.samples()
+
+        endpoint = ('endpoint', 'api_v0-1.dataset_by_id')
+        assert samples[('pele_requests_total', (endpoint, ('method', 'GET'), ('status', '200')))] == 2
+        assert samples[('pele_request_duration_seconds_count', (endpoint,))] == 2
+        assert samples[('pele_response_size_bytes_count', (endpoint,))] == 2
+
+        # the first lookup of the ID searches all indices, the second fetches it from the learned index
+        method = (('method', 'query_id'),)
+        assert samples[('pele_es_requests_total', method)] == 2
+        assert samples[('pele_es_request_duration_seconds_count', method)] == 2
+        assert ('pele_es_errors_total', method) not in samples
+        # looked up and missed again when learning the index
+        assert samples[('pele_cache_lookups_total', (('cache', 'id_index'), ('result', 'miss')))] == 2
+        assert samples[('pele_cache_lookups_total', (('cache', 'id_index'), ('result', 'hit')))] == 1
+
+    def test_rate_limited(self):
+        with self.app.app_context():
+            self.metrics.observe_request('api_v0-1.types', 'GET', 429, 0.001)
+        assert self.samples()[('pele_rate_limited_total', (('endpoint', 'api_v0-1.types'),))] == 1
+
+    def test_es_errors(self):
+        self.app.es_util.client = None
+        resp = self.client.get('/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids')
+        assert resp.status_code == 500
+        assert self.samples()[('pele_es_errors_total', (('method', 'query_ids_by_dataset'),))] == 1
+
+    def test_es_method(self):
+        @metrics.es_method
+        def pages():
+            for i in range(2):
+                yield i, metrics.current_method.get()
+
+        assert list(pages()) == [(0, 'pages'), (1, 'pages')]
+        assert metrics.current_method.get() == 'other'
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+import unittest
+from unittest import mock
+
+from pele import create_app, limiter
+from tests.stub_es import stub_client, make_doc
+
+
+class TestCompositePaging(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('pele.settings.TestConfig')
+        self.app.config.update(AUTH=False, ADMISSION_CONTROL=False)
+        self.app.es_util.client = stub_client()
+        self.app.es_util.catalog = None  # live composite queries
+        docs = self.app.es_util.client.transport.docs
+        docs.extend(make_doc(i, dataset='S1-IW_SLC', dataset_type='slc') for i in range(5))
+        docs.extend(make_doc(i, dataset='acquisition-ALOS2') for i in range(3))
+        self.client = self.app.test_client()
+        limiter.enabled = False
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def walk(self, path, key):
+        """Return the values of all pages of a cursor listing and the number of pages."""
+        values, pages, cursor = [], 0, ''
+        while cursor is not None:
+            resp = self.client.get(path, query_string={'cursor': cursor, 'page_size': 1})
+            assert resp.status_code == 200
+            data = resp.get_json()
+            values.extend(data[key])
+            cursor = data['next']
+            pages += 1
+        return values, pages
+
+    def test_listings(self):
+        assert self.walk('/api/v0.1/pele/types', 'types') == (['acquisition', 'slc'], 3)
+        assert self.walk('/api/v0.1/pele/datasets', 'datasets')[0] == \
+            ['S1-IW_SLC', 'acquisition-ALOS2', 'acquisition-S1-IW_SLC']
+        assert self.walk('/api/v0.1/pele/type/acquisition/datasets', 'datasets')[0] == \
+            ['acquisition-ALOS2', 'acquisition-S1-IW_SLC']
+        assert self.walk('/api/v0.1/pele/dataset/S1-IW_SLC/types', 'types')[0] == ['slc']
+
+    def test_invalid_cursor(self):
+        for cursor in ('%%%', 'Zm9v', 'MQ=='):  # not base64, not JSON, not a cursor object
+            resp = self.client.get('/api/v0.1/pele/types', query_string={'cursor': cursor})
+            assert resp.status_code == 400
+            assert resp.get_json()['success'] is False
+
+    def test_facets(self):
+        with self.app.app_context(), mock.patch('pele.lib.query.MAX_SIZE', 2):
+            rows = self.app.es_util.query_facets('grq')
+        assert rows == [('acquisition', 'acquisition-ALOS2', 3), ('acquisition', 'acquisition-S1-IW_SLC', 100),
+                        ('slc', 'S1-IW_SLC', 5)]
+        # a full page of two buckets, then the last one
+        assert len(self.app.es_util.client.transport.calls) == 2
+
+
+class TestCursorParams(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('pele.settings.TestConfig')
+        self.app.config.update(AUTH=False, ADMISSION_CONTROL=False)
+        self.app.es_util.client = stub_client()
+        self.client = self.app.test_client()
+        limiter.enabled = False
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def test_json_cursor(self):
+        path = '/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids?page_size=10'
+        resp = self.client.post(path, json={'cursor': ''})
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data['next'] is not None and data.get('offset') is None
+
+        resp = self.client.post(path, json={'cursor': data['next']})
+        assert resp.get_json()['dataset_ids'][0] != data['dataset_ids'][0]
+
+        resp = self.client.post('/api/v0.1/pele/type/acquisition/dataset/acquisition-S1-IW_SLC/id?page_size=10',
+                                json={'cursor': ''})
+        assert resp.get_json()['next'] is not None
+
+    def test_invalid_cursor(self):
+        path = '/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids'
+        assert self.client.get(path, query_string={'cursor': 'Zm9v'}).status_code == 400
+        assert self.client.post(path, json={'cursor': 'Zm9v'}).status_code == 400
+        assert self.client.post(path, json={'cursor': 1}).status_code == 400
+        assert self.client.get('/api/v0.1/pele/type/acquisition/dataset_ids?cursor=%%%').status_code == 400
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+import unittest
+from flask import Flask
+from elasticsearch_dsl import Search, Q, A
+
+from pele.lib.query import QueryES, id_prefix
+from tests.stub_es import stub_client
+
+
+class TestQueryRoundTrips(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TRACK_TOTAL_HITS'] = True
+        self.client = stub_client()
+        self.calls = self.client.transport.calls
+        self.es_util = QueryES(self.client, Search, Q, A)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        self.ctx.pop()
+
+    def test_ids_by_dataset(self):
+        total, ids = self.es_util.query_ids_by_dataset('grq', 'acquisition-S1-IW_SLC', 10, 5,
+                                                       start_time='2017-01-01T00:00:00Z')
+        assert total == 100
+        assert ids == ['acquisition-S1-IW_SLC-%08d' % i for i in range(10, 15)]
+        assert len(self.calls) == 1
+        assert self.calls[0][3]['track_total_hits'] is True
+
+    def test_ids_by_type(self):
+        total, ids = self.es_util.query_ids_by_type('grq', 'acquisition', 0, 10)
+        assert total == 100
+        assert len(ids) == 10
+        assert len(self.calls) == 1
+
+    def test_fields(self):
+        terms = {'dataset_type.keyword': 'acquisition', 'dataset.keyword': 'acquisition-S1-IW_SLC'}
+        total, docs = self.es_util.query_fields('grq', terms, ['id', 'metadata.trackNumber'], 0, 2)
+        assert total == 100
+        # sorted by starttime in descending order
+        assert docs == [{'id': 'acquisition-S1-IW_SLC-00000099', 'metadata': {'trackNumber': 99}},
+                        {'id': 'acquisition-S1-IW_SLC-00000098', 'metadata': {'trackNumber': 98}}]
+        assert len(self.calls) == 1
+
+    def test_id(self):
+        doc = self.es_util.query_id('grq', 'acquisition-S1-IW_SLC-00000000')
+        assert doc['id'] == 'acquisition-S1-IW_SLC-00000000'
+        assert len(self.calls) == 1
+
+        # the concrete index of the prefix is known now: real-time multi-get instead of a search
+        doc = self.es_util.query_id('grq', 'acquisition-S1-IW_SLC-00000001', fields=['starttime'])
+        assert doc == {'starttime': '2017-04-18T21:00:01.000Z'}
+        assert self.calls[1][:2] == ('POST', '/_mget')
+        assert len(self.calls) == 2
+
+        assert self.es_util.query_id('grq', 'acquisition-S1-IW_SLC-missing') is None
+
+    def test_id_prefix(self):
+        assert id_prefix('acquisition-S1-IW_SLC-00000000') == 'acquisition-S1-IW_SLC'
+        assert id_prefix('S1-IW_SLC__1SDV_20170418T213512') == 'S1'
+        assert id_prefix('AOI_earthquake_test_san_fran') == 'AOI'
+
+        # the index learned for a dataset is not tried for another dataset with the same leading word
+        self.es_util.query_id('grq', 'acquisition-S1-IW_SLC-00000000')
+        assert self.es_util.query_id('grq', 'acquisition-ALOS2-00000000') is None
+        assert self.calls[-1][1].endswith('/_search')
+
+    def test_overlaps(self):
+        total, docs = self.es_util.overlaps('grq', 'acquisition-S1-IW_SLC-00000000', {}, ['id'], 0, 10)
+        assert total == 100
+        assert len(docs) == 10
+        # one lookup of the reference document plus one search
+        assert len(self.calls) == 2
+
+    def test_ids_by_dataset_after(self):
+        ids = []
+        cursor = ''
+        while cursor is not None:
+            total, page, cursor = self.es_util.query_ids_by_dataset_after('grq', 'acquisition-S1-IW_SLC', cursor, 30)
+            ids.extend(page)
+            assert total == (100 if len(ids) <= 30 else None)
+
+        assert len(ids) == 100
+        assert len(set(ids)) == 100
+        assert [c[:2] for c in self.calls if 'pit' in c[1]] == [('POST', '/grq/_pit'), ('DELETE', '/_pit')]
+        assert all(c[1] == '/_search' for c in self.calls if 'pit' not in c[1])
+
+    def test_batch(self):
+        self.app.config['DEFAULT_PAGE_SIZE'] = 10
+        self.app.config['MAX_PAGE_SIZE'] = 100
+        results = self.es_util.query_batch('grq', [
+            {'query': 'ids_by_dataset', 'dataset': 'acquisition-S1-IW_SLC', 'page_size': 2},
+            {'query': 'ids_by_type', 'type': 'acquisition', 'offset': 10},
+            {'query': 'overlaps', 'id': 'acquisition-S1-IW_SLC-00000004', 'fields': ['id']},
+            {'query': 'fields', 'type': 'acquisition'},
+        ])
+        assert results[0] == {'success': True, 'total': 100,
+                              'results': ['acquisition-S1-IW_SLC-00000000', 'acquisition-S1-IW_SLC-00000001']}
+        assert results[1]['results'][0] == 'acquisition-S1-IW_SLC-00000010'
+        assert len(results[2]['results']) == 10
+        assert results[3] == {'success': False, 'message': 'Missing parameter: dataset'}
+        # one lookup of the overlaps reference documents plus one _msearch
+        assert len(self.calls) == 2
+        assert self.calls[1][1] == '/_msearch'
+
+    def test_track_total_hits(self):
+        self.app.config['TRACK_TOTAL_HITS'] = False
+        total, ids = self.es_util.query_ids_by_type('grq', 'acquisition', 0, 10)
+        assert total is None
+        assert len(ids) == 10
+        assert self.calls[0][3]['track_total_hits'] is False
+
+    def test_raw_search(self):
+        self.app.config['RAW_SEARCH'] = True
+        terms = {'dataset_type.keyword': 'acquisition', 'dataset.keyword': 'acquisition-S1-IW_SLC'}
+        total, docs = self.es_util.query_fields('grq', terms, ['id'], 0, 2)
+        assert total == 100
+        assert docs == [{'id': 'acquisition-S1-IW_SLC-00000099'}, {'id': 'acquisition-S1-IW_SLC-00000098'}]
+        assert b'hits.hits._source' in self.calls[0][2]['filter_path']
+
+        # hits without any of the requested fields are kept
+        total, docs = self.es_util.query_fields('grq', terms, ['nothing'], 0, 2)
+        assert docs == [{}, {}]
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+import unittest
+import threading
+
+from pele.lib.refresher import BackgroundRefresher
+
+
+class Counter(BackgroundRefresher):
+    thread_name = 'pele-test-refresher'
+
+    def __init__(self):
+        super().__init__()
+        self.runs = 0
+        self.done = threading.Event()
+
+    def _run(self):
+        self.runs += 1
+        self.done.set()
+
+
+class TestBackgroundRefresher(unittest.TestCase):
+    def test_thread_per_process(self):
+        refresher = Counter()
+        refresher._ensure_thread()
+        refresher._ensure_thread()
+        assert refresher.done.wait(5)
+        assert refresher._thread.name == 'pele-test-refresher'
+        refresher._thread.join(5)
+        assert refresher.runs == 1
+
+        # started again in a forked process
+        refresher.done.clear()
+        refresher._pid = -1
+        refresher._ensure_thread()
+        assert refresher.done.wait(5)
+        refresher._thread.join(5)
+        assert refresher.runs == 2
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            BackgroundRefresher()
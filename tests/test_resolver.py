@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+import os
+import unittest
+
+from pele import create_app, limiter
+from pele.lib.catalog import Facets
+from pele.lib.resolver import IndexMap, IndexResolver
+from tests.stub_es import stub_client
+
+INDICES = [
+    'grq_v1.0_acquisition-s1-iw_slc',
+    'grq_v1.1_acquisition-s1-iw_slc',
+    'grq_v1.0_acquisition-alos2',
+    'grq_v2.0_area_of_interest',
+    'grq_v1.0_s1-iw_slc',
+    'grq_v1.0_new-dataset',
+    'grq-legacy',
+]
+
+ROWS = [
+    ('acquisition', 'acquisition-S1-IW_SLC', 30),
+    ('acquisition', 'acquisition-ALOS2', 5),
+    ('area_of_interest', 'area_of_interest', 5),
+    ('slc', 'S1-IW_SLC', 12),
+]
+
+
+class StubCatalog:
+    def __init__(self, facets):
+        self.facets = facets
+
+    def get(self, index):
+        return self.facets
+
+
+class StubUtil:
+    def __init__(self, catalog=None):
+        self.catalog = catalog
+
+
+class TestIndexMap(unittest.TestCase):
+    def test_parse(self):
+        index_map = IndexMap('grq', INDICES)
+        assert index_map.by_dataset['acquisition-s1-iw_slc'] == ['grq_v1.0_acquisition-s1-iw_slc',
+                                                                 'grq_v1.1_acquisition-s1-iw_slc']
+        assert index_map.by_dataset['area_of_interest'] == ['grq_v2.0_area_of_interest']
+        assert index_map.unparsed == ['grq-legacy']
+        assert index_map.dataset_indices('S1-IW_SLC') == ['grq_v1.0_s1-iw_slc', 'grq-legacy']
+        assert index_map.dataset_indices('unknown') == []
+
+
+class TestIndexResolver(unittest.TestCase):
+    def resolver(self, catalog=None, **kwargs):
+        resolver = IndexResolver(None, StubUtil(catalog), 'grq', **kwargs)
+        resolver._thread, resolver._pid = True, os.getpid()  # no refresh thread
+        resolver._map = IndexMap('grq', INDICES)
+        return resolver
+
+    def test_dataset(self):
+        resolver = self.resolver()
+        assert resolver.resolve('grq', dataset='acquisition-S1-IW_SLC') == \
+            'grq_v1.0_acquisition-s1-iw_slc,grq_v1.1_acquisition-s1-iw_slc,grq-legacy'
+        assert resolver.resolve('grq', dataset='unknown') == 'grq'
+        assert resolver.resolve('other', dataset='acquisition-S1-IW_SLC') == 'other'
+        assert resolver.resolve('grq') == 'grq'
+        assert resolver.stats()['fallbacks'] == 1
+
+    def test_type(self):
+        assert self.resolver().resolve('grq', dataset_type='acquisition') == 'grq'  # no catalog yet
+        resolver = self.resolver(catalog=StubCatalog(Facets(ROWS)))
+        # datasets of the type, datasets unknown to the catalog and unparsed indices
+        assert resolver.resolve('grq', dataset_type='acquisition').split(',') == [
+            'grq-legacy', 'grq_v1.0_acquisition-alos2', 'grq_v1.0_acquisition-s1-iw_slc',
+            'grq_v1.0_new-dataset', 'grq_v1.1_acquisition-s1-iw_slc']
+
+    def test_max_indices(self):
+        resolver = self.resolver(max_indices=2)
+        assert resolver.resolve('grq', dataset='acquisition-S1-IW_SLC') == 'grq'
+
+
+class TestResolvedSearch(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('pele.settings.TestConfig')
+        self.app.config.update(AUTH=False, ADMISSION_CONTROL=False)
+        self.app.es_util.client = stub_client()
+        self.app.es_util.resolver = IndexResolver(self.app, self.app.es_util, 'grq', ttl=3600)
+        self.app.es_util.resolver.refresh()
+        self.client = self.app.test_client()
+        limiter.enabled = False
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def test_narrowed(self):
+        resp = self.client.get('/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids?page_size=5')
+        assert resp.status_code == 200
+        assert self.app.es_util.client.transport.calls[-1][1] == '/grq_v1.0_acquisition-s1-iw_slc/_search'
+
+        resp = self.client.get('/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids?page_size=5&cursor=')
+        assert resp.status_code == 200
+        assert ('POST', '/grq_v1.0_acquisition-s1-iw_slc/_pit') in \
+            [c[:2] for c in self.app.es_util.client.transport.calls]
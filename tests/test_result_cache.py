@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+import unittest
+
+from elasticsearch import AuthorizationException, ConnectionError
+from flask_caching.backends import SimpleCache
+
+from pele import create_app, limiter
+from pele.lib import result_cache
+from pele.lib.lru import LRUCache
+from tests.stub_es import stub_client, make_doc
+
+PATH = '/api/v0.1/pele/dataset/acquisition-S1-IW_SLC/dataset_ids?page_size=5'
+
+
+class TestByteLimit(unittest.TestCase):
+    def test_maxbytes(self):
+        cache = LRUCache(maxsize=10, maxbytes=10)
+        cache.set('a', b'1234')
+        cache.set('b', b'1234')
+        cache.set('c', b'1234')  # evicts a
+        assert cache.get('a') is None
+        assert cache.nbytes == 8
+        cache.set('b', b'12')
+        assert cache.nbytes == 6
+        cache.set('d', b'x' * 11)  # larger than the cache
+        assert cache.get('d') is None
+        assert cache.stats()['bytes'] == 6
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.shared = SimpleCache()  # stands for a redis cache shared by the workers
+        self.app = self.worker()
+        self.client = self.app.test_client()
+        limiter.enabled = False
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def worker(self):
+        app = create_app('pele.settings.TestConfig')
+        app.config.update(AUTH=False, ADMISSION_CONTROL=False, RESULT_CACHE=True,
+                          RESULT_CACHE_ENDPOINTS=['ids_by_dataset'])
+        app.es_util.client = stub_client()
+        result_cache.init_app(app, shared=self.shared)
+        return app
+
+    def searches(self, app):
+        return [c for c in app.es_util.client.transport.calls if c[1].endswith('/_search')]
+
+    def test_hit(self):
+        resp = self.client.get(PATH)
+        assert resp.headers['X-Cache'] == 'MISS'
+        again = self.client.get(PATH)
+        assert again.headers['X-Cache'] == 'HIT-LOCAL'
+        assert again.json == resp.json
+        assert len(self.searches(self.app)) == 1
+
+        # another worker finds the result in the shared tier
+        other = self.worker()
+        resp = other.test_client().get(PATH)
+        assert resp.headers['X-Cache'] == 'HIT-SHARED'
+        assert resp.json == again.json
+        assert len(self.searches(other)) == 0
+
+    def test_opt_in(self):
+        resp = self.client.get('/api/v0.1/pele/type/acquisition/dataset_ids?page_size=5')
+        assert 'X-Cache' not in resp.headers
+        # cursor pages use a point-in-time and are never cached
+        resp = self.client.get(PATH + '&cursor=')
+        assert 'X-Cache' not in resp.headers
+
+    def test_invalidation(self):
+        self.client.get(PATH)
+        self.app.es_util.client.transport.docs.append(make_doc(100))
+        # the fingerprint is remembered for INDEX_FINGERPRINT_TTL seconds
+        assert self.client.get(PATH).headers['X-Cache'] == 'HIT-LOCAL'
+        self.app.result_cache.fingerprints._cache.clear()
+        assert self.client.get(PATH).headers['X-Cache'] == 'MISS'
+        assert len(self.searches(self.app)) == 2
+
+    def test_update_in_place(self):
+        # an update leaves the doc count unchanged but not the index operations
+        self.client.get(PATH)
+        self.app.es_util.client.transport.index_total += 1
+        self.app.result_cache.fingerprints._cache.clear()
+        assert self.client.get(PATH).headers['X-Cache'] == 'MISS'
+
+    def test_forbidden(self):
+        def forbidden(index, metric=None):
+            raise AuthorizationException(403, 'security_exception', {})
+
+        self.app.es_util.client.indices.stats = forbidden
+        with self.assertLogs(self.app.logger, level='WARNING') as logs:
+            for _ in range(3):
+                assert 'X-Cache' not in self.client.get(PATH).headers
+        assert len(logs.records) == 1
+        assert self.app.result_cache.stats()['disabled'] is True
+        assert self.app.result_cache.fingerprint_errors == 1
+
+    def test_fingerprint_error(self):
+        def failing(index, metric=None):
+            raise ConnectionError('N/A', 'timed out', None)
+
+        self.app.es_util.client.indices.stats = failing
+        with self.assertLogs(self.app.logger, level='WARNING') as logs:
+            for _ in range(3):
+                assert 'X-Cache' not in self.client.get(PATH).headers
+        assert len(logs.records) == 1  # warned once per FINGERPRINT_WARNING_INTERVAL
+        assert self.app.result_cache.fingerprint_errors == 3
+        assert self.app.result_cache.disabled is False
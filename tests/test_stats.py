@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+import unittest
+
+from pele import create_app, limiter
+from tests.stub_es import stub_client
+
+PATHS = ('catalog', 'auth', 'hosts', 'admission', 'result_cache', 'resolver', 'summary', 'histogram_cache')
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('pele.settings.TestConfig')
+        self.app.config.update(AUTH=False)
+        self.app.es_util.client = stub_client()
+        self.client = self.app.test_client()
+        limiter.enabled = False
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def test_stats(self):
+        for path in PATHS:
+            resp = self.client.get(f'/api/v0.1/stats/{path}')
+            assert resp.status_code == 200, path
+            data = resp.get_json()
+            assert data['success'] is True
+            assert data['enabled'] is (data['stats'] is not None)
+        assert self.client.get('/api/v0.1/stats/auth').get_json()['enabled'] is True
+
+        self.app.es_util.histograms = None
+        data = self.client.get('/api/v0.1/stats/histogram_cache').get_json()
+        assert data['enabled'] is False
+        assert data['stats'] is None
+
+    def test_docs(self):
+        spec = self.client.get('/api/v0.1/swagger.json').get_json()
+        assert 'CatalogStats' in spec['definitions']
+        get = spec['paths']['/stats/hosts']['get']
+        assert get['responses']['401']['description'] == "Unauthorized"
+        assert get['description'].startswith("Get EWMA latency")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+import os
+import unittest
+from flask import Flask
+
+from pele import create_app, limiter
+from pele.lib.summary import Summary, SummaryCatalog
+from tests.stub_es import stub_client, make_doc
+
+
+def row(dataset_type, dataset, count, starttime, endtime, latest_ingest='2017-04-19T00:00:00.000Z'):
+    return {'type': dataset_type, 'dataset': dataset, 'count': count, 'starttime': starttime,
+            'endtime': endtime, 'bbox': [120.5, -33.3, 123.7, -31.1], 'latest_ingest': latest_ingest}
+
+
+ROWS = [
+    row('acquisition', 'acquisition-S1-IW_SLC', 30, '2017-04-18T21:00:00.000Z', '2017-04-18T22:00:00.000Z'),
+    row('acquisition', 'acquisition-ALOS2', 5, '2017-01-01T00:00:00.000Z', '2017-02-01T00:00:00.000Z'),
+    row('slc', 'S1-IW_SLC', 12, '2017-04-18T21:30:00.000Z', '2017-04-18T21:40:00.000Z'),
+    row('area_of_interest', 'area_of_interest', 5, None, None, latest_ingest=None),
+]
+
+
+class TestSummary(unittest.TestCase):
+    def test_select(self):
+        summary = Summary(ROWS, 0)
+        assert [i['dataset'] for i in summary.select()] == [
+            'acquisition-ALOS2', 'acquisition-S1-IW_SLC', 'area_of_interest', 'S1-IW_SLC']
+        assert len(summary.select(dataset_type='acquisition')) == 2
+        assert [i['dataset'] for i in summary.select(dataset='acquisition-*')] == [
+            'acquisition-ALOS2', 'acquisition-S1-IW_SLC']
+
+        # overlap with [start_time, end_time); times compared as instants, not strings
+        rows = summary.select(start_time='2017-04-18T22:00:00+00:00')
+        assert rows == []
+        rows = summary.select(start_time='2017-04-18T21:35:00Z', end_time='2017-04-18T21:36:00Z')
+        assert [i['dataset'] for i in rows] == ['acquisition-S1-IW_SLC', 'S1-IW_SLC']
+
+    def test_sort(self):
+        summary = Summary(ROWS, 0)
+        assert [i['count'] for i in summary.select(sort='-count')] == [30, 12, 5, 5]
+        # rows without the field come last either way
+        assert summary.select(sort='starttime')[-1]['dataset'] == 'area_of_interest'
+        assert summary.select(sort='-starttime')[-1]['dataset'] == 'area_of_interest'
+        with self.assertRaises(ValueError):
+            summary.select(sort='location')
+        with self.assertRaises(ValueError):
+            summary.select(start_time='yesterday')
+
+
+class TestSummaryCatalog(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.rows = list(ROWS)
+
+        def loader(index, datasets=None, ingested_since=None):
+            self.calls.append((datasets, ingested_since))
+            if ingested_since is not None:
+                return [i for i in self.rows if (i['latest_ingest'] or '') >= ingested_since]
+            return [i for i in self.rows if datasets is None or i['dataset'] in datasets]
+
+        self.catalog = SummaryCatalog(Flask(__name__), loader, 'grq', ttl=3600, lag=0)
+        self.catalog._thread, self.catalog._pid = True, os.getpid()  # no refresh thread
+
+    def test_incremental(self):
+        assert self.catalog.get() is None
+        summary = self.catalog.refresh()
+        assert len(summary.rows) == 4
+        assert self.calls == [(None, None)]
+
+        # only datasets ingested since the last refresh are re-summarized
+        self.rows[0] = row('acquisition', 'acquisition-S1-IW_SLC', 31, '2017-04-18T21:00:00.000Z',
+                           '2017-04-18T23:00:00.000Z', latest_ingest='2099-01-01T00:00:00.000Z')
+        del self.rows[1]
+        summary = self.catalog.refresh()
+        assert self.calls[-1] == (['acquisition-S1-IW_SLC'], None)
+        assert summary.rows[('acquisition', 'acquisition-S1-IW_SLC')]['count'] == 31
+        assert len(summary.rows) == 4  # deletions wait for a full rebuild
+
+        summary = self.catalog.refresh(full=True)
+        assert len(summary.rows) == 3
+
+        stats = self.catalog.stats()
+        assert stats['full_refreshes'] == 2
+        assert stats['incremental_refreshes'] == 1
+        assert stats['rows'] == 3
+
+
+class TestSummaryEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('pele.settings.TestConfig')
+        self.app.config.update(AUTH=False, ADMISSION_CONTROL=False)
+        self.app.es_util.client = stub_client()
+        self.app.es_util.client.transport.docs.extend(make_doc(i, dataset='S1-IW_SLC', dataset_type='slc')
+                                                      for i in range(10))
+        self.app.summary = SummaryCatalog(self.app, self.app.es_util.query_summary, 'grq', ttl=3600)
+        self.app.summary._thread, self.app.summary._pid = True, os.getpid()  # no refresh thread
+        self.client = self.app.test_client()
+        limiter.enabled = False
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def test_summary(self):
+        resp = self.client.get('/api/v0.1/pele/summary')
+        assert resp.status_code == 503
+        assert resp.headers['Retry-After'] == '30'
+
+        self.app.summary.refresh()
+        resp = self.client.get('/api/v0.1/pele/summary?sort=-count')
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data['total'] == 2
+        first = data['summary'][0]
+        assert first['dataset'] == 'acquisition-S1-IW_SLC'
+        assert first['count'] == 100
+        assert first['starttime'] == '2017-04-18T21:00:00.000Z'
+        assert first['endtime'] == '2017-04-18T21:01:39.999Z'
+        assert first['bbox'] == [120.5, -33.3, 123.7, -31.1]
+        assert first['latest_ingest'] == '2017-04-19T00:01:39.000Z'
+
+        resp = self.client.get('/api/v0.1/pele/summary?type=slc')
+        assert [i['dataset'] for i in resp.get_json()['summary']] == ['S1-IW_SLC']
+
+        resp = self.client.get('/api/v0.1/pele/summary?sort=location')
+        assert resp.status_code == 400
+
+    def test_disabled(self):
+        self.app.summary = None
+        assert self.client.get('/api/v0.1/pele/summary').status_code == 404
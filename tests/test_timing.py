@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+import json
+import unittest
+from flask import Flask
+from elasticsearch_dsl import Search, Q, A
+
+from pele.lib import timing
+from pele.lib.query import QueryES
+from tests.stub_es import stub_client
+
+
+class TestTiming(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SERVER_TIMING'] = True
+        self.es_util = QueryES(stub_client(), Search, Q, A)
+        timing.init_app(self.app)
+
+        @self.app.route('/fields')
+        def fields():
+            terms = {'dataset_type.keyword': 'acquisition', 'dataset.keyword': 'acquisition-S1-IW_SLC'}
+            total, docs = self.es_util.query_fields('grq', terms, ['id'], 0, 10)
+            return {'total': total, 'results': docs}
+
+    def metrics(self, resp):
+        return dict(i.split(';dur=') for i in resp.headers['Server-Timing'].split(', '))
+
+    def test_server_timing(self):
+        for raw in (False, True):
+            self.app.config['RAW_SEARCH'] = raw
+            resp = self.app.test_client().get('/fields')
+            assert resp.status_code == 200
+            metrics = self.metrics(resp)
+            # responses are only converted from DSL objects without RAW_SEARCH
+            assert list(metrics) == ['build', 'es', 'es_took'] + ([] if raw else ['hits']) + ['total']
+            assert float(metrics['es_took']) == 1.0  # took of the stub response
+            assert float(metrics['total']) >= float(metrics['es'])
+
+    def test_disabled(self):
+        self.app.config['SERVER_TIMING'] = False
+        resp = self.app.test_client().get('/fields')
+        assert 'Server-Timing' not in resp.headers
+
+    def test_log(self):
+        self.app.config['SERVER_TIMING'] = False
+        self.app.config['SERVER_TIMING_LOG'] = True
+        with self.assertLogs(self.app.logger, level='INFO') as logs:
+            self.app.test_client().get('/fields')
+        record = json.loads(logs.records[-1].getMessage())
+        assert record['path'] == '/fields'
+        assert record['status'] == 200
+        assert record['es_calls'] == 1
+        assert record['es_took_ms'] == 1.0
+
+    def test_outside_request(self):
+        with self.app.app_context():
+            assert timing.get_timer() is None
+            with timing.phase('es') as timer:
+                assert timer is None
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+import time
+import unittest
+
+from pele.lib.token_cache import TokenCache
+
+
+class TestTokenCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = TokenCache(maxsize=10, ttl=300, user_ttl=300)
+
+    def test_token(self):
+        assert self.cache.get_token('token') is None
+        self.cache.set_token('token', 'admin@test.com', exp=time.time() + 60)
+        assert self.cache.get_token('token') == 'admin@test.com'
+        assert self.cache.get_token('other') is None
+
+        stats = self.cache.stats()['tokens']
+        assert stats['hits'] == 1
+        assert stats['misses'] == 2
+
+    def test_token_expiration(self):
+        # never cached past the token's own expiration
+        self.cache.set_token('expired', 'admin@test.com', exp=time.time() - 1)
+        assert self.cache.get_token('expired') is None
+
+        self.cache.set_token('expiring', 'admin@test.com', exp=time.time() + 0.05)
+        assert self.cache.get_token('expiring') == 'admin@test.com'
+        time.sleep(0.1)
+        assert self.cache.get_token('expiring') is None
+
+    def test_user(self):
+        assert self.cache.user_exists('admin@test.com') is False
+        self.cache.set_user('admin@test.com')
+        assert self.cache.user_exists('admin@test.com') is True
+        self.cache.invalidate_user('admin@test.com')
+        assert self.cache.user_exists('admin@test.com') is False
+
+    def test_auth_share(self):
+        self.cache.record(0.01, 0.04)
+        self.cache.record(0.01, 0.06)
+        stats = self.cache.stats()
+        assert stats['requests'] == 2
+        assert abs(stats['auth_share'] - 0.2) < 1e-9